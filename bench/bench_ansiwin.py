@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Benchmark bytes sent per refresh of windows by :class:`x84.bbs.ansiwin`.
+
+A :class:`x84.bbs.lightbar.Lightbar` is moved through its content, the
+content of a :class:`x84.bbs.pager.Pager` is updated one line at a time,
+and a window border is redrawn, first as before, then with the virtual
+screen buffer, :class:`x84.bbs.ansiwin.Screen`, enabled.  The final
+display of both is compared, and the average number of bytes per refresh
+is displayed.
+
+Usage::
+
+    python bench/bench_ansiwin.py [refreshes]
+"""
+from __future__ import print_function
+import sys
+
+
+class BenchSession(object):
+
+    """ Stand-in for :class:`x84.bbs.session.Session`. """
+
+    def __init__(self, screen_buffer):
+        from x84.bbs.ansiwin import Screen
+        from x84.terminal import Terminal
+        self.terminal = Terminal(kind='xterm-256color', stream=None,
+                                 rows=25, columns=80)
+        self.screen = Screen(self.terminal) if screen_buffer else None
+        # display as seen by the client, regardless of screen_buffer.
+        self.display = Screen(self.terminal)
+        self.num_bytes = 0
+
+    def write(self, ucs):
+        """ Count bytes written, as by :meth:`Session.write`. """
+        if self.screen is not None:
+            ucs = self.screen.write(ucs)
+        self.num_bytes += len(ucs.encode('utf8'))
+        self.display.update(ucs)
+
+
+def lightbar(term, echo, num):
+    """ Move selection of lightbar down ``num`` times. """
+    from x84.bbs.lightbar import Lightbar
+    lbar = Lightbar(height=20, width=40, yloc=2, xloc=10)
+    lbar.update([(idx, u'{0}item number {1}{2}'.format(
+        term.bold_blue if idx % 2 else term.green, idx, term.normal))
+        for idx in range(num * 2)])
+    echo(lbar.border() + lbar.refresh())
+    for _ in range(num):
+        echo(lbar.process_keystroke(term.KEY_DOWN))
+
+
+def pager(term, echo, num):
+    """ Update content of pager ``num`` times, changing one line each. """
+    from x84.bbs.pager import Pager
+    pgr = Pager(height=20, width=78, yloc=2, xloc=1)
+    lines = [u'line {0}: {1}'.format(idx, u' '.join([u'lorem ipsum'] * 5))
+             for idx in range(pgr.visible_height)]
+    echo(pgr.border() + pgr.update(u'\r\n'.join(lines)))
+    for idx in range(num):
+        lines[idx % len(lines)] = u'line {0}: updated'.format(idx)
+        echo(pgr.update(u'\r\n'.join(lines)))
+
+
+def border(term, echo, num):
+    """ Redraw border and title of a window ``num`` times. """
+    from x84.bbs.ansiwin import AnsiWindow
+    win = AnsiWindow(height=20, width=60, yloc=2, xloc=10)
+    for idx in range(num):
+        echo(win.border() + win.title(u'{0}[ title ]{1}'.format(
+            term.bold_red if idx % 10 == 0 else term.red, term.normal)))
+
+
+def main(num=100):
+    """ Program entry point. """
+    import x84.bbs.ini
+    import x84.bbs.session
+    x84.bbs.ini.CFG = x84.bbs.ini.init_bbs_ini()
+    for func in (lightbar, pager, border):
+        results = []
+        for screen_buffer in (False, True):
+            session = BenchSession(screen_buffer)
+            x84.bbs.session.SESSION = session
+            func(session.terminal, session.write, num)
+            results.append((session.num_bytes / float(num + 1),
+                            session.display.cells))
+        (before, before_cells), (after, after_cells) = results
+        assert before_cells == after_cells, func.__name__
+        assert any(cell is not None for row in after_cells for cell in row)
+        print('{0:>10}: {1:8.1f} bytes/refresh -> {2:8.1f} bytes/refresh'
+              .format(func.__name__, before, after))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark of the codecs of :mod:`x84.encodings`.
+
+For each codec, 1MB of random bytes is decoded at once, in chunks read by
+:class:`x84.bbs.door.Door`, and by an incremental decoder, and the result
+encoded again, by the codec and, where it was before, by dictionary.
+Throughput is displayed in MB/s.
+
+Usage::
+
+    python bench/bench_codecs.py [megabytes]
+"""
+from __future__ import print_function
+import codecs
+import random
+import time
+import sys
+
+
+def throughput(func, size, repeat=5):
+    """ Return MB/s of ``func`` over ``size`` bytes, best of ``repeat``. """
+    best = None
+    for _ in range(repeat):
+        stime = time.time()
+        func()
+        duration = time.time() - stime
+        best = duration if best is None else min(best, duration)
+    return size / max(best, 1e-9) / 1024 / 1024
+
+
+def main(megabytes=1):
+    """ Program entry point. """
+    # pylint: disable=W0612
+    #         Unused variable
+    import x84.bbs  # registers codecs
+    import encodings.cp437
+    from x84.bbs.door import Door
+    from x84.encodings import cp437_art
+
+    rand = random.Random(0)
+    size = int(megabytes * 1024 * 1024)
+    data = ''.join(chr(rand.randint(0, 255)) for _ in range(size))
+    chunks = [data[pos:pos + Door.blocksize]
+              for pos in range(0, size, Door.blocksize)]
+
+    # encoding by dictionary, as before, of the same mapping.
+    encoding_maps = {'cp437': encodings.cp437.encoding_map,
+                     'cp437_art': cp437_art.ENCODING_MAP}
+
+    print('{0:>10} {1:>10} {2:>10} {3:>10} {4:>10} {5:>10}'.format(
+        'codec', 'decode', 'chunked', 'increment', 'encode', 'by dict'))
+    for encoding in ('cp437', 'cp437_art', 'amiga', 'atarist'):
+        decoder = codecs.getincrementaldecoder(encoding)()
+        decode = throughput(lambda: data.decode(encoding), size)
+        chunked = throughput(
+            lambda: [chunk.decode(encoding) for chunk in chunks], size)
+        increment = throughput(
+            lambda: [decoder.decode(chunk) for chunk in chunks], size)
+        encode = by_dict = float('nan')
+        if encoding in encoding_maps:
+            # text of only characters mapped for encoding.
+            encoding_map = encoding_maps[encoding]
+            ucs = u''.join(char for char in data.decode(encoding)
+                           if ord(char) in encoding_map)
+            assert ucs.encode(encoding) == codecs.charmap_encode(
+                ucs, 'strict', encoding_map)[0]
+            encode = throughput(lambda: ucs.encode(encoding), size)
+            by_dict = throughput(lambda: codecs.charmap_encode(
+                ucs, 'strict', encoding_map), size)
+        elif encoding != 'amiga':
+            # amiga (topaz) is a decode-only codec.
+            ucs = data.decode(encoding)
+            encode = throughput(lambda: ucs.encode(encoding), size)
+        print('{0:>10} {1:10.1f} {2:10.1f} {3:10.1f} {4:10.1f} {5:10.1f}'
+              .format(encoding, decode, chunked, increment, encode, by_dict))
+
+
+if __name__ == '__main__':
+    main(*map(float, sys.argv[1:]))
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+Benchmark database requests/sec of :class:`x84.db.DBWorkerPool`.
+
+Compares the worker pool against the previous model of one thread and
+one new database connection per request.  Each simulated session sends
+a request and waits for its reply before sending the next, as done by
+:class:`x84.bbs.dbproxy.DBProxy`.
+
+Usage::
+
+    python bench/bench_db.py [sessions] [requests-per-session]
+"""
+from __future__ import print_function
+import threading
+import tempfile
+import shutil
+import Queue
+import time
+import sys
+
+
+class ReplyPipe(object):
+
+    """ Stand-in for ``tty.master_write``, received by a session thread. """
+
+    def __init__(self):
+        self.replies = Queue.Queue()
+
+    def send(self, data):
+        """ Receive reply of database command. """
+        self.replies.put(data)
+
+
+def session(submit, num_requests, failures):
+    """ Issue ``num_requests`` database commands, awaiting each reply. """
+    from x84.db import DBHandler
+    pipe = ReplyPipe()
+    for num in range(num_requests):
+        key = str(num % 100)
+        if num % 4 == 0:
+            data = ('bench', '__setitem__', (key, num))
+        else:
+            data = ('bench', 'get', (key, None))
+        submit(DBHandler(pipe, 'db-bench', data))
+        event, _ = pipe.replies.get()
+        if event == 'exception':
+            failures.append(event)
+
+
+def thread_per_request(handler):
+    """ Previous model: a new thread and connection for each request. """
+    threading.Thread(target=handler.run).start()
+
+
+def measure(label, submit, num_sessions, num_requests):
+    """ Run ``num_sessions`` concurrently, display requests/sec. """
+    failures = []
+    threads = [threading.Thread(target=session,
+                                args=(submit, num_requests, failures))
+               for _ in range(num_sessions)]
+    stime = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.time() - stime
+    total = num_sessions * num_requests
+    print('{0:>20}: {1:8.1f} requests/sec ({2} requests, {3} failed)'
+          .format(label, total / duration, total, len(failures)))
+
+
+def main(num_sessions=8, num_requests=250):
+    """ Program entry point. """
+    import x84.bbs.ini
+    from x84.db import DBWorkerPool
+
+    datapath = tempfile.mkdtemp()
+    try:
+        x84.bbs.ini.CFG = x84.bbs.ini.init_bbs_ini()
+        x84.bbs.ini.CFG.set('system', 'datapath', datapath)
+
+        measure('thread-per-request', thread_per_request,
+                num_sessions, num_requests)
+        for num_workers in (1, 4):
+            pool = DBWorkerPool(num_workers=num_workers)
+            measure('pool ({0} workers)'.format(num_workers), pool.submit,
+                    num_sessions, num_requests)
+            pool.shutdown()
+    finally:
+        shutil.rmtree(datapath)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
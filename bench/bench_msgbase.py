@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+Benchmark posting messages by :meth:`x84.bbs.msgbase.Msg.save`.
+
+Messages are posted by a simulated session, each database command is
+executed by :class:`x84.db.DBWorkerPool`, as done by the engine.  The
+rate of posting is displayed for each interval, which should remain
+steady as the number of messages and tags grow.  Finally, the time taken
+by :func:`x84.bbs.msgbase.search_msgs` is displayed for a few queries.
+
+Usage::
+
+    python bench/bench_msgbase.py [messages] [tags]
+"""
+from __future__ import print_function
+import tempfile
+import shutil
+import Queue
+import time
+import sys
+
+
+class BenchUser(object):
+
+    """ Stand-in for :class:`x84.bbs.userbase.User`. """
+
+    handle = u'bench'
+
+
+class BenchSession(object):
+
+    """ Stand-in for :class:`x84.bbs.session.Session` and the engine. """
+
+    def __init__(self):
+        self.user = BenchUser()
+        self.replies = Queue.Queue()
+
+    def send(self, data):
+        """ Receive reply of database command, as ``tty.master_write``. """
+        self.replies.put(data)
+
+    def send_event(self, event, data):
+        """ Execute database command by worker pool. """
+        from x84.db import DBHandler
+        if event.startswith('db'):
+            DBHandler(self, event, data).start()
+
+    def read_event(self, event):
+        """ Return reply of database command. """
+        reply_event, data = self.replies.get()
+        if reply_event == 'exception':
+            raise data
+        assert reply_event == event, (reply_event, event)
+        return data
+
+    def flush_event(self, event):
+        """ Nothing is buffered. """
+        pass
+
+    def buffer_events(self):
+        """ Nothing is buffered. """
+        pass
+
+
+def main(num_messages=100000, num_tags=50):
+    """ Program entry point. """
+    import x84.bbs.ini
+    import x84.bbs.session
+    from x84.db import get_db_pool
+
+    datapath = tempfile.mkdtemp()
+    try:
+        x84.bbs.ini.CFG = x84.bbs.ini.init_bbs_ini()
+        x84.bbs.ini.CFG.set('system', 'datapath', datapath)
+        x84.bbs.ini.CFG.set('msg', 'network_tags', '')
+        x84.bbs.ini.CFG.set('msg', 'server_tags', '')
+        x84.bbs.session.SESSION = BenchSession()
+
+        from x84.bbs.msgbase import Msg, list_msgs, list_tags, search_msgs
+        interval = max(1, num_messages // 10)
+        stime = time.time()
+        itime = stime
+        for num in range(num_messages):
+            msg = Msg(subject=u'subject {0}'.format(num),
+                      body=u'body of message {0}'.format(num))
+            msg.tags = set([u'public', u'tag{0}'.format(num % num_tags)])
+            msg.save(send_net=False)
+            if (num + 1) % interval == 0:
+                now = time.time()
+                print('{0:>8} messages: {1:8.1f} posts/sec'
+                      .format(num + 1, interval / (now - itime)))
+                itime = now
+        duration = time.time() - stime
+        print('{0:>8} messages: {1:8.1f} posts/sec overall'
+              .format(num_messages, num_messages / duration))
+
+        for query in (u'subject {0}'.format(num_messages // 2),
+                      u'body message', u'nonexistent'):
+            stime = time.time()
+            results = search_msgs(query)
+            print('{0:>24}: {1:8.2f} ms ({2} results)'
+                  .format(query, (time.time() - stime) * 1000, len(results)))
+
+        assert len(list_msgs(tags=(u'public',))) == num_messages
+        assert len(list_tags()) == min(num_tags, num_messages) + 1
+        get_db_pool().shutdown()
+    finally:
+        shutil.rmtree(datapath)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
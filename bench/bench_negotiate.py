@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+"""
+Benchmark time taken by telnet negotiation of ConnectTelnet.
+
+A simulated telnet client is connected by a socket pair, its input parsed
+by :meth:`x84.telnet.TelnetClient.socket_recv` in a thread, as done by the
+engine.  The average time elapsed until a session would be spawned is
+displayed for a client that answers all options, one that refuses all
+options, and one that does not answer at all.
+
+Usage::
+
+    python bench/bench_negotiate.py [connections]
+"""
+from __future__ import print_function
+import threading
+import logging
+import socket
+import select
+import time
+import sys
+
+
+class BenchPeer(threading.Thread):
+
+    """ Simulated telnet client, answering each request of the server. """
+
+    def __init__(self, sock, kind):
+        self.sock = sock
+        self.kind = kind
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+    def reply(self, cmd, opt):
+        """ Return reply to server command ``cmd`` of option ``opt``. """
+        from telnetlib import IAC, DO, DONT, WILL, WONT, SB, SE
+        from telnetlib import TTYPE, NAWS, NEW_ENVIRON, BINARY, SGA, ECHO
+        if self.kind == 'refuse':
+            return IAC + {DO: WONT, WILL: DONT}[cmd] + opt
+        if cmd == DO:
+            if opt not in (TTYPE, NAWS, NEW_ENVIRON, BINARY, SGA):
+                return IAC + WONT + opt
+            reply = IAC + WILL + opt
+            if opt == NAWS:
+                reply += IAC + SB + NAWS + '\x00\x50\x00\x19' + IAC + SE
+            return reply
+        if opt not in (ECHO, SGA, BINARY):
+            return IAC + DONT + opt
+        return IAC + DO + opt
+
+    def run(self):
+        """ Answer requests until the socket is closed. """
+        from telnetlib import IAC, DO, WILL, SB, SE, TTYPE, NEW_ENVIRON
+        answered = set()
+        data = ''
+        while True:
+            try:
+                data += self.sock.recv(4096)
+            except socket.error:
+                return
+            if self.kind == 'silent':
+                continue
+            while len(data) >= 3:
+                if data[:3] == IAC + SB + TTYPE:
+                    self.sock.send(IAC + SB + TTYPE + '\x00xterm' + IAC + SE)
+                elif data[:3] == IAC + SB + NEW_ENVIRON:
+                    self.sock.send(IAC + SB + NEW_ENVIRON + '\x00\x00LANG'
+                                   '\x01en_US.UTF-8' + IAC + SE)
+                elif data[0] == IAC and data[1] in (DO, WILL):
+                    if data[:3] not in answered:
+                        answered.add(data[:3])
+                        self.sock.send(self.reply(data[1], data[2]))
+                    data = data[3:]
+                    continue
+                if SE in data:
+                    data = data[data.index(SE) + 1:]
+                else:
+                    data = data[1:]
+
+
+def parse(client):
+    """ Parse input of ``client`` as the engine, until deactivated. """
+    from x84.bbs.exception import Disconnected
+    while client.is_active():
+        if select.select([client.sock], [], [], 0.01)[0]:
+            try:
+                client.socket_recv()
+            except Disconnected:
+                return
+
+
+def measure(kind, num):
+    """ Return average seconds until a session is spawned. """
+    import x84.telnet
+    from x84.telnet import TelnetClient, ConnectTelnet
+    total = 0.0
+    for _ in range(num):
+        server_sock, client_sock = socket.socketpair()
+        client = TelnetClient(server_sock, ('127.0.0.1', 0))
+        BenchPeer(client_sock, kind).start()
+        parser = threading.Thread(target=parse, args=(client,))
+        parser.daemon = True
+        parser.start()
+        spawned = []
+        x84.telnet.spawn_client_session = (
+            lambda client: spawned.append(time.time()))
+        stime = time.time()
+        ConnectTelnet(client).run()
+        assert spawned, kind
+        total += spawned[0] - stime
+        client.deactivate()
+        parser.join()
+        server_sock.close()
+        client_sock.close()
+    return total / num
+
+
+def main(num=10):
+    """ Program entry point. """
+    logging.disable(logging.CRITICAL)
+    for kind in ('answer', 'refuse', 'silent'):
+        print('{0:>8}: {1:8.1f} ms/negotiation'
+              .format(kind, measure(kind, num if kind == 'answer' else 2)
+                      * 1000))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Benchmark sending a large output to a slow client by BaseClient.send.
+
+A client whose socket accepts only a few kilobytes for each call to
+:meth:`x84.client.BaseClient.send` is sent a large art file, first as by
+the previous send buffer, an ``array('c')`` copied in full by each send,
+then by :class:`x84.client.BufferQueue`.  The time taken, and the bytes
+received, are compared, for a few sizes of output.
+
+Usage::
+
+    python bench/bench_send.py [megabytes]
+"""
+from __future__ import print_function
+import array
+import time
+import sys
+
+
+class SlowSocket(object):
+
+    """ Stand-in for a socket, accepting ``limit`` bytes for each send. """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.received = []
+
+    def send(self, data):
+        """ Accept at most ``limit`` bytes of ``data``. """
+        sent = data[:self.limit]
+        self.received.append(bytes(sent) if isinstance(sent, str)
+                             else sent.tobytes())
+        return len(sent)
+
+
+def array_send(client):
+    """ Previous send: buffer copied in full, unsent bytes re-buffered. """
+    ready_bytes = bytes(''.join(client.send_buffer))
+    client.send_buffer = array.array('c')
+    sent = client.sock.send(ready_bytes)
+    if sent < len(ready_bytes):
+        client.send_buffer.fromstring(ready_bytes[sent:])
+    return sent
+
+
+def measure(send, data, limit):
+    """ Return seconds taken to send ``data`` and the bytes received. """
+    from x84.client import BaseClient
+    client = BaseClient(sock=SlowSocket(limit),
+                        address_pair=('127.0.0.1', 0))
+    if send is array_send:
+        client.send_buffer = array.array('c')
+    stime = time.time()
+    # output is received from the session in blocks of IPCStream.
+    for pos in range(0, len(data), 8192):
+        client.send_str(data[pos:pos + 8192])
+    while len(client.send_buffer):
+        if send is array_send:
+            send(client)
+        else:
+            client.send()
+    return time.time() - stime, ''.join(client.sock.received)
+
+
+def main(megabytes=1):
+    """ Program entry point. """
+    size = int(megabytes * 1024 * 1024)
+    data = ''.join(chr(num % 256) for num in range(size))
+    for limit in (1024, 16384, 262144):
+        before, expected = measure(array_send, data, limit)
+        after, received = measure(None, data, limit)
+        assert received == expected == data
+        print('{0:>8} bytes/send: {1:8.3f} s -> {2:8.3f} s'
+              .format(limit, before, after))
+
+
+if __name__ == '__main__':
+    main(*map(float, sys.argv[1:]))
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Benchmark latency of :func:`x84.bbs.output.showart`.
+
+Each art file of the default scripts is displayed, first with the caches
+of decoded art and matching files cleared before each call, then as
+cached after :func:`x84.bbs.output.prewarm_art`.  The average time taken
+to display each file is displayed.
+
+Usage::
+
+    python bench/bench_showart.py [repeat]
+"""
+from __future__ import print_function
+import time
+import glob
+import sys
+import os
+
+
+class BenchSession(object):
+
+    """ Stand-in for :class:`x84.bbs.session.Session`. """
+
+    encoding = 'utf8'
+
+    def __init__(self):
+        from x84.terminal import Terminal
+        self.terminal = Terminal(kind='xterm-256color', stream=None,
+                                 rows=25, columns=80)
+
+
+def measure(filenames, repeat, cached):
+    """ Return average seconds taken by showart for each file. """
+    from x84.bbs import output
+    stime = time.time()
+    for _ in range(repeat):
+        for filename in filenames:
+            if not cached:
+                output.ART_CACHE.clear()
+                output.GLOB_CACHE.clear()
+            for _ in output.showart(filename, force=True):
+                pass
+    return (time.time() - stime) / (repeat * len(filenames))
+
+
+def main(repeat=20):
+    """ Program entry point. """
+    import x84.bbs.ini
+    import x84.bbs.session
+    from x84.bbs.output import prewarm_art
+    x84.bbs.ini.CFG = x84.bbs.ini.init_bbs_ini()
+    x84.bbs.session.SESSION = BenchSession()
+
+    folder = os.path.join(os.path.dirname(x84.bbs.ini.__file__),
+                          os.path.pardir, 'default', 'art')
+    filenames = sorted(glob.glob(os.path.join(folder, '*.ans')))
+    assert filenames, folder
+    before = measure(filenames, repeat, cached=False)
+    prewarm_art(['*.ans'], folder=folder)
+    after = measure(filenames, repeat, cached=True)
+    print('{0} art files: {1:8.3f} ms/showart -> {2:8.3f} ms/showart'
+          .format(len(filenames), before * 1000, after * 1000))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Benchmark time to first output of sessions spawned for connecting clients.
+
+A client is handed to :func:`x84.terminal.spawn_client_session`, first
+with a new sub-process started for each, then with a pre-forked process
+of :data:`x84.terminal.SESSION_POOL`, and the time until the first
+``output`` event of its matrix script is received is displayed.
+
+Usage::
+
+    python bench/bench_spawn.py [clients]
+"""
+from __future__ import print_function
+import multiprocessing
+import tempfile
+import socket
+import shutil
+import time
+import sys
+
+
+class BenchClient(object):
+
+    """ Stand-in for :class:`x84.client.BaseClient`. """
+
+    kind = 'telnet'
+    env = {'TERM': 'xterm-256color', 'LINES': '25',
+           'COLUMNS': '80', 'encoding': 'utf8'}
+
+    def __init__(self, num):
+        self.addrport = '127.0.0.1:{0}'.format(num)
+        self.env = dict(self.env)
+        self.sock, self._peer = socket.socketpair()
+
+    def poll_fileno(self):
+        """ File descriptor polled by the engine, never ready. """
+        return self.sock.fileno()
+
+
+def respond(tty, event, data):
+    """ Respond to events of the session, as the engine would. """
+    from x84.db import DBHandler
+    from x84.terminal import NODES
+    if event == 'node':
+        tty.node = NODES.acquire()
+        tty.master_write.send((event, tty.node))
+    elif event.startswith('lock'):
+        tty.master_write.send((event, True))
+    elif event.startswith('db'):
+        DBHandler(tty.master_write, event, data).start()
+
+
+def measure(num_clients, pool_size):
+    """ Return average seconds until first output of each session. """
+    import x84.bbs.ini
+    from x84.terminal import (
+        spawn_client_session, find_tty,
+        fill_session_pool, drain_session_pool)
+    x84.bbs.ini.CFG.set('system', 'session_pool_size', str(pool_size))
+    x84.bbs.ini.CFG.set('system', 'session_pool_term',
+                        BenchClient.env['TERM'])
+    elapsed = 0
+    for num in range(num_clients):
+        fill_session_pool(pool_size)
+        # allow pre-forked processes to finish initializing.
+        time.sleep(0.5 if pool_size else 0)
+        client = BenchClient(num)
+        stime = time.time()
+        spawn_client_session(client)
+        tty = find_tty(client)
+        while True:
+            event, data = tty.master_read.recv()
+            if event == 'output':
+                break
+            respond(tty, event, data)
+        elapsed += time.time() - stime
+    drain_session_pool()
+    for process in multiprocessing.active_children():
+        process.terminate()
+    return elapsed / num_clients
+
+
+def main(num_clients=10):
+    """ Program entry point. """
+    import x84.bbs.ini
+
+    datapath = tempfile.mkdtemp()
+    try:
+        x84.bbs.ini.CFG = x84.bbs.ini.init_bbs_ini()
+        x84.bbs.ini.CFG.set('system', 'datapath', datapath)
+        before = measure(num_clients, pool_size=0)
+        after = measure(num_clients, pool_size=2)
+        print('{0} sessions: {1:8.1f} ms to first output -> {2:8.1f} ms'
+              .format(num_clients, before * 1000, after * 1000))
+    finally:
+        shutil.rmtree(datapath)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
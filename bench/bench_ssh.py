@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Benchmark rate of ssh handshakes (handshakes/sec) by host key type.
+
+A paramiko client and server transport are connected by a socket pair, and
+key exchange performed, as :class:`x84.ssh.ConnectSsh` does for each new
+connection.  Each key type supported by the installed version of paramiko
+is measured, first parsing moduli for each connection, as before, then
+with moduli loaded only once, as by :class:`x84.ssh.SshServer`.
+
+Usage::
+
+    python bench/bench_ssh.py [handshakes]
+"""
+from __future__ import print_function
+import socket
+import time
+import sys
+
+
+def generate_key(keytype):
+    """ Return new host key of ``keytype``, or None if unsupported. """
+    import paramiko
+    from x84.ssh import SshServer
+    key_class = getattr(paramiko, SshServer.HOST_KEY_TYPES[keytype], None)
+    if key_class is None:
+        return None
+    if keytype == 'rsa':
+        return key_class.generate(bits=2048)
+    return key_class.generate()
+
+
+def handshake(host_key, load_moduli):
+    """ Perform key exchange of a client and server transport. """
+    import paramiko
+    client_sock, server_sock = socket.socketpair()
+    server = paramiko.Transport(server_sock)
+    client = paramiko.Transport(client_sock)
+    try:
+        if load_moduli:
+            server.load_server_moduli()
+        server.add_server_key(host_key)
+        server.start_server(server=paramiko.ServerInterface())
+        client.start_client()
+        assert client.get_remote_server_key() == host_key
+    finally:
+        client.close()
+        server.close()
+
+
+def main(num=50):
+    """ Program entry point. """
+    import paramiko
+    from x84.ssh import SshServer
+    for keytype in sorted(SshServer.HOST_KEY_TYPES):
+        host_key = generate_key(keytype)
+        if host_key is None:
+            print('{0:>8}: not supported by paramiko {1}'
+                  .format(keytype, paramiko.__version__))
+            continue
+        results = []
+        for load_moduli in (True, False):
+            paramiko.Transport.load_server_moduli()
+            stime = time.time()
+            for _ in range(num):
+                handshake(host_key, load_moduli)
+            results.append(num / (time.time() - stime))
+        print('{0:>8}: {1:8.1f} handshakes/sec -> {2:8.1f} handshakes/sec'
+              .format(keytype, *results))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
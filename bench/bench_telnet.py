@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Benchmark throughput (MB/s) of telnet input parsing by TelnetClient.
+
+Compares :meth:`x84.telnet.TelnetClient._iac_scan` against calling
+:meth:`x84.telnet.TelnetClient._iac_sniffer` for each byte received,
+the previous parser, for plain text, binary data (as by a file transfer,
+where byte 255 is escaped as ``IAC IAC``) and text mixed with telnet
+commands, each received in chunks of a few sizes.
+
+Usage::
+
+    python bench/bench_telnet.py [megabytes]
+"""
+from __future__ import print_function
+import logging
+import random
+import time
+import sys
+
+
+def per_byte(client, data):
+    """ Previous parser: each byte through the IAC state machine. """
+    for byte in data:
+        # pylint: disable=W0212
+        #         Access to a protected member
+        client._iac_sniffer(byte)
+
+
+def scan(client, data):
+    """ Current parser: runs of bytes between IAC sequences in bulk. """
+    # pylint: disable=W0212
+    #         Access to a protected member
+    client._iac_scan(data)
+
+
+def get_payloads(size):
+    """ Return dict of sample payloads of about ``size`` bytes. """
+    from telnetlib import IAC, NOP
+    rand = random.Random(0)
+    text = ''.join(chr(rand.randint(32, 126)) for _ in range(size))
+    binary = ''.join(chr(rand.randint(0, 255)) for _ in range(size))
+    mixed = (IAC + NOP).join(text[pos:pos + 100]
+                             for pos in range(0, size, 100))
+    return {'text': text,
+            'binary': binary.replace(IAC, IAC + IAC),
+            'mixed': mixed}
+
+
+def measure(parser, data, chunksize):
+    """ Return MB/s and received bytes of ``parser`` over ``data``. """
+    from x84.telnet import TelnetClient
+    client = TelnetClient(sock=None, address_pair=('127.0.0.1', 0))
+    chunks = [data[pos:pos + chunksize]
+              for pos in range(0, len(data), chunksize)]
+    stime = time.time()
+    for chunk in chunks:
+        parser(client, chunk)
+    duration = time.time() - stime
+    return (len(data) / duration / 1024 / 1024,
+            client.recv_buffer.tostring())
+
+
+def main(megabytes=4):
+    """ Program entry point. """
+    # telnet commands are logged at debug level; measure parsing only.
+    logging.disable(logging.CRITICAL)
+    payloads = get_payloads(int(megabytes * 1024 * 1024))
+    for kind in ('text', 'binary', 'mixed'):
+        for chunksize in (64, 4096):
+            before, expected = measure(per_byte, payloads[kind], chunksize)
+            after, received = measure(scan, payloads[kind], chunksize)
+            assert received == expected, kind
+            print('{0:>8} ({1:>4}-byte chunks): {2:8.2f} MB/s -> '
+                  '{3:8.2f} MB/s ({4:.1f}x)'
+                  .format(kind, chunksize, before, after, after / before))
+
+
+if __name__ == '__main__':
+    main(*map(float, sys.argv[1:]))
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+""" Tests of virtual screen buffer :class:`x84.bbs.ansiwin.Screen`. """
+
+
+def get_screen(ucs):
+    """ Return new Screen of an 80x25 terminal, displaying ``ucs``. """
+    from x84.bbs.ansiwin import Screen
+    from x84.terminal import Terminal
+    term = Terminal(kind='xterm-256color', stream=None, rows=25, columns=80)
+    screen = Screen(term)
+    screen.write(ucs)
+    return term, screen
+
+
+def marked(ucs):
+    """ Return ``ucs`` as returned by a differential method. """
+    from x84.bbs.ansiwin import RENDER_BEGIN, RENDER_END
+    return RENDER_BEGIN + ucs + RENDER_END
+
+
+def test_render_concatenated():
+    """ Two renders written together display as their sequences would. """
+    term = get_screen(u'')[0]
+    initial = (term.normal + term.move(0, 0) + u'xxxxxxxx' +
+               term.move(1, 0) + u'yyyy' + term.move(0, 2))
+    first = term.move(1, 0) + term.bold + u'AAAA'
+    second = term.move(0, 4) + term.normal + u'B'
+    _, screen = get_screen(initial)
+    _, display = get_screen(initial)
+    _, expected = get_screen(initial)
+
+    display.write(screen.write(marked(first) + marked(second)))
+    expected.write(first + second)
+
+    assert display.cells == expected.cells
+    assert display.cursor == expected.cursor
+    assert display.cells[0][4] == (u'B', u'')
+    assert display.cells[1][0][0] == u'A'
+
+
+def test_render_unchanged():
+    """ Render of what is already displayed draws no cells. """
+    term = get_screen(u'')[0]
+    ucs = term.move(3, 3) + u'hello'
+    _, screen = get_screen(ucs)
+    assert u'hello' not in screen.write(marked(ucs))
+
+
+def test_render_after_clear():
+    """ Render written after clear in the same write draws all cells. """
+    term = get_screen(u'')[0]
+    ucs = term.move(3, 3) + u'hello'
+    _, screen = get_screen(ucs)
+    output = screen.write(term.clear + marked(ucs))
+    assert output.startswith(term.clear)
+    assert u'hello' in output
+    assert screen.cells[3][3:8] == [(u'h', u''), (u'e', u''), (u'l', u''),
+                                    (u'l', u''), (u'o', u'')]
+
+
+def test_direct_write_invalidates():
+    """ Text written directly to stream, as by blessed, forgets display. """
+    from x84.bbs.ipc import IPCStream
+
+    class Writer(object):
+
+        """ Stand-in for output pipe. """
+
+        def send(self, data):
+            """ Discard data. """
+            pass
+
+    term = get_screen(u'')[0]
+    ucs = term.move(3, 3) + u'hello'
+    _, screen = get_screen(ucs)
+    stream = IPCStream(Writer())
+    stream.screen = screen
+    stream.write(term.move(3, 3) + u'hello', 'utf8')
+    assert screen.cells[3][3] == (u'h', u'')
+    stream.write(term.enter_fullscreen)
+    assert screen.cells[3][3] is None
+    assert u'hello' in screen.write(marked(ucs))
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+""" Tests of message base migration of :mod:`x84.bbs.msgbase`. """
+import tempfile
+import shutil
+
+
+def setup_function(function):
+    """ Configure a temporary data folder. """
+    import x84.bbs.ini
+    function.datapath = tempfile.mkdtemp()
+    x84.bbs.ini.CFG = x84.bbs.ini.init_bbs_ini()
+    x84.bbs.ini.CFG.set('system', 'datapath', function.datapath)
+
+
+def teardown_function(function):
+    """ Remove temporary data folder. """
+    shutil.rmtree(function.datapath)
+
+
+def test_migrate_readmsgs_unicode_handle():
+    """ Read messages of a non-ascii handle are migrated to ReadMsgs. """
+    from x84.bbs.dbproxy import DBProxy
+    from x84.bbs.userbase import USERDB
+    from x84.bbs.msgbase import (
+        MSGBASE_VERSION, MSGDB, ReadMsgs, migrate_msgbase)
+    handle = u'b\xf6b'
+    DBProxy(USERDB, 'attrs', use_session=False)[handle] = {
+        'readmsgs': set([1, 3, 9000])}
+    DBProxy(MSGDB, 'meta', use_session=False)['version'] = 2
+
+    migrate_msgbase()
+
+    readmsgs = ReadMsgs(handle)
+    assert readmsgs.unread(range(10)) == set([0, 2, 4, 5, 6, 7, 8, 9])
+    assert 9000 in readmsgs
+    attrs = DBProxy(USERDB, 'attrs', use_session=False)[handle]
+    assert 'readmsgs' not in attrs
+    assert (DBProxy(MSGDB, 'meta', use_session=False)['version']
+            == MSGBASE_VERSION)
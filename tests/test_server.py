@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+""" Tests of negotiation pool of :class:`x84.server.BaseServer`. """
+
+
+def get_server(section):
+    """ Return BaseServer with connect pool of default ``section``. """
+    import x84.bbs.ini
+    from x84.server import BaseServer
+    server = BaseServer()
+    server.start_connect_pool(x84.bbs.ini.init_bbs_ini(), section)
+    return server
+
+
+def test_ssh_stalled_peers_cannot_fill_pool():
+    """ Idle ssh peers each hold their own thread, none are refused. """
+    server = get_server('ssh')
+    assert server.connect_pool is None
+
+
+def test_telnet_negotiation_pooled():
+    """ Telnet negotiation, bounded by seconds, is pooled by default. """
+    server = get_server('telnet')
+    try:
+        assert server.connect_pool is not None
+        assert not server.connect_pool.full()
+    finally:
+        server.connect_pool.shutdown()
+        for worker in server.connect_pool.workers:
+            worker.join()
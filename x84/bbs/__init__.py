@@ -13,7 +13,10 @@ from x84.bbs.exception import Disconnected, Goto
 from x84.bbs.ini import get_ini
 from x84.bbs.lightbar import Lightbar
 from x84.bbs.modem import send_modem, recv_modem
-from x84.bbs.msgbase import list_msgs, get_msg, list_tags, Msg, list_privmsgs
+from x84.bbs.msgbase import (list_msgs, get_msg, list_tags, Msg,
+                              list_privmsgs, list_msgs_since,
+                              get_last_msg_idx, ReadMsgs, search_msgs,
+                              )
 from x84.bbs.output import (echo, timeago, encode_pipe, decode_pipe,
                             syncterm_setfont, showart, ropen,
                             from_cp437,  # deprecated in v2.0
@@ -37,5 +40,6 @@ __all__ = ('list_users', 'get_user', 'find_user', 'User', 'Group', 'list_msgs',
            'goto', 'disconnect', 'getsession', 'getterminal', 'getch', 'gosub',
            'ropen', 'showart', 'Dropfile', 'encode_pipe',
            'decode_pipe', 'syncterm_setfont', 'get_ini', 'send_modem',
-           'recv_modem', 'Script', 'list_privmsgs',
+           'recv_modem', 'Script', 'list_privmsgs', 'list_msgs_since',
+           'get_last_msg_idx', 'ReadMsgs', 'search_msgs',
            )
@@ -1,4 +1,8 @@
 """ Ansi Windowing package for x/84. """
+# std imports
+import unicodedata
+import functools
+import re
 
 GLYPHSETS = {
     'ascii': {
@@ -53,6 +57,306 @@ GLYPHSETS = {
 }
 
 
+#: terminal sequences and text, as interpreted by :class:`Screen`.
+RE_SCREEN_TOKENS = re.compile(
+    u'\x1b\\[([0-9;?]*)([@-~])'     # control sequence (CSI)
+    u'|(\x1b[()][0-9A-Za-z])'       # character set designation
+    u'|(\x1b.?)'                    # any other escape sequence
+    u'|([\x00-\x1f])'               # control character
+    u'|([^\x00-\x1f\x1b]+)',        # printable text
+    re.DOTALL)
+
+#: marks the beginning of a sequence returned by a :func:`differential`
+#: method, rendered by :meth:`Screen.write`; a unicode noncharacter.
+RENDER_BEGIN = u'\ufdd0'
+
+#: marks the end of a sequence returned by a :func:`differential` method.
+RENDER_END = u'\ufdd1'
+
+RE_RENDER = re.compile(u'({0}|{1})'.format(RENDER_BEGIN, RENDER_END))
+
+
+class Screen(object):
+
+    """
+    Virtual screen buffer of a session's terminal.
+
+    A grid of cells, each a tuple of ``(character, attribute)``, is kept
+    of what is known to be displayed by the client, updated by
+    :meth:`write` for all text written by the session.  Sequences of
+    cursor movement, attributes and text returned by :func:`differential`
+    methods are then replaced by :meth:`render` with only the minimal
+    sequence of cursor movement and changed cells to produce the same
+    display.
+
+    Sequences not understood, such as scrolling, and any clear of the
+    screen or switch to the alternate screen forget the display, which is
+    then fully redrawn by the next render.
+    """
+
+    def __init__(self, term):
+        """
+        Class initializer.
+
+        :param blessed.Terminal term: terminal of session.
+        """
+        self._term = term
+        self.height, self.width = term.height, term.width
+        self.cells = None
+        self.cursor = None
+        self.attr = None
+        self.invalidate()
+
+    def invalidate(self):
+        """ Forget all contents, cursor position and attribute of display. """
+        self.height, self.width = self._term.height, self._term.width
+        self.cells = [[None] * self.width for _ in range(self.height)]
+        self.cursor = None
+        self.attr = None
+
+    def _check_size(self):
+        """ Invalidate display when the terminal has been resized. """
+        if (self._term.height, self._term.width) != (self.height, self.width):
+            self.invalidate()
+
+    def _interpret(self, ucs):
+        """
+        Interpret sequence ``ucs`` from current cursor and attribute.
+
+        :rtype: tuple
+        :returns: ``(cells, cursor, attr)``, where ``cells`` is a dictionary
+                  of ``(row, col)`` to final ``(character, attribute)``, and
+                  ``cursor`` and ``attr`` are their final values; or ``None``
+                  when the sequence cannot be interpreted.
+        """
+        # pylint: disable=R0912,R0915
+        #         Too many branches
+        #         Too many statements
+        cells = dict()
+        height, width = self.height, self.width
+        row, col = self.cursor or (None, None)
+        attr = self.attr
+        for match in RE_SCREEN_TOKENS.finditer(ucs):
+            params, final, charset, escape, ctrl, text = match.groups()
+            if text is not None:
+                if row is None:
+                    return None
+                for char in text:
+                    if col >= width:
+                        # automatic margins
+                        row, col = row + 1, 0
+                    if row >= height or (
+                            char > u'\u02ff' and (
+                                unicodedata.combining(char) or
+                                unicodedata.east_asian_width(char) in 'WF')):
+                        # scrolling, or not a single-cell character
+                        return None
+                    cells[(row, col)] = (char, attr or u'')
+                    col += 1
+            elif final is not None:
+                args = [int(arg) if arg.isdigit() else None
+                        for arg in params.split(u';')]
+                arg = args[0] or 0
+                if final == u'm':
+                    attr = (u'' if args[0] in (None, 0) and len(args) == 1
+                            else match.group(0) if args[0] in (None, 0)
+                            else (attr or u'') + match.group(0))
+                elif final in u'Hf':
+                    row = min(height, max(1, arg)) - 1
+                    col = min(width, max(1, args[1:] and args[1] or 1)) - 1
+                elif final == u'd' and row is not None:
+                    row = min(height, max(1, arg)) - 1
+                elif final in u'G`' and row is not None:
+                    col = min(width, max(1, arg)) - 1
+                elif final in u'ABCD' and row is not None:
+                    arg = max(1, arg)
+                    row, col = {
+                        u'A': (max(0, row - arg), col),
+                        u'B': (min(height - 1, row + arg), col),
+                        u'C': (row, min(width - 1, col + arg)),
+                        u'D': (row, max(0, min(width - 1, col) - arg)),
+                    }[final]
+                elif final in u'JK' and arg in (0, 1, 2):
+                    if row is None or (final, arg) == (u'J', 2):
+                        # clear screen, whose background is not certain.
+                        return None
+                    # erase a range of cells, by offset from top-left.
+                    here = row * width + min(col, width - 1)
+                    first, last = ((here, height * width - 1),
+                                   (0, here),
+                                   (0, height * width - 1))[arg]
+                    if final == u'K':
+                        first = max(first, row * width)
+                        last = min(last, row * width + width - 1)
+                    blank = (u' ', attr or u'')
+                    for offset in range(first, last + 1):
+                        cells[divmod(offset, width)] = blank
+                elif final not in u'hl' or params in (
+                        u'?47', u'?1047', u'?1049'):
+                    # such as scrolling regions, save and restore cursor,
+                    # or switch to and from alternate screen.
+                    return None
+            elif charset is not None:
+                attr = (attr or u'') + charset
+            elif ctrl is not None:
+                if ctrl == u'\x07':
+                    continue
+                if row is None or ctrl not in u'\r\n\x08':
+                    return None
+                if ctrl == u'\r':
+                    col = 0
+                elif ctrl == u'\x08':
+                    col = max(0, min(width - 1, col) - 1)
+                elif row == height - 1:
+                    # scrolling
+                    return None
+                else:
+                    row += 1
+            elif escape is not None:
+                return None
+        return (cells, None if row is None else (row, col), attr)
+
+    def update(self, ucs):
+        """ Update display by sequence ``ucs`` written to terminal. """
+        self._check_size()
+        result = self._interpret(ucs)
+        if result is None:
+            self.invalidate()
+            return
+        cells, self.cursor, self.attr = result
+        for (row, col), cell in cells.items():
+            self.cells[row][col] = cell
+
+    def _draw(self, cells, positions, attr):
+        """
+        Return sequence drawing cells at ``positions`` with their attributes.
+
+        :param dict cells: cells to be drawn, otherwise as displayed.
+        :param list positions: ``(row, col)`` of consecutive cells.
+        :param str attr: current attribute, ``None`` if unknown.
+        :rtype: tuple
+        :returns: sequence and final attribute.
+        """
+        output = []
+        for row, col in positions:
+            char, cell_attr = cells.get((row, col)) or self.cells[row][col]
+            if cell_attr != attr:
+                output.append(self._term.normal + cell_attr)
+                attr = cell_attr
+            output.append(char)
+        return u''.join(output), attr
+
+    def render(self, ucs):
+        """
+        Return minimal sequence producing the same display as ``ucs``.
+
+        Only cells that differ from the current display are drawn; the
+        cursor position and attribute are left as they would be by ``ucs``.
+        The display is not changed; the result is only valid when written
+        next, as by :meth:`write`.
+
+        :param str ucs: sequence of cursor movement, attributes and text.
+        :rtype: str
+        """
+        self._check_size()
+        result = self._interpret(ucs)
+        if result is None:
+            return ucs
+        cells, cursor, attr = result
+        if cursor is not None and cursor[1] >= self.width:
+            # cursor is beyond the final column, awaiting automatic margins.
+            return ucs
+        changed = sorted(pos for pos, cell in cells.items()
+                         if self.cells[pos[0]][pos[1]] != cell)
+        output = []
+        cur_pos, cur_attr = self.cursor, self.attr
+        for pos in changed:
+            if cur_pos != pos:
+                move = self._term.move(*pos)
+                gap = []
+                if cur_pos is not None and cur_pos[0] == pos[0]:
+                    gap = [(pos[0], col) for col in range(cur_pos[1], pos[1])]
+                if gap and all(cells.get(_pos) or self.cells[_pos[0]][_pos[1]]
+                               for _pos in gap):
+                    # redraw the few unchanged cells between, when shorter
+                    # than moving the cursor over them.
+                    between, gap_attr = self._draw(cells, gap, cur_attr)
+                    if len(between) < len(move):
+                        move, cur_attr = between, gap_attr
+                output.append(move)
+            seq, cur_attr = self._draw(cells, [pos], cur_attr)
+            output.append(seq)
+            cur_pos = (pos[0], pos[1] + 1)
+        if attr is not None and attr != cur_attr:
+            output.append(self._term.normal + attr)
+        if cursor is not None and cursor != cur_pos:
+            output.append(self._term.move(*cursor))
+        return u''.join(output)
+
+    def write(self, ucs):
+        """
+        Return sequence to be written for ``ucs``, updating display.
+
+        Text between :data:`RENDER_BEGIN` and :data:`RENDER_END`, as
+        returned by :func:`differential` methods, is replaced by its
+        :meth:`render` from the display as left by all text before it.
+        Other text is written unchanged.
+
+        :param str ucs: text written by session.
+        :rtype: str
+        """
+        output, drawing, depth = [], [], 0
+        for part in RE_RENDER.split(ucs):
+            if part == RENDER_BEGIN:
+                depth += 1
+                continue
+            elif part == RENDER_END:
+                depth = max(0, depth - 1)
+                if depth:
+                    continue
+                part, drawing = self.render(u''.join(drawing)), []
+            elif depth:
+                drawing.append(part)
+                continue
+            if part:
+                self.update(part)
+                output.append(part)
+        if drawing:
+            # not terminated, such as when sliced by caller.
+            part = self.render(u''.join(drawing))
+            self.update(part)
+            output.append(part)
+        return u''.join(output)
+
+
+def differential(method):
+    """
+    Decorate window method returning a sequence for drawing.
+
+    When a :class:`Screen` is used by the window, the sequence returned is
+    marked by :data:`RENDER_BEGIN` and :data:`RENDER_END`, to be replaced
+    by :meth:`Screen.write` with only the difference from the display at
+    the time it is written by the session.  Methods so decorated may call
+    one another, only the outermost sequence is marked.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        # pylint: disable=C0111,W0212
+        #         Missing docstring
+        #         Access to a protected member
+        if self.screen is None or self._rendering:
+            return method(self, *args, **kwargs)
+        self._rendering = True
+        try:
+            ucs = method(self, *args, **kwargs)
+        finally:
+            self._rendering = False
+        if not ucs:
+            return ucs
+        return u''.join((RENDER_BEGIN, ucs, RENDER_END))
+    return wrapper
+
+
 class AnsiWindow(object):
 
     """
@@ -68,6 +372,14 @@ class AnsiWindow(object):
     #        Too many instance attributes
     #        Too many arguments
 
+    #: :class:`Screen` of session, when enabled by ``[session]`` option
+    #: ``screen_buffer``; sequences returned are then only the difference
+    #: from what is currently displayed.
+    screen = None
+
+    #: whether a :func:`differential` method is currently drawing.
+    _rendering = False
+
     def __init__(self, height, width, yloc, xloc, colors=None, glyphs=None):
         """
         Class initializer for base windowing class.
@@ -79,8 +391,9 @@ class AnsiWindow(object):
         :param dict colors: color theme.
         :param dict glyphs: bordering window character glyphs.
         """
-        from x84.bbs.session import getterminal
-        self._term = getterminal()
+        from x84.bbs.session import getsession
+        self._term = getsession().terminal
+        self.screen = getsession().screen
 
         self.height = height
         self.width = width
@@ -201,18 +514,21 @@ class AnsiWindow(object):
         return self._term.move((yloc and yloc or 0) + self.yloc,
                                (xloc and xloc or 0) + self.xloc)
 
+    @differential
     def title(self, ansi_text):
         """ Return sequence for displaying text on top border of window. """
         xloc = self.width / 2 - min(self._term.length(ansi_text) / 2,
                                     self.width / 2)
         return self.pos(0, max(0, xloc)) + ansi_text
 
+    @differential
     def footer(self, text):
         """ Return sequence for displaying text on bottom border of window. """
         xloc = self.width / 2 - min(self._term.length(text) / 2,
                                     self.width / 2)
         return self.pos(max(0, self.height - 1), max(0, xloc)) + text
 
+    @differential
     def border(self):
         """ Return sequence suitable for drawing window border. """
         # pylint: disable=R0912
@@ -267,6 +583,7 @@ class AnsiWindow(object):
         return (self.colors.get('border', u'') + rstr +
                 self.colors.get('normal', u''))
 
+    @differential
     def erase_border(self):
         """ Return sequence suitable for erasing only the window border. """
         save = self.glyphs.copy()
@@ -281,6 +598,7 @@ class AnsiWindow(object):
         self.glyphs = save
         return ucs
 
+    @differential
     def erase(self):
         """ Return sequence suitable for erasing full window (with border). """
         return u''.join([self.pos(y, 0)
@@ -288,6 +606,7 @@ class AnsiWindow(object):
                          for y in range(self.height)
                          ])
 
+    @differential
     def clear(self):
         """ Return sequence suitable for erasing contents window. """
         return u''.join([self.pos(self.ypadding + yloc, self.xpadding)
@@ -1,5 +1,7 @@
 """ Database proxy helper for x/84. """
 # std imports
+import collections
+import cPickle
 import logging
 
 # local
@@ -10,8 +12,80 @@ from x84.db import (
     get_db_func,
     get_db_lock,
     log_db_cmd,
+    execute_batch,
+    is_db_write,
+    notify_db_write,
 )
 
+#: dictionary methods whose results may be cached by :class:`DBCache`.
+CACHE_METHODS = ('__contains__', '__getitem__', 'get', 'has_key',
+                 '__len__', 'keys', 'values', 'items')
+
+#: default number of results cached for each table, ``[session]`` option
+#: ``db_cache_size`` of the configuration file.
+CACHE_SIZE = 256
+
+#: :class:`DBCache` instances of this session, keyed by ``(schema, table)``.
+CACHES = dict()
+
+
+class DBCache(object):
+
+    """
+    Size-bounded, least-recently-used cache of database results.
+
+    Results are kept pickled, so that each caller receives its own copy,
+    just as when received over the session IPC pipe.  The :attr:`generation`
+    is incremented by each :meth:`clear`, so that a result requested before
+    an invalidation but received after it is not stored.
+    """
+
+    def __init__(self, maxlen=CACHE_SIZE):
+        """
+        Class initializer.
+
+        :param int maxlen: maximum number of results kept.
+        """
+        self.maxlen = maxlen
+        self.generation = 0
+        self._items = collections.OrderedDict()
+
+    def __contains__(self, key):
+        """ Whether a result is cached for ``key``. """
+        return key in self._items
+
+    def get(self, key):
+        """ Return copy of result cached for ``key``, moved to most-recent. """
+        value = self._items.pop(key)
+        self._items[key] = value
+        return cPickle.loads(value)
+
+    def set(self, key, value, generation):
+        """ Cache ``value`` for ``key``, unless cleared since generation. """
+        if generation != self.generation:
+            return
+        self._items.pop(key, None)
+        self._items[key] = cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL)
+        while len(self._items) > self.maxlen:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        """ Discard all cached results. """
+        self.generation += 1
+        self._items.clear()
+
+
+def invalidate_cache(schema, table):
+    """
+    Discard results cached by this session for ``(schema, table)``.
+
+    Called for the ``cache-invalidate`` event, broadcast by the engine
+    to sessions caching a table when it is modified by another session.
+    """
+    cache = CACHES.get((schema, table))
+    if cache is not None:
+        cache.clear()
+
 
 class DBProxy(object):
 
@@ -22,9 +96,14 @@ class DBProxy(object):
     to the main engine when ``use_session`` is True, which spawns a thread
     to acquire a lock on the database and return the results via IPC pipe
     transfer.
+
+    When ``cached`` is True, results of read-only methods are kept by a
+    :class:`DBCache` of this session until the table is modified, avoiding
+    a round trip for tables that are frequently read but rarely written.
     """
 
-    def __init__(self, schema, table='unnamed', use_session=True):
+    def __init__(self, schema, table='unnamed', use_session=True,
+                 cached=False):
         """
         Class initializer.
 
@@ -35,6 +114,9 @@ class DBProxy(object):
                                  :class:`x84.bbs.session.Session` instance),
                                  or returned directly (such as used by the main
                                  thread engine components.)
+        :param bool cached: Whether results of read-only methods may be
+                            cached by this session.  Only used when
+                            ``use_session`` is True.
         """
         self.log = logging.getLogger(__name__)
         self.schema = schema
@@ -43,6 +125,7 @@ class DBProxy(object):
 
         from x84.bbs.session import getsession
         self._session = use_session and getsession()
+        self._cached = bool(self._session) and cached
 
     def proxy_iter_session(self, method, *args):
         """ Proxy for iterable-return method calls over session IPC pipe. """
@@ -66,7 +149,10 @@ class DBProxy(object):
             func = get_db_func(dictdb, method)
             if self._tap_db:
                 log_db_cmd(self.log, self.schema, method, args)
-            return func(*args)
+            result = func(*args)
+            if is_db_write(method, args):
+                notify_db_write(self.schema, self.table)
+            return result
         finally:
             dictdb.close()
 
@@ -80,16 +166,110 @@ class DBProxy(object):
     def proxy_method(self, method, *args):
         """ Proxy for dictionary method calls. """
         if self._session:
+            if self._cached and method in CACHE_METHODS:
+                return self.proxy_method_cached(method, *args)
+            if is_db_write(method, args):
+                invalidate_cache(self.schema, self.table)
             return self.proxy_method_session(method, *args)
 
         return self.proxy_method_direct(method, *args)
 
+    def get_cache(self):
+        """
+        Return :class:`DBCache` of this session for schema and table.
+
+        On first use, the engine is asked to send a ``cache-invalidate``
+        event to this session whenever the table is modified.
+        """
+        key = (self.schema, self.table)
+        if key not in CACHES:
+            maxlen = get_ini('session', 'db_cache_size', getter='getint')
+            CACHES[key] = DBCache(maxlen=maxlen or CACHE_SIZE)
+            self._session.send_event('cache-subscribe', key)
+        return CACHES[key]
+
+    def proxy_method_cached(self, method, *args):
+        """ Proxy for dictionary method calls, by cache when possible. """
+        cache = self.get_cache()
+
+        # receive any invalidation events already sent by the engine.
+        self._session.buffer_events()
+        key = (method, args)
+        try:
+            if key in cache:
+                return cache.get(key)
+        except TypeError:
+            # unhashable arguments, such as a list as default value of get()
+            return self.proxy_method_session(method, *args)
+        generation = cache.generation
+        result = self.proxy_method_session(method, *args)
+        cache.set(key, result, generation)
+        return result
+
     def proxy_method_session(self, method, *args):
         """ Proxy for dictionary method calls over IPC pipe. """
         event = 'db-{0}'.format(self.schema)
         self._session.send_event(event, (self.table, method, args))
         return self._session.read_event(event)
 
+    def proxy_batch_direct(self, operations):
+        """ Proxy for a batch of direct dictionary method calls. """
+        dictdb = get_database(filepath=get_db_filepath(self.schema),
+                              table=self.table, autocommit=False)
+        try:
+            if self._tap_db:
+                log_db_cmd(self.log, self.schema, 'batch', operations)
+            results = execute_batch(dictdb, operations)
+            if is_db_write('batch', (operations,)):
+                notify_db_write(self.schema, self.table)
+            return results
+        finally:
+            # when not committed by execute_batch(), changes are discarded.
+            dictdb.close()
+
+    def batch(self, operations):
+        """
+        Execute many dictionary methods in a single transaction.
+
+        Only one round trip over the session IPC pipe is made for all
+        ``operations``, which are either all applied or, when any method
+        raises an exception, none at all.
+
+        :param list operations: sequence of ``(method, args)``, for example,
+                                ``[('get', (key,)), ('__delitem__', (key,))]``.
+        :rtype: list
+        :returns: return values of each method, in order of ``operations``.
+        """
+        operations = [(method, tuple(args)) for method, args in operations]
+        if not operations:
+            return []
+        if self._session:
+            if is_db_write('batch', (operations,)):
+                invalidate_cache(self.schema, self.table)
+            return self.proxy_method_session('batch', operations)
+        return self.proxy_batch_direct(operations)
+
+    def fts_index(self, docid, document):
+        """
+        Add or replace ``document`` in full-text search table.
+
+        :param int docid: document id, returned by :meth:`fts_search`.
+        :param dict document: text of each column, keyed by column name.
+        """
+        return self.proxy_method('fts_index', docid, document)
+
+    def fts_remove(self, docid):
+        """ Remove document ``docid`` from full-text search table. """
+        return self.proxy_method('fts_remove', docid)
+
+    def fts_search(self, query, offset=0, limit=20):
+        """
+        Return document ids matching all words of ``query``.
+
+        See :func:`x84.db.fts_search`.
+        """
+        return self.proxy_method('fts_search', query, offset, limit)
+
     def acquire(self):
         """ Acquire system-wide lock on database. """
         lock = get_db_lock(schema=self.schema, table=self.table)
@@ -148,11 +148,30 @@ def init_bbs_ini():
     cfg_bbs.set('system', 'pass_ucase', 'no')
     # default encoding for the showart function on UTF-8 capable terminals
     cfg_bbs.set('system', 'art_utf8_codec', 'cp437')
+    # number of decoded art files cached by the showart function
+    cfg_bbs.set('system', 'art_cache_size', '64')
+    # number of database worker threads (and connections per table).
+    cfg_bbs.set('system', 'db_workers', '4')
+    # number of session processes pre-forked before clients connect, with
+    # a terminal of session_pool_term; clients of any other TERM are
+    # started in a new process.
+    cfg_bbs.set('system', 'session_pool_size', '2')
+    cfg_bbs.set('system', 'session_pool_term', 'ansi')
 
     cfg_bbs.add_section('telnet')
     cfg_bbs.set('telnet', 'enabled', 'yes')
     cfg_bbs.set('telnet', 'addr', '127.0.0.1')
     cfg_bbs.set('telnet', 'port', '6023')
+    # when non-zero, negotiate connections in this many re-used threads,
+    # with at most negotiation_queue connections waiting; further
+    # connections are refused as busy.
+    cfg_bbs.set('telnet', 'negotiation_threads', '8')
+    cfg_bbs.set('telnet', 'negotiation_queue', '32')
+    # MCCP2 output compression, zlib level (1-9), memlevel (1-9), wbits (9-15)
+    cfg_bbs.set('telnet', 'compression', 'yes')
+    cfg_bbs.set('telnet', 'compression_level', '6')
+    cfg_bbs.set('telnet', 'compression_memlevel', '8')
+    cfg_bbs.set('telnet', 'compression_wbits', '15')
 
     cfg_bbs.add_section('ssh')
     try:
@@ -164,9 +183,23 @@ def init_bbs_ini():
         cfg_bbs.set('ssh', 'enabled', 'no')
     cfg_bbs.set('ssh', 'addr', '127.0.0.1')
     cfg_bbs.set('ssh', 'port', '6022')
-    cfg_bbs.set('ssh', 'hostkey', os.path.expanduser(
-        os.path.join('~', '.x84', 'ssh_host_rsa_key')))
+    # host key of type rsa or ecdsa; an existing rsa key is kept, so that
+    # clients do not warn that the host key has changed.
+    rsa_hostkey = os.path.expanduser(
+        os.path.join('~', '.x84', 'ssh_host_rsa_key'))
+    if os.path.exists(rsa_hostkey):
+        cfg_bbs.set('ssh', 'hostkeytype', 'rsa')
+        cfg_bbs.set('ssh', 'hostkey', rsa_hostkey)
+    else:
+        cfg_bbs.set('ssh', 'hostkeytype', 'ecdsa')
+        cfg_bbs.set('ssh', 'hostkey', os.path.expanduser(
+            os.path.join('~', '.x84', 'ssh_host_ecdsa_key')))
     cfg_bbs.set('ssh', 'hostkeybits', '2048')
+    # ssh negotiation may wait 30 seconds on an idle peer at each stage, a
+    # few idle connections would hold every pooled thread; each connection
+    # is negotiated in a thread of its own unless set.
+    cfg_bbs.set('ssh', 'negotiation_threads', '0')
+    cfg_bbs.set('ssh', 'negotiation_queue', '32')
 
     cfg_bbs.add_section('sftp')
     cfg_bbs.set('sftp', 'enabled', 'no')
@@ -184,6 +217,8 @@ def init_bbs_ini():
     cfg_bbs.set('rlogin', 'enabled', 'no')
     cfg_bbs.set('rlogin', 'addr', '127.0.0.1')
     cfg_bbs.set('rlogin', 'port', '513')
+    cfg_bbs.set('rlogin', 'negotiation_threads', '8')
+    cfg_bbs.set('rlogin', 'negotiation_queue', '32')
 
     # web
     cfg_bbs.add_section('web')
@@ -219,6 +254,16 @@ def init_bbs_ini():
     cfg_bbs.set('session', 'tap_events', 'no')
     cfg_bbs.set('session', 'tap_db', 'no')
     cfg_bbs.set('session', 'default_encoding', 'utf8')
+    cfg_bbs.set('session', 'db_cache_size', '256')
+    cfg_bbs.set('session', 'output_buffer_size', '8192')
+    cfg_bbs.set('session', 'output_buffer_delay', '0.05')
+    cfg_bbs.set('session', 'screen_buffer', 'no')
+    cfg_bbs.set('session', 'art_prewarm', '')
+    cfg_bbs.set('session', 'log_buffer_size', '64')
+    cfg_bbs.set('session', 'log_buffer_delay', '0.25')
+    cfg_bbs.set('session', 'log_drop_level', 'INFO')
+    # import scripts again by every goto or gosub, even when unmodified.
+    cfg_bbs.set('session', 'script_reload', 'no')
 
     cfg_bbs.add_section('irc')
     cfg_bbs.set('irc', 'server', 'efnet.portlane.se')
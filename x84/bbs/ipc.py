@@ -1,6 +1,8 @@
 """ Session IPC package for x/84. """
 # std imports
 import logging
+import select
+import time
 
 # local
 from x84.bbs.session import getsession
@@ -13,10 +15,59 @@ def make_root_logger(out_queue):
     Any existing handlers of the current process are removed and
     the root logger is re-address to send via an IPC output event
     queue.
+
+    :rtype: IPCLogHandler
     """
+    from x84.bbs.ini import get_ini
     root = logging.getLogger()
     map(root.removeHandler, root.handlers)
-    root.addHandler(IPCLogHandler(out_queue=out_queue))
+    handler = IPCLogHandler(
+        out_queue=out_queue,
+        max_records=get_ini('session', 'log_buffer_size',
+                            getter='getint') or 64,
+        max_delay=get_ini('session', 'log_buffer_delay',
+                          getter='getfloat') or 0.25,
+        drop_level=get_ini('session', 'log_drop_level') or 'INFO')
+    root.addHandler(handler)
+    return handler
+
+
+def pack_record(record, handle=None):
+    """
+    Return compact tuple of log record, as sent by :class:`IPCLogHandler`.
+
+    :param logging.LogRecord record: log record.
+    :param unicode handle: handle of session user, if any.
+    :rtype: tuple
+    """
+    return (record.name, record.levelno, record.pathname, record.lineno,
+            record.getMessage(), record.funcName, record.created,
+            record.processName, record.threadName, record.exc_text, handle)
+
+
+def unpack_records(records):
+    """
+    Generate log records of compact tuples sent by :class:`IPCLogHandler`.
+
+    Each record has the additional attribute ``handle``, of the session
+    user that logged it.
+
+    :param list records: tuples as returned by :func:`pack_record`.
+    :rtype: iter
+    """
+    for (name, levelno, pathname, lineno, msg, func, created,
+         process_name, thread_name, exc_text, handle) in records:
+        record = logging.LogRecord(name=name, level=levelno,
+                                   pathname=pathname, lineno=lineno,
+                                   msg=msg, args=None, exc_info=None,
+                                   func=func)
+        record.created = created
+        record.msecs = (created - int(created)) * 1000
+        record.processName = process_name
+        record.threadName = thread_name
+        record.exc_text = exc_text
+        record.handle = handle
+        yield record
 
 
 class IPCLogHandler(logging.Handler):
@@ -27,15 +78,46 @@ class IPCLogHandler(logging.Handler):
     This is a rather novel solution that seems overlooked in documentation,
     a forked process must have some method to propagate its logging records
     up through the main process, otherwise they are lost.
+
+    Records are sent as compact tuples (see :func:`pack_record`), batched
+    as a single ``logger`` event by :meth:`flush`, which is called by the
+    session along with its output, or by :meth:`emit` once ``max_records``
+    are buffered, the oldest has waited ``max_delay`` seconds, or a record
+    of level WARNING or higher is logged.  When the pipe is congested,
+    records below ``drop_level`` are dropped, and only their number sent.
     """
 
-    def __init__(self, out_queue):
-        """ Constructor method, requires multiprocessing.Pipe. """
+    def __init__(self, out_queue, max_records=64, max_delay=0.25,
+                 drop_level=logging.INFO):
+        """
+        Constructor method, requires multiprocessing.Pipe.
+
+        :param multiprocessing.Connection out_queue: IPC output pipe.
+        :param int max_records: flush when this many records are buffered.
+        :param float max_delay: flush when buffered records are this old,
+                                in seconds.
+        :param drop_level: records below this level, as name or number,
+                           are dropped when the pipe is congested.
+        """
         logging.Handler.__init__(self)
         self.oqueue = out_queue
+        self.max_records = max_records
+        self.max_delay = max_delay
+        if not isinstance(drop_level, int):
+            drop_level = logging.getLevelName(drop_level.upper())
+        self.drop_level = drop_level
+        self._buffer = []
+        self._buffer_time = None
+
+        #: number of records emitted.
+        self.num_records = 0
+        #: number of ``logger`` events sent to the engine.
+        self.num_sends = 0
+        #: number of records dropped as the pipe was congested.
+        self.num_dropped = 0
 
     def emit(self, record):
-        """ Emit log record via IPC output queue. """
+        """ Buffer log record for IPC output queue. """
         try:
             e_inf = record.exc_info
             if e_inf:
@@ -43,16 +125,59 @@ class IPCLogHandler(logging.Handler):
                 # sets record.exc_text
                 dummy = self.format(record)  # NOQA
                 record.exc_info = None
-            record.handle = None
+            handle = None
             session = getsession()
             if session:
-                record.handle = session.user.handle
-            self.oqueue.send(('logger', record))
+                handle = session.user.handle
+            self.num_records += 1
+            if not self._buffer:
+                self._buffer_time = time.time()
+            self._buffer.append(pack_record(record, handle))
+            if (len(self._buffer) >= self.max_records or
+                    record.levelno >= logging.WARNING or
+                    time.time() - self._buffer_time >= self.max_delay):
+                self.flush()
         except (KeyboardInterrupt, SystemExit):
             raise
         except Exception:
             self.handleError(record)
 
+    def congested(self):
+        """ Whether the IPC output queue would block on write. """
+        from x84.reactor import WIN32
+        if WIN32:
+            # win32 pipes cannot be polled by select(2).
+            return False
+        _, writable, _ = select.select([], [self.oqueue.fileno()], [], 0)
+        return not writable
+
+    def flush(self):
+        """ Send all buffered records to IPC output queue as one event. """
+        self.acquire()
+        try:
+            records, self._buffer = self._buffer, []
+            self._buffer_time = None
+        finally:
+            self.release()
+        if not records:
+            return
+        if self.congested():
+            # aggregate records below drop_level as a count of those dropped.
+            handle = records[-1][-1]
+            num_records = len(records)
+            records = [packed for packed in records
+                       if packed[1] >= self.drop_level]
+            num_dropped = num_records - len(records)
+            if num_dropped:
+                self.num_dropped += num_dropped
+                records.append(pack_record(logging.LogRecord(
+                    name=__name__, level=self.drop_level, pathname=__file__,
+                    lineno=0, msg='%d records below %s dropped, pipe '
+                    'congested.', args=(num_dropped, logging.getLevelName(
+                        self.drop_level)), exc_info=None), handle))
+        self.num_sends += 1
+        self.oqueue.send(('logger', records))
+
 
 class IPCStream(object):
 
@@ -63,25 +188,89 @@ class IPCStream(object):
     is polled for output in x84.engine.  Only the ``write()`` method of
     this "stream" and ``is_a_tty`` attribute is called or evaluated by
     blessed.Terminal.  The attribute ``is_a_tty`` is mocked as ``True``.
+
+    Output is coalesced: text written is buffered and sent as a single
+    ``output`` event by :meth:`flush`, which is called by the session
+    before waiting for input or sending any other event, or by
+    :meth:`write` once ``max_size`` characters are buffered or the oldest
+    buffered text has waited ``max_delay`` seconds.  A screen drawn by
+    many small writes is then sent by only a few pipe messages.
     """
 
-    def __init__(self, writer):
+    def __init__(self, writer, max_size=8192, max_delay=0.05):
+        """
+        Class initializer.
+
+        :param multiprocessing.Connection writer: IPC output pipe.
+        :param int max_size: flush when this many characters are buffered.
+        :param float max_delay: flush when buffered text is this old, in
+                                seconds.
+        """
         self.writer = writer
         self.is_a_tty = True
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._buffer = []
+        self._buffer_len = 0
+        self._buffer_encoding = None
+        self._buffer_time = None
+
+        #: :class:`x84.bbs.ansiwin.Screen` of session, invalidated by text
+        #: written directly by blessed, rather than by the session.
+        self.screen = None
 
-    def write(self, ucs, encoding='ascii'):
+        #: number of calls to :meth:`write`.
+        self.num_writes = 0
+        #: number of ``output`` events sent to the engine.
+        self.num_sends = 0
+
+    @property
+    def num_saved(self):
+        """ Number of pipe messages saved by coalescing writes. """
+        return self.num_writes - self.num_sends
+
+    def write(self, ucs, encoding=None):
         """
-        Sends unicode text to Pipe.
+        Buffers unicode text for Pipe.
 
         Default encoding is 'ascii', which is unset only when used
         with blessings, which rarely writes directly to the stream
         (context managers, such as "with term.location(0, 0):" have
-        such side effects).
+        such side effects).  The display then written is unknown to
+        :attr:`screen`, which is invalidated.
         """
+        if encoding is None:
+            encoding = 'ascii'
+            if self.screen is not None:
+                self.screen.invalidate()
         # wrap 'ucs' with call to 'unicode()', so that special unicode
         # instances such as blessed.formatters.ParameterizingProxyString
         # can be pickled -- as this one in particular contains a local
         # function (lambda) as an attribute -- which would fail:
         # PicklingError: Can't pickle <type 'function'>: attribute
         #                lookup __builtin__.function failed
-        self.writer.send(('output', (unicode(ucs), encoding)))
+        ucs = unicode(ucs)
+        self.num_writes += 1
+        if encoding != self._buffer_encoding:
+            # text of only one encoding is sent by each output event.
+            self.flush()
+        if not self._buffer:
+            self._buffer_time = time.time()
+            self._buffer_encoding = encoding
+        self._buffer.append(ucs)
+        self._buffer_len += len(ucs)
+        if (self._buffer_len >= self.max_size or
+                time.time() - self._buffer_time >= self.max_delay):
+            self.flush()
+
+    def flush(self):
+        """ Send all buffered text to Pipe as a single ``output`` event. """
+        if not self._buffer:
+            return
+        ucs, encoding = u''.join(self._buffer), self._buffer_encoding
+        self._buffer = []
+        self._buffer_len = 0
+        self._buffer_encoding = None
+        self._buffer_time = None
+        self.num_sends += 1
+        self.writer.send(('output', (ucs, encoding)))
@@ -1,7 +1,7 @@
 """ Lightbar package for x/84. """
 
 # local imports
-from x84.bbs.ansiwin import AnsiWindow
+from x84.bbs.ansiwin import AnsiWindow, differential
 from x84.bbs.session import getterminal, getch
 from x84.bbs.output import decode_pipe, echo
 
@@ -97,6 +97,7 @@ class Lightbar(AnsiWindow):
         self.content = list(keyed_uchars)
         self.position = (self.vitem_idx, self.vitem_shift)
 
+    @differential
     def refresh_row(self, row):
         """ Return string sequence suitable for refreshing current selection.
 
@@ -152,16 +153,19 @@ class Lightbar(AnsiWindow):
                          self.align(ucs),
                          term.normal,))
 
+    @differential
     def fixate(self):
         """ Return string sequence suitable for "fixating" cursor position. """
         return self.pos(self.ypadding + self.vitem_idx,
                         self.xpadding + self.visible_width)
 
+    @differential
     def refresh(self):
         """ Return string sequence suitable for refreshing lightbar. """
         return u''.join(self.refresh_row(ypos) for ypos in
                         range(max(self.visible_bottom, self.visible_height)))
 
+    @differential
     def refresh_quick(self):
         """ Redraw only the 'dirty' portions after a 'move' has occurred. """
         if self.moved:
@@ -177,6 +181,7 @@ class Lightbar(AnsiWindow):
                 return (self.refresh_row(self.vitem_idx))
         return u''
 
+    @differential
     def process_keystroke(self, key):
         """
         Process the keystroke and return string to refresh.
@@ -358,6 +363,7 @@ class Lightbar(AnsiWindow):
         while self.vitem_idx > 0 and self.index >= len(self.content):
             self.vitem_idx -= 1
 
+    @differential
     def move_down(self):
         """ Move selection down one row, return string suitable for refresh. """
         if self.at_bottom:
@@ -371,6 +377,7 @@ class Lightbar(AnsiWindow):
             self.vitem_shift += 1
         return self.refresh_quick()
 
+    @differential
     def goto(self, index):
         """ Move selection to given index. """
         assert index >= 0 and index < len(self.content)
@@ -388,6 +395,7 @@ class Lightbar(AnsiWindow):
         self.position = row, shift
         return self.refresh_quick()
 
+    @differential
     def move_up(self):
         """ Move selection up one row, return string suitable for refresh. """
         if self.at_top:
@@ -401,6 +409,7 @@ class Lightbar(AnsiWindow):
             self.vitem_shift -= 1
         return self.refresh_quick()
 
+    @differential
     def move_pagedown(self):
         """ Move selection down one page, return string suitable for refresh. """
         if len(self.content) < self.visible_height:
@@ -420,6 +429,7 @@ class Lightbar(AnsiWindow):
             return self.move_end()
         return self.refresh_quick()
 
+    @differential
     def move_pageup(self):
         """ Move selection up one page, return string suitable for refresh. """
         if len(self.content) < self.visible_height - 1:
@@ -435,6 +445,7 @@ class Lightbar(AnsiWindow):
             return self.move_home()
         return self.refresh_quick()
 
+    @differential
     def move_home(self):
         """ Move selection to first row, return string suitable for refresh. """
         if (0, 0) == (self.vitem_idx, self.vitem_shift):
@@ -443,6 +454,7 @@ class Lightbar(AnsiWindow):
         self.vitem_shift = 0
         return self.refresh_quick()
 
+    @differential
     def move_end(self):
         """ Move selection to final row, return string suitable for refresh. """
         if len(self.content) < self.visible_height:
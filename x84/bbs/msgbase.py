@@ -5,6 +5,7 @@ import logging
 
 # local
 from x84.bbs.dbproxy import DBProxy
+from x84.bbs.userbase import USERDB
 from x84.bbs.session import getsession
 from x84.bbs.ini import get_ini
 
@@ -15,6 +16,28 @@ MSGDB = 'msgbase'
 TAGDB = 'tags'
 PRIVDB = 'privmsg'
 
+#: version of message base stored in table ``meta`` of ``MSGDB``, where
+#: version 1 stored all message indices of a tag or recipient as a single
+#: pickled set of ``TAGDB`` or ``PRIVDB``, version 2 stored messages
+#: read by a user as a pickled set of user attribute ``readmsgs``,
+#: version 3 was without full-text index, and version 4 without a table
+#: of all private messages, see :func:`migrate_msgbase`.
+MSGBASE_VERSION = 5
+
+#: table of ``MSGDB`` of messages read by users, see :class:`ReadMsgs`.
+READ_TABLE = 'readmsgs'
+
+#: number of message indices of each row of :data:`READ_TABLE`.
+READ_CHUNK = 8192
+
+#: table of ``MSGDB`` with full-text index of subject and body of public
+#: messages, see :func:`search_msgs`.
+SEARCH_TABLE = 'search'
+
+#: table of ``PRIVDB`` with a row for the index of each private message,
+#: of any recipient, see :func:`list_privmsgs`.
+PRIV_TABLE = 'privmsgs'
+
 # TODO(jquast, maze): Use modeling to construct rfc-compliant mail messaging
 # formats.  It would be possible to use standard mbox-formatted mail boxes,
 # and integrate with external systems.  This is a v3.0 release.
@@ -51,6 +74,234 @@ def format_origin_line():
     return u''.join((u'\r\n---\r\n', get_origin_line()))
 
 
+def _index_table(name):
+    """ Return database table name of message index for tag or recipient. """
+    if isinstance(name, unicode):
+        name = name.encode('utf8')
+    return 'idx_{0}'.format(name.encode('hex'))
+
+
+def list_index(schema, name):
+    """
+    Return set of message indices of tag or recipient ``name``.
+
+    :param str schema: ``TAGDB`` for a tag, or ``PRIVDB`` for a recipient.
+    :param unicode name: tag or recipient handle.
+    :rtype: set
+    """
+    if name not in DBProxy(schema, cached=True):
+        return set()
+    return set(int(key) for key in
+               DBProxy(schema, _index_table(name), cached=True).keys())
+
+
+def update_index(schema, idx, add=(), remove=(), use_session=True):
+    """
+    Add and remove message ``idx`` to message indices of ``schema``.
+
+    Each tag (``TAGDB``) or recipient (``PRIVDB``) has a database table of
+    its own, holding a row for each message index, so that a message is
+    added or removed without reading or writing any other message indices.
+    The default table of ``schema`` records the names of all tags or
+    recipients with at least one message.  A message has only one
+    recipient, table :data:`PRIV_TABLE` of ``PRIVDB`` records the indices
+    of messages having any recipient.
+
+    :param str schema: ``TAGDB`` for tags, or ``PRIVDB`` for recipients.
+    :param int idx: message index.
+    :param add: tags or recipients that ``idx`` is added to.
+    :param remove: tags or recipients that ``idx`` is removed from.
+    :param bool use_session: whether database is accessed by session IPC.
+    """
+    if not add and not remove:
+        return
+    key = '%d' % (idx,)
+    with DBProxy(schema, use_session=use_session) as db_names:
+        for name in add:
+            db_index = DBProxy(schema, _index_table(name),
+                               use_session=use_session)
+            db_index[key] = True
+            if name not in db_names:
+                db_names[name] = True
+        for name in remove:
+            db_index = DBProxy(schema, _index_table(name),
+                               use_session=use_session)
+            _, remaining = db_index.batch([('pop', (key, None)),
+                                           ('__len__', ())])
+            if not remaining and name in db_names:
+                # no more messages by this tag or recipient, delete it
+                del db_names[name]
+    if schema == PRIVDB:
+        db_all = DBProxy(PRIVDB, PRIV_TABLE, use_session=use_session)
+        if add:
+            db_all[key] = True
+        else:
+            db_all.batch([('pop', (key, None))])
+
+
+def get_last_msg_idx(use_session=True):
+    """ Return index of the most recently saved message, or -1. """
+    db_meta = DBProxy(MSGDB, 'meta', use_session=use_session)
+    return db_meta.get('last_idx', -1)
+
+
+def next_msg_idx(db_msg, use_session=True):
+    """
+    Return index of a new message.
+
+    The caller must hold the lock of ``db_msg``, the default table of
+    ``MSGDB``, and record the index as ``last_idx`` of table ``meta`` once
+    the message is stored, as done by :meth:`Msg.save`.  Messages are then
+    never found by :func:`list_msgs_since` before they are stored.
+    """
+    db_meta = DBProxy(MSGDB, 'meta', use_session=use_session)
+    last_idx = db_meta.get('last_idx')
+    if last_idx is None:
+        # message base not yet migrated, see migrate_msgbase()
+        last_idx = max(map(int, db_msg.keys()) or [-1])
+    return last_idx + 1
+
+
+def list_msgs_since(idx):
+    """
+    Return messages saved after message index ``idx``.
+
+    Message indices are allocated in ascending order, so that a caller
+    may keep the returned ``last_idx`` as a "high-water mark" to receive
+    only messages saved since its previous call, in a single round trip
+    for any number of messages.
+
+    :param int idx: last message index previously seen, or -1.
+    :rtype: tuple
+    :returns: ``(last_idx, msgs)``, the index of the most recently saved
+              message and list of :class:`Msg` saved after ``idx``.
+    """
+    last_idx = get_last_msg_idx()
+    if last_idx <= idx:
+        return idx, []
+    msgs = DBProxy(MSGDB).batch([('get', ('%d' % (_idx,),))
+                                 for _idx in range(idx + 1, last_idx + 1)])
+    # messages may have since been deleted
+    return last_idx, [msg for msg in msgs if msg is not None]
+
+
+def migrate_msgbase():
+    """
+    Migrate message base of a previous :data:`MSGBASE_VERSION`.
+
+    Called by the engine at start-up, it does nothing when the message
+    base is already current.
+    """
+    log = logging.getLogger(__name__)
+    db_meta = DBProxy(MSGDB, 'meta', use_session=False)
+    version = db_meta.get('version', 1)
+    if version >= MSGBASE_VERSION:
+        return
+    log.info('migrating message base version {0} to {1}'
+             .format(version, MSGBASE_VERSION))
+    if version < 2:
+        _migrate_indices(log)
+    if version < 3:
+        _migrate_readmsgs(log)
+    if version < 4:
+        _migrate_search(log)
+    if version < 5:
+        _migrate_privmsgs(log)
+    db_meta['version'] = MSGBASE_VERSION
+
+
+def _migrate_indices(log):
+    """
+    Migrate message indices of tags and recipients to index rows.
+
+    The pickled sets of message indices of each tag and recipient held
+    by ``TAGDB`` and ``PRIVDB`` are converted to tables of index rows
+    (see :func:`update_index`), and the message index counter is
+    initialized (see :func:`next_msg_idx`).
+    """
+    db_msg = DBProxy(MSGDB, use_session=False)
+    with db_msg:
+        db_meta = DBProxy(MSGDB, 'meta', use_session=False)
+        db_meta['last_idx'] = max(map(int, db_msg.keys()) or [-1])
+
+    for schema in (TAGDB, PRIVDB):
+        db_names = DBProxy(schema, use_session=False)
+        with db_names:
+            for name, indices in db_names.items():
+                if not isinstance(indices, set):
+                    # already migrated (a previous migration was halted).
+                    continue
+                if indices:
+                    db_index = DBProxy(schema, _index_table(name),
+                                       use_session=False)
+                    db_index.update(dict(('%d' % (idx,), True)
+                                         for idx in indices))
+                    db_names[name] = True
+                else:
+                    del db_names[name]
+                log.debug('migrated {0} {1!r}: {2} messages'
+                          .format(schema, name, len(indices)))
+
+
+def _migrate_readmsgs(log):
+    """ Migrate ``readmsgs`` user attribute sets to :class:`ReadMsgs`. """
+    db_attrs = DBProxy(USERDB, 'attrs', use_session=False)
+    with db_attrs:
+        for handle, attrs in db_attrs.items():
+            if 'readmsgs' not in attrs:
+                continue
+            indices = attrs.pop('readmsgs')
+            # keys are utf8-encoded bytes, handles of a session are unicode.
+            ReadMsgs(handle.decode('utf8')).update(indices)
+            db_attrs[handle] = attrs
+            log.debug('migrated readmsgs of {0!r}: {1} messages'
+                      .format(handle, len(indices)))
+
+
+def _migrate_search(log):
+    """ Add all public messages to full-text index of :func:`search_msgs`. """
+    db_search = DBProxy(MSGDB, SEARCH_TABLE, use_session=False)
+    operations = [('fts_index', (msg.idx, _search_document(msg)))
+                  for msg in DBProxy(MSGDB, use_session=False).values()
+                  if 'public' in msg.tags]
+    for offset in range(0, len(operations), 1000):
+        db_search.batch(operations[offset:offset + 1000])
+    log.debug('indexed {0} public messages for search'
+              .format(len(operations)))
+
+
+def _migrate_privmsgs(log):
+    """ Record indices of all recipients in table :data:`PRIV_TABLE`. """
+    indices = set()
+    for name in DBProxy(PRIVDB, use_session=False).keys():
+        indices.update(DBProxy(PRIVDB, _index_table(name),
+                               use_session=False).keys())
+    DBProxy(PRIVDB, PRIV_TABLE, use_session=False).update(
+        dict((key, True) for key in indices))
+    log.debug('recorded {0} private messages'.format(len(indices)))
+
+
+def _search_document(msg):
+    """ Return full-text index document of message ``msg``. """
+    return {'subject': msg.subject or u'', 'body': msg.body or u''}
+
+
+def search_msgs(query, offset=0, limit=20):
+    """
+    Return indices of public messages matching all words of ``query``.
+
+    Subject and body of public messages are indexed by :meth:`Msg.save`,
+    results are ordered by relevance, best match first, when supported
+    by sqlite3 (see :func:`x84.db.fts_search`).
+
+    :param unicode query: words to search for.
+    :param int offset: number of matches to skip, for pagination.
+    :param int limit: maximum number of matches returned.
+    :rtype: list
+    """
+    return DBProxy(MSGDB, SEARCH_TABLE).fts_search(query, offset, limit)
+
+
 def get_msg(idx=0):
     """ Return Msg record instance by index ``idx``. """
     return DBProxy(MSGDB)['%d' % int(idx)]
@@ -60,25 +311,90 @@ def list_msgs(tags=None):
     """ Return set of indices matching ``tags``, or all by default. """
     if tags is not None and 0 != len(tags):
         msgs = set()
-        db_tag = DBProxy(TAGDB)
-        for tag in (_tag for _tag in tags if _tag in db_tag):
-            msgs.update(db_tag[tag])
+        for tag in tags:
+            msgs.update(list_index(TAGDB, tag))
         return msgs
     return set(int(key) for key in DBProxy(MSGDB).keys())
 
 
 def list_privmsgs(handle=None):
     """ Return all private messages for given user handle. """
-    db_priv = DBProxy(PRIVDB)
     if handle:
-        return db_priv.get(handle, set())
-    # flatten list of [set(1, 2), set(3, 4)] to set(1, 2, 3, 4)
-    return set([_idx for indices in db_priv.values() for _idx in indices])
+        return list_index(PRIVDB, handle)
+    return set(int(key) for key in
+               DBProxy(PRIVDB, PRIV_TABLE, cached=True).keys())
 
 
 def list_tags():
     """ Return set of available tags. """
-    return [_tag.decode('utf8') for _tag in DBProxy(TAGDB).keys()]
+    return [_tag.decode('utf8')
+            for _tag in DBProxy(TAGDB, cached=True).keys()]
+
+
+class ReadMsgs(object):
+
+    """
+    Set of message indices read by a user.
+
+    Stored as a bitmap in table :data:`READ_TABLE` of ``MSGDB``, with a
+    row for each :data:`READ_CHUNK` message indices, keyed by handle and
+    row number.  Rows are retrieved only as needed, membership is tested
+    in constant time, and marking messages as read re-writes only those
+    rows containing them.
+    """
+
+    def __init__(self, handle):
+        """
+        Class initializer.
+
+        :param unicode handle: user handle.
+        """
+        self.handle = handle
+        self._rows = dict()
+        self._db = DBProxy(MSGDB, READ_TABLE)
+
+    def _key(self, num):
+        """ Return database key of row number ``num``. """
+        return u'{0}:{1}'.format(self.handle, num)
+
+    def _load(self, nums, reload=False):
+        """ Retrieve rows ``nums``, in a single round trip. """
+        nums = [num for num in set(nums)
+                if reload or num not in self._rows]
+        if nums:
+            rows = self._db.batch([('get', (self._key(num),))
+                                   for num in nums])
+            for num, row in zip(nums, rows):
+                self._rows[num] = (bytearray(READ_CHUNK // 8)
+                                   if row is None else bytearray(row))
+
+    def __contains__(self, idx):
+        """ Whether message ``idx`` has been read. """
+        num, offset = divmod(idx, READ_CHUNK)
+        self._load([num])
+        return bool(self._rows[num][offset >> 3] & (1 << (offset & 7)))
+
+    def unread(self, indices):
+        """ Return set of given message ``indices`` not yet read. """
+        indices = list(indices)
+        self._load(idx // READ_CHUNK for idx in indices)
+        return set(idx for idx in indices if idx not in self)
+
+    def update(self, indices):
+        """ Mark given message ``indices`` as read. """
+        indices = list(indices)
+        if not indices or self.handle == u'anonymous':
+            return
+        nums = set(idx // READ_CHUNK for idx in indices)
+        with self._db:
+            # rows may have been modified by another session of this user.
+            self._load(nums, reload=True)
+            for idx in indices:
+                num, offset = divmod(idx, READ_CHUNK)
+                self._rows[num][offset >> 3] |= 1 << (offset & 7)
+            self._db.batch([('__setitem__',
+                             (self._key(num), bytes(self._rows[num])))
+                            for num in nums])
 
 
 class Msg(object):
@@ -150,32 +466,44 @@ class Msg(object):
         new = self.idx is None or self._stime is None
 
         # persist message record to MSGDB
+        old_msg = None
         with DBProxy(MSGDB, use_session=use_session) as db_msg:
             if new:
-                self.idx = max(map(int, db_msg.keys()) or [-1]) + 1
+                self.idx = next_msg_idx(db_msg, use_session=use_session)
                 if ctime is not None:
                     self._ctime = self._stime = ctime
                 else:
                     self._stime = datetime.datetime.now()
                 new = True
+            else:
+                old_msg = db_msg.get('%d' % (self.idx,))
             db_msg['%d' % (self.idx,)] = self
-
-        # persist message idx to TAGDB
-        with DBProxy(TAGDB, use_session=use_session) as db_tag:
-            for tag in db_tag.keys():
-                msgs = db_tag[tag]
-                if tag in self.tags and self.idx not in msgs:
-                    msgs.add(self.idx)
-                    db_tag[tag] = msgs
-                    log.debug("msg {self.idx} tagged '{tag}'"
-                              .format(self=self, tag=tag))
-                elif tag not in self.tags and self.idx in msgs:
-                    msgs.remove(self.idx)
-                    db_tag[tag] = msgs
-                    log.info("msg {self.idx} removed tag '{tag}'"
-                             .format(self=self, tag=tag))
-            for tag in [_tag for _tag in self.tags if _tag not in db_tag]:
-                db_tag[tag] = set([self.idx])
+            if new:
+                db_meta = DBProxy(MSGDB, 'meta', use_session=use_session)
+                db_meta['last_idx'] = self.idx
+
+        # persist message idx to TAGDB, only for tags added or removed
+        old_tags = set() if old_msg is None else old_msg.tags
+        update_index(TAGDB, self.idx,
+                     add=self.tags - old_tags,
+                     remove=old_tags - self.tags,
+                     use_session=use_session)
+        for tag in self.tags - old_tags:
+            log.debug("msg {self.idx} tagged '{tag}'"
+                      .format(self=self, tag=tag))
+        for tag in old_tags - self.tags:
+            log.info("msg {self.idx} removed tag '{tag}'"
+                     .format(self=self, tag=tag))
+
+        # persist subject and body of public message to full-text index
+        was_public = old_msg is not None and 'public' in old_msg.tags
+        db_search = DBProxy(MSGDB, SEARCH_TABLE, use_session=use_session)
+        if 'public' in self.tags and (
+                not was_public or
+                _search_document(old_msg) != _search_document(self)):
+            db_search.fts_index(self.idx, _search_document(self))
+        elif was_public and 'public' not in self.tags:
+            db_search.fts_remove(self.idx)
 
         # persist message as child to parent;
         assert self.parent not in self.children, ('circular reference',
@@ -196,11 +524,20 @@ class Msg(object):
                     with db_msg:
                         db_msg['%d' % (self.idx)] = self
 
-        # persist message record to PRIVDB
+        # persist message idx to PRIVDB
+        old_recipients = set()
+        if old_msg is not None and 'public' not in old_msg.tags:
+            old_recipients.add(old_msg.recipient)
+        recipients = set()
         if 'public' not in self.tags:
-            with DBProxy(PRIVDB, use_session=use_session) as db_priv:
-                db_priv[self.recipient] = (
-                    db_priv.get(self.recipient, set()) | set([self.idx]))
+            recipients.add(self.recipient)
+        recipients.discard(None)
+        old_recipients.discard(None)
+        if recipients != old_recipients:
+            update_index(PRIVDB, self.idx,
+                         add=recipients - old_recipients,
+                         remove=old_recipients - recipients,
+                         use_session=use_session)
 
         # if either any of 'server_tags' or 'network_tags' are enabled,
         # then queue for potential delivery.
@@ -220,6 +557,22 @@ class Msg(object):
                                       else 'reply'),
                     self=self))
 
+    def delete(self):
+        """ Delete message from database and message indices. """
+        use_session = bool(getsession() is not None)
+        with DBProxy(MSGDB, use_session=use_session) as db_msg:
+            stored_msg = db_msg.get('%d' % (self.idx,)) or self
+            if '%d' % (self.idx,) in db_msg:
+                del db_msg['%d' % (self.idx,)]
+        update_index(TAGDB, self.idx, remove=stored_msg.tags,
+                     use_session=use_session)
+        if 'public' in stored_msg.tags:
+            db_search = DBProxy(MSGDB, SEARCH_TABLE, use_session=use_session)
+            db_search.fts_remove(self.idx)
+        elif stored_msg.recipient is not None:
+            update_index(PRIVDB, self.idx, remove=(stored_msg.recipient,),
+                         use_session=use_session)
+
     def queue_for_network(self):
         """ Queue message for networks, hosting or sending. """
         log = logging.getLogger(__name__)
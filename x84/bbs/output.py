@@ -1,8 +1,9 @@
 """ Terminal output package for x/84. """
+import collections
 import warnings
-import inspect
 import random
 import glob
+import sys
 import os
 import re
 
@@ -70,6 +71,18 @@ for page in (
 #: for use by :func:`encode_pipe`.
 RE_ANSI_COLOR = re.compile(r'\033\[(\d{2,3})m')
 
+#: default maximum number of decoded art files kept by :func:`showart`,
+#: unless configured by ``[system]`` option ``art_cache_size``.
+ART_CACHE_SIZE = 64
+
+#: least-recently used cache of decoded, line-split art files and their
+#: displayed widths, keyed by ``(realpath, mtime, encoding, decoder, kind)``.
+ART_CACHE = collections.OrderedDict()
+
+#: cache of files matching an art file pattern, keyed by pattern, of
+#: ``(mtime, files)``, where ``mtime`` is of the containing folder.
+GLOB_CACHE = dict()
+
 
 def syncterm_setfont(font_name, font_page=0):
     """
@@ -241,6 +254,112 @@ def ropen(filename, mode='rb'):
     return open(random.choice(files), mode) if len(files) else None
 
 
+def glob_art(filepattern):
+    """
+    Return list of files matching ``filepattern``.
+
+    The result is cached until the modification time of the containing
+    folder changes, as when files are added or removed.
+
+    :param str filepattern: file pattern, such as ``art/*.ans``.
+    :rtype: list
+    """
+    folder = os.path.dirname(filepattern) or os.curdir
+    if glob.has_magic(folder):
+        return glob.glob(filepattern)
+    try:
+        mtime = os.stat(folder).st_mtime
+    except OSError:
+        return []
+    cached = GLOB_CACHE.get(filepattern)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    files = glob.glob(filepattern)
+    GLOB_CACHE[filepattern] = (mtime, files)
+    return files
+
+
+def load_art(filename, encoding=None, auto_mode=True):
+    """
+    Return decoded lines of art file ``filename`` and their widths.
+
+    Results are kept in :py:const:`ART_CACHE`, keyed by real path,
+    modification time, resulting encoding and terminal kind, so an art
+    file that is modified is read again.  See :func:`showart` for
+    ``encoding`` and ``auto_mode``.
+
+    :rtype: tuple
+    :returns: tuple of ``(lines, widths)``, where ``widths`` are the
+              displayed width of each line, without trailing whitespace.
+    """
+    realpath = os.path.realpath(filename)
+    mtime = os.stat(realpath).st_mtime
+
+    # If auto_mode is enabled, we'll only use the input encoding on UTF-8
+    # capable terminals, because our codecs do not know how to "transcode"
+    # between the various encodings.
+    decoder = getsession().encoding if auto_mode else None
+    if decoder not in (None, 'utf8', 'cp437'):
+        decoder = 'bytes'
+    term = getterminal()
+    key = (realpath, mtime, encoding, decoder, term.kind)
+    if key in ART_CACHE:
+        # least-recently used: move to end.
+        result = ART_CACHE[key] = ART_CACHE.pop(key)
+        return result
+
+    # Parse the piece
+    parsed = SAUCE(realpath)
+
+    # If no explicit encoding is given, we go through a couple of steps to
+    # resolve the possible file encoding:
+    if encoding is None:
+        # 1. See if the SAUCE record has a font we know about, it's in the
+        #    filler
+        if parsed.record and parsed.filler_str in SAUCE_FONT_MAP:
+            encoding = SAUCE_FONT_MAP[parsed.filler_str]
+
+        # 2. Get the system default art encoding,
+        #    or fall-back to cp437
+        else:
+            encoding = get_ini('system', 'art_utf8_codec') or 'cp437'
+
+    if decoder == 'cp437':
+        data = parsed.data.decode('cp437')
+    elif decoder == 'bytes':
+        data = parsed.data
+    else:
+        # If auto_mode is disabled, we'll just respect whatever input
+        # encoding was selected before
+        data = parsed.data.decode(encoding)
+    lines = tuple(data.splitlines())
+    widths = tuple(term.length(line.rstrip()) for line in lines)
+
+    result = ART_CACHE[key] = (lines, widths)
+    maxsize = (get_ini('system', 'art_cache_size', getter='getint')
+               or ART_CACHE_SIZE)
+    while len(ART_CACHE) > maxsize:
+        ART_CACHE.popitem(last=False)
+    return result
+
+
+def prewarm_art(filepatterns, folder=None):
+    """
+    Load into :py:const:`ART_CACHE` all art files matching ``filepatterns``.
+
+    :param list filepatterns: file patterns, such as ``art/*.ans``.
+    :param str folder: folder of patterns that are relative.
+    """
+    for filepattern in filepatterns:
+        if folder is not None:
+            filepattern = os.path.join(folder, filepattern)
+        for filename in glob_art(filepattern):
+            try:
+                load_art(filename)
+            except (IOError, OSError, UnicodeDecodeError):
+                pass
+
+
 def showart(filepattern, encoding=None, auto_mode=True, center=False,
             poll_cancel=False, msg_cancel=None, force=False):
     """
@@ -283,12 +402,10 @@ def showart(filepattern, encoding=None, auto_mode=True, center=False,
     # containing folder.  This only works for subdirectories (like 'art/').
     _folder = os.path.dirname(filepattern)
     if not (_folder.startswith(os.path.sep) or os.path.isdir(_folder)):
-        # On occasion, after a general exception in a script, re-calling the
-        # same script may cause yet another exception, HERE.  The 2nd call is
-        # fine though; this only would effect a developer.
-        #
-        # Just try again.
-        caller_module = inspect.stack()[1][1]
+        # The frame resuming this generator is of the calling module.
+        # pylint: disable=W0212
+        #         Access to a protected member _getframe of a client class
+        caller_module = sys._getframe(1).f_code.co_filename
         rel_folder = os.path.dirname(caller_module)
         if _folder:
             rel_folder = os.path.join(rel_folder, _folder)
@@ -299,7 +416,7 @@ def showart(filepattern, encoding=None, auto_mode=True, center=False,
 
     # Open the piece
     try:
-        filename = os.path.relpath(random.choice(glob.glob(filepattern)))
+        filename = os.path.relpath(random.choice(glob_art(filepattern)))
     except IndexError:
         filename = None
 
@@ -313,48 +430,13 @@ def showart(filepattern, encoding=None, auto_mode=True, center=False,
 
     file_basename = os.path.basename(filename)
 
-    # Parse the piece
-    parsed = SAUCE(filename)
-
-    # If no explicit encoding is given, we go through a couple of steps to
-    # resolve the possible file encoding:
-    if encoding is None:
-        # 1. See if the SAUCE record has a font we know about, it's in the
-        #    filler
-        if parsed.record and parsed.filler_str in SAUCE_FONT_MAP:
-            encoding = SAUCE_FONT_MAP[parsed.filler_str]
-
-        # 2. Get the system default art encoding,
-        #    or fall-back to cp437
-        else:
-            encoding = get_ini('system', 'art_utf8_codec') or 'cp437'
-
-    # If auto_mode is enabled, we'll only use the input encoding on UTF-8
-    # capable terminals, because our codecs do not know how to "transcode"
-    # between the various encodings.
-    if auto_mode:
-        def _decode(what):
-            # pylint: disable=C0111
-            #         Missing function docstring (col 8)
-            session = getsession()
-            if session.encoding == 'utf8':
-                return what.decode(encoding)
-            elif session.encoding == 'cp437':
-                return what.decode('cp437')
-            else:
-                return what
-
-    # If auto_mode is disabled, we'll just respect whatever input encoding was
-    # selected before
-    else:
-        _decode = lambda what: what.decode(encoding)
+    lines, widths = load_art(filename, encoding, auto_mode)
 
     # For wide terminals, center piece on screen using cursor movement
     # when center=True.
     padding = u''
     if center and term.width > 81:
         padding = term.move_x((term.width / 2) - 40)
-    lines = _decode(parsed.data).splitlines()
     for idx, line in enumerate(lines):
 
         if poll_cancel is not False and term.inkey(poll_cancel):
@@ -368,7 +450,7 @@ def showart(filepattern, encoding=None, auto_mode=True, center=False,
             yield u'\r\n' + term.center(msg_cancel).rstrip() + u'\r\n'
             return
 
-        line_length = term.length(line.rstrip())
+        line_length = widths[idx]
 
         if force is False and not padding and term.width < line_length:
             # if the artwork is too wide and force=False, simply stop displaying it.
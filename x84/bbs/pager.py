@@ -1,5 +1,5 @@
 """ Pager package for x/84. """
-from x84.bbs.ansiwin import AnsiWindow
+from x84.bbs.ansiwin import AnsiWindow, differential
 from x84.bbs.output import encode_pipe, decode_pipe
 from x84.bbs.session import getterminal, getch
 from x84.bbs.output import echo
@@ -96,6 +96,7 @@ class Pager(AnsiWindow):
         maximum = self.visible_height
         return max(0, maximum - self.visible_height)
 
+    @differential
     def process_keystroke(self, keystroke):
         """
         Process the keystroke and return string to refresh.
@@ -108,6 +109,9 @@ class Pager(AnsiWindow):
         rstr = u''
         keystroke = hasattr(keystroke, 'code') and keystroke.code or keystroke
         if keystroke in self.keyset['refresh']:
+            if self.screen is not None:
+                # redraw fully, the display may be garbled.
+                self.screen.invalidate()
             rstr += self.refresh()
         elif keystroke in self.keyset['up']:
             rstr += self.move_up()
@@ -139,6 +143,7 @@ class Pager(AnsiWindow):
         while not self.quit:
             echo(self.process_keystroke(getch()))
 
+    @differential
     def move_home(self):
         """
         Scroll to top and return refresh string.
@@ -150,6 +155,7 @@ class Pager(AnsiWindow):
             return self.refresh()
         return u''
 
+    @differential
     def move_end(self):
         """
         Scroll to bottom and return refresh string.
@@ -161,6 +167,7 @@ class Pager(AnsiWindow):
             return self.refresh()
         return u''
 
+    @differential
     def move_pgup(self, num=1):
         """
         Scroll up ``num`` pages and return refresh string.
@@ -170,6 +177,7 @@ class Pager(AnsiWindow):
         self.position -= (num * (self.visible_height))
         return self.refresh() if self.moved else u''
 
+    @differential
     def move_pgdown(self, num=1):
         """
         Scroll down ``num`` pages and return refresh string.
@@ -179,6 +187,7 @@ class Pager(AnsiWindow):
         self.position += (num * (self.visible_height))
         return self.refresh() if self.moved else u''
 
+    @differential
     def move_down(self, num=1):
         """
         Scroll down ``num`` rows and return refresh string.
@@ -190,6 +199,7 @@ class Pager(AnsiWindow):
             return self.refresh()
         return u''
 
+    @differential
     def move_up(self, num=1):
         """
         Scroll up ``num`` rows and return refresh string.
@@ -201,6 +211,7 @@ class Pager(AnsiWindow):
             return self.refresh()
         return u''
 
+    @differential
     def refresh_row(self, row):
         """
         Return unicode string suitable for refreshing pager row.
@@ -218,6 +229,7 @@ class Pager(AnsiWindow):
                          self.align(ucs),
                          term.normal))
 
+    @differential
     def refresh(self, start_row=0):
         """
         Return unicode string suitable for refreshing pager window.
@@ -236,6 +248,7 @@ class Pager(AnsiWindow):
                 for row in range(start_row, len(self.visible_content))
             ] + [term.normal])
 
+    @differential
     def update(self, ucs):
         """
         Update content buffer with newline-delimited text.
@@ -272,6 +285,7 @@ class Pager(AnsiWindow):
                 lines.append(u'')
         return lines
 
+    @differential
     def append(self, ucs):
         """
         Update content buffer with additional line(s) of text.
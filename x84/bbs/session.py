@@ -20,6 +20,46 @@ from x84.bbs.ini import get_ini
 #: singleton representing the session connected by current process
 SESSION = None
 
+#: script modules imported before the session began, by a pre-forked
+#: session process, see :func:`x84.terminal.preload_scripts`; keyed by
+#: path, as tuples of ``(mtime, module)``.
+SCRIPT_CACHE = dict()
+
+
+def load_script(script_name, lookup_paths, cache, reload=False):
+    """
+    Return module of ``script_name``, found in ``lookup_paths``.
+
+    The module is imported only when not found in ``cache``, its file has
+    been modified, or ``reload`` is set, and is then stored in ``cache``.
+
+    :param str script_name: module name.
+    :param list lookup_paths: folders searched for module.
+    :param dict cache: script modules keyed by path, as tuples of
+                       ``(mtime, module)``.
+    :param bool reload: whether to import the module even when cached.
+    :rtype: tuple
+    :returns: ``(path, module, elapsed)``, where ``elapsed`` is the
+              seconds taken to import, or ``None`` when cached.
+    """
+    lookup = imp.find_module(script_name, lookup_paths)
+    fobj, path = lookup[0], lookup[1]
+    mtime = os.stat(path).st_mtime
+    cached_mtime, module = cache.get(path, (None, None))
+    if cached_mtime == mtime and not reload:
+        if fobj is not None:
+            fobj.close()
+        return path, module, None
+
+    stime = time.time()
+    try:
+        module = imp.load_module(script_name, *lookup)
+    finally:
+        if fobj is not None:
+            fobj.close()
+    cache[path] = (mtime, module)
+    return path, module, time.time() - stime
+
 
 def getsession():
     """ Return :class:`Session` instance of current process. """
@@ -137,6 +177,24 @@ class Session(object):
         # create event buffer
         self._buffer = dict()
 
+        #: virtual screen buffer, :class:`x84.bbs.ansiwin.Screen`, updated
+        #: by all output when enabled by ``[session]`` option
+        #: ``screen_buffer``.
+        self.screen = None
+        if get_ini('session', 'screen_buffer', getter='getboolean'):
+            from x84.bbs.ansiwin import Screen
+            self.screen = Screen(terminal)
+            # invalidated by blessed writing directly to the stream.
+            terminal.stream.screen = self.screen
+
+        #: script modules imported by :meth:`runscript`, keyed by path, as
+        #: tuples of ``(mtime, module)``.
+        self.script_cache = dict(SCRIPT_CACHE)
+
+        #: time taken to import each script, keyed by path, as lists of
+        #: ``[number of imports, total seconds]``.
+        self.script_load_times = dict()
+
     def to_dict(self):
         """ Dictionary describing this session. """
         retval = {
@@ -199,6 +257,7 @@ class Session(object):
         if self._activity != value:
             self.log.debug('activity=%s', value)
             self._activity = value
+            self.send_event('presence', {'activity': value})
 
             if (self.terminal.kind.startswith('xterm') or
                     self.terminal.kind.startswith('rxvt')):
@@ -215,6 +274,7 @@ class Session(object):
         #         Missing docstring
         self.log.info("user {!r} -> {!r}".format(self._user, value.handle))
         self._user = value
+        self.send_event('presence', {'handle': value.handle})
 
     @property
     def encoding(self):
@@ -246,6 +306,11 @@ class Session(object):
         """ Whether screen output should be logged (bool). """
         return get_ini('session', 'tap_output', getter='getboolean')
 
+    @property
+    def script_reload(self):
+        """ Whether scripts are imported again by every runscript (bool). """
+        return get_ini('session', 'script_reload', getter='getboolean')
+
     @property
     def show_traceback(self):
         """ Whether traceback errors should be displayed to user (bool). """
@@ -295,16 +360,12 @@ class Session(object):
         of by their full session-id (such as telnet-92.32.10.132:57331)
         one can simply refer to node #1, etc..
         """
-        if self._node is not None:
-            return self._node
-
-        for node in range(1, 65534):
-            event = 'lock-%s/%d' % ('node', node)
-            self.send_event(event, ('acquire', None))
-            data = self.read_event(event)
-            if data is True:
-                self._node = node
-                return self._node
+        if self._node is None:
+            # the lowest free node is granted by the engine, and released
+            # when this session is unregistered.
+            self.send_event('node', None)
+            self._node = self.read_event('node')
+        return self._node
 
     def __error_recovery(self):
         """ Recover from general exception in script. """
@@ -325,6 +386,7 @@ class Session(object):
                    .format(prefix=prefix, fault=fault))
             self.log.error(msg)
             self.write(u'\r\n\r\n{msg}\r\n'.format(msg=msg))
+            self.flush()
 
             # give time for exception to write down the IPC queue before
             # continuing or exiting, esp. exiting, otherwise STOP message
@@ -339,6 +401,8 @@ class Session(object):
         ``Goto`` exception, or the gosub function.
         """
         self.log.info('Begin session on node %s', self.node)
+        self.send_event('presence', self.to_dict())
+        self._prewarm_art()
         try:
             while len(self._script_stack):
                 self.log.debug('script_stack is {self._script_stack!r}'
@@ -380,8 +444,23 @@ class Session(object):
         finally:
             self.close()
 
+    def _prewarm_art(self):
+        """
+        Load art files of ``[session]`` option ``art_prewarm``.
+
+        The value is a comma-delimited list of file patterns relative to the
+        script folder, such as ``art/*.ans``, which are then displayed by
+        :func:`x84.bbs.output.showart` without reading them again.
+        """
+        filepatterns = get_ini('session', 'art_prewarm', split=True)
+        if filepatterns:
+            from x84.bbs.output import prewarm_art
+            prewarm_art(filter(None, filepatterns), folder=self.script_path)
+
     def write(self, ucs, encoding=None):
         """ Write unicode data ``ucs`` to terminal. """
+        if self.screen is not None:
+            ucs = self.screen.write(ucs)
         # do not write empty strings
         if not ucs:
             return
@@ -390,6 +469,21 @@ class Session(object):
         if self.log.isEnabledFor(logging.DEBUG) and self.tap_output:
             self.log.debug('--> {!r}'.format(ucs))
 
+    def flush(self):
+        """
+        Send all output buffered by :meth:`write` to the client.
+
+        Output is otherwise sent before waiting for input or sending any
+        other event, or by the next write once a size or time threshold is
+        reached; scripts that pause or block without waiting for input, such
+        as by ``time.sleep()`` or a network request, should call this method
+        first.  Log records buffered by
+        :class:`x84.bbs.ipc.IPCLogHandler` are sent as well.
+        """
+        self.terminal.stream.flush()
+        for handler in logging.getLogger().handlers:
+            handler.flush()
+
     def flush_event(self, event):
         """
         Flush and return all data buffered for ``event``.
@@ -430,6 +524,10 @@ class Session(object):
 
         - ``gosub``: Allows one session to send another to a different script,
           this is used by the default board ``chat.py`` for a chat request.
+
+        - ``cache-invalidate``: Sent by the engine when a database table
+          cached by this session is modified, where data is the tuple
+          ``(schema, table)``, see :class:`x84.bbs.dbproxy.DBCache`.
         """
         # exceptions aren't buffered; they are thrown!
         if event == 'exception':
@@ -478,6 +576,12 @@ class Session(object):
                 data[0], 'info-ack', self.sid, self.to_dict()))
             return True
 
+        # discard cached database results of a modified table
+        if event == 'cache-invalidate':
+            from x84.bbs.dbproxy import invalidate_cache
+            invalidate_cache(*data)
+            return True
+
         if event not in self._buffer:
             # " Once a bounded length deque is full, when new items are added,
             # a corresponding number of items are discarded from the opposite
@@ -543,7 +647,7 @@ class Session(object):
 
         - ``disconnect``: Session wishes to disconnect.
 
-        - ``logger``: Data is logging record, used by IPCLogHandler.
+        - ``logger``: Data is list of log records, used by IPCLogHandler.
 
         - ``output``: Unicode data to write to client.
 
@@ -557,11 +661,34 @@ class Session(object):
 
         - ``lock-<name>``: Fine-grained global bbs locking.
 
+        - ``node``: Request the node number of this session.
+
+        - ``presence``: Attributes of this session have changed, such as
+          ``activity``, data is a dictionary of those changed.
+
+        - ``who``: Request a dictionary describing each session, keyed by
+          session-id.
+
+        - ``who-subscribe``: When data is True, receive ``presence-delta``
+          events of ``(sid, attrs)`` when attributes of another session
+          change, where ``attrs`` is ``None`` when it has disconnected.
+
+        - ``cache-subscribe``: Request ``cache-invalidate`` events for
+          database ``(schema, table)``.
+
         :param str event: event name.
         :param data: event data.
         """
+        # preserve order of any buffered output and this event.
+        self.flush()
         self.writer.send((event, data))
 
+    def buffer_events(self):
+        """ Receive and buffer all IPC events waiting, without blocking. """
+        while self.reader.poll():
+            event, data = self.reader.recv()
+            self.buffer_event(event, data)
+
     def poll_event(self, event):
         """
         Non-blocking poll for session event.
@@ -599,6 +726,9 @@ class Session(object):
                   and no matching IPC event is discovered, ``(None, None)`` is
                   returned.
         """
+        # send any buffered output, before waiting for input.
+        self.flush()
+
         event, data = self._pop_event_buffer(events)
         if event:
             return (event, data)
@@ -653,6 +783,7 @@ class Session(object):
         """
         self.log.info("runscript {0!r}".format(script.name))
         self._script_stack.append(script)
+        self.send_event('presence', {'current_script': script.name})
 
         # if given a script name such as 'extras.target', adjust the lookup
         # path to be extended by {default_scriptdir}/extras, and adjust
@@ -667,8 +798,7 @@ class Session(object):
             _lookup_path = os.path.join(script_relpath, *remaining.split('.'))
             lookup_paths.append(_lookup_path)
 
-        lookup = imp.find_module(script_name, lookup_paths)
-        module = imp.load_module(script_name, *lookup)
+        module = self._load_script(script_name, lookup_paths)
 
         # ensure main() function exists!
         if not hasattr(module, 'main'):
@@ -686,12 +816,48 @@ class Session(object):
         # remove the current script from the script stack, since it has
         # finished executing.
         self._script_stack.pop()
+        if self._script_stack:
+            self.send_event('presence', {
+                'current_script': self.current_script.name})
 
         return value
 
+    def _load_script(self, script_name, lookup_paths):
+        """
+        Return module of ``script_name``, found in ``lookup_paths``.
+
+        The module is imported only once, unless its file is modified, or
+        ``[session]`` option ``script_reload`` is set; matrix scripts may
+        already be imported by a pre-forked process (:data:`SCRIPT_CACHE`).
+        Module globals are
+        therefore kept between calls of a script by this session, a script
+        must reset any state of a previous call in its entry point.
+
+        :param str script_name: module name.
+        :param list lookup_paths: folders searched for module.
+        :rtype: module
+        """
+        path, module, elapsed = load_script(
+            script_name, lookup_paths, self.script_cache,
+            reload=self.script_reload)
+        if elapsed is None:
+            return module
+
+        load_time = self.script_load_times.setdefault(path, [0, 0.0])
+        load_time[0] += 1
+        load_time[1] += elapsed
+        self.log.debug('loaded script {0} in {1:0.1f}ms'
+                       .format(script_name, elapsed * 1000))
+        return module
+
     def close(self):
-        """ Close session, currently releases ``node`` lock.. """
-        if self._node is not None:
-            self.send_event(
-                event='lock-node/%d' % (self._node),
-                data=('release', None))
+        """ Close session, flushing any output. """
+        self.flush()
+        stream = self.terminal.stream
+        self.log.debug('output: {0} writes sent by {1} messages ({2} saved)'
+                       .format(stream.num_writes, stream.num_sends,
+                               stream.num_saved))
+        for path, (num_loads, elapsed) in sorted(
+                self.script_load_times.items()):
+            self.log.debug('script {0}: imported {1} times in {2:0.1f}ms'
+                           .format(path, num_loads, elapsed * 1000))
@@ -15,7 +15,7 @@ def list_users():
     :returns list of user handles.
     """
     return [handle.decode('utf8')
-            for handle in DBProxy(USERDB).keys()]
+            for handle in DBProxy(USERDB, cached=True).keys()]
 
 
 def get_user(handle):
@@ -35,7 +35,7 @@ def find_user(handle):
     :returns: matching handle as str, or None if not found.
     :rtype: None or str.
     """
-    for key in DBProxy(USERDB).keys():
+    for key in DBProxy(USERDB, cached=True).keys():
         if handle.lower() == key.decode('utf8').lower():
             return key
 
@@ -84,11 +84,13 @@ class Group(object):
     def delete(self):
         """ Delete group record, enforces referential integrity with Users. """
         udb = DBProxy(USERDB)
-        for chk_user in self.members:
-            user = udb[chk_user]
+        operations = list()
+        for user in udb.batch([('__getitem__', (chk_user,))
+                               for chk_user in self.members]):
             if self.name in user.groups:
                 user.group_del(self.name)
-                user.save()
+                operations.append(('__setitem__', (user.handle, user)))
+        udb.batch(operations)
         del DBProxy(GROUPDB)[self.name]
 
 
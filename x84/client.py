@@ -1,9 +1,10 @@
 """ Base classes for clients and connections of x/84. """
 
-import array
+import collections
 import errno
 import logging
 import socket
+import Queue
 import threading
 import time
 import warnings
@@ -13,6 +14,81 @@ from x84.bbs.exception import Disconnected
 from x84.terminal import spawn_client_session
 
 
+class BufferQueue(object):
+
+    """
+    Queue of bytestrings buffered for delivery or input.
+
+    Bytestrings are queued as given, without copying, and the bytes not
+    yet consumed are offered by :meth:`view`, a ``memoryview`` of the
+    leading bytestring.  Only bytes that could not be sent are kept, at
+    an offset of that bytestring, so a partial send never copies what
+    remains to be sent.
+    """
+
+    #: bytestrings smaller than this are joined by :meth:`view`, so that
+    #: many small writes are not each sent by a system call.
+    JOIN_SIZE = 65536
+
+    def __init__(self):
+        """ Class initializer. """
+        self._chunks = collections.deque()
+        self._offset = 0
+        self._length = 0
+
+    def __len__(self):
+        """ Number of bytes buffered. """
+        return self._length
+
+    def fromstring(self, bstr):
+        """ Append bytestring ``bstr``, as ``array.fromstring``. """
+        if bstr:
+            self._chunks.append(bstr)
+            self._length += len(bstr)
+
+    def view(self):
+        """
+        Return ``memoryview`` of leading bytes buffered.
+
+        :rtype: memoryview
+        """
+        chunks = self._chunks
+        if len(chunks) > 1 and len(chunks[0]) - self._offset < self.JOIN_SIZE:
+            parts = [chunks.popleft()[self._offset:]]
+            self._offset = 0
+            size = len(parts[0])
+            while chunks and size + len(chunks[0]) <= self.JOIN_SIZE:
+                size += len(chunks[0])
+                parts.append(chunks.popleft())
+            chunks.appendleft(''.join(parts))
+        return memoryview(chunks[0])[self._offset:]
+
+    def consume(self, num):
+        """ Discard ``num`` leading bytes, such as those sent. """
+        self._length -= num
+        while num:
+            remaining = len(self._chunks[0]) - self._offset
+            if num < remaining:
+                self._offset += num
+                return
+            self._chunks.popleft()
+            self._offset = 0
+            num -= remaining
+
+    def tostring(self):
+        """ Return all bytes buffered, as ``array.tostring``. """
+        if len(self._chunks) == 1 and not self._offset:
+            return self._chunks[0]
+        data = ''.join(self._chunks)
+        return data[self._offset:]
+
+    def clear(self):
+        """ Discard all bytes buffered. """
+        self._chunks.clear()
+        self._offset = 0
+        self._length = 0
+
+
 class BaseClient(object):
 
     """
@@ -43,8 +119,8 @@ class BaseClient(object):
                          ('COLUMNS', 80),
                          ('connection-type', self.kind),
                          ])
-        self.send_buffer = array.array('c')
-        self.recv_buffer = array.array('c')
+        self.send_buffer = BufferQueue()
+        self.recv_buffer = BufferQueue()
         self.bytes_received = 0
         self.connect_time = time.time()
         self.last_input_time = time.time()
@@ -60,6 +136,14 @@ class BaseClient(object):
         except socket.error:
             return None
 
+    def poll_fileno(self):
+        """
+        File descriptor polled by the engine for :meth:`socket_recv`.
+
+        Returns ``None`` when there is no such descriptor (yet).
+        """
+        return self.fileno()
+
     def input_ready(self):
         """ Whether any data is buffered for reading. """
         return bool(self.recv_buffer.__len__())
@@ -82,9 +166,6 @@ class BaseClient(object):
             warnings.warn('send() called on empty buffer', RuntimeWarning, 2)
             return 0
 
-        ready_bytes = bytes(''.join(self.send_buffer))
-        self.send_buffer = array.array('c')
-
         def _send(send_bytes):
             """
             Inner low-level function for socket send.
@@ -100,10 +181,16 @@ class BaseClient(object):
                     return 0
                 raise Disconnected('send: {0}'.format(err))
 
-        sent = _send(ready_bytes)
-        if sent < len(ready_bytes):
-            # re-buffer data that could not be pushed to socket;
-            self.send_buffer.fromstring(ready_bytes[sent:])
+        # send until the socket accepts no more, bytes that could not be
+        # pushed to socket remain buffered.
+        sent = 0
+        while self.send_buffer.__len__():
+            ready_bytes = self.send_buffer.view()
+            num_sent = _send(ready_bytes)
+            self.send_buffer.consume(num_sent)
+            sent += num_sent
+            if num_sent < len(ready_bytes):
+                break
         return sent
 
     def send_ready(self):
@@ -155,7 +242,7 @@ class BaseClient(object):
         Should be called conditionally when :meth:`input_ready` returns True.
         """
         data = self.recv_buffer.tostring()
-        self.recv_buffer = array.array('c')
+        self.recv_buffer.clear()
         return data
 
     def send_str(self, bstr):
@@ -236,3 +323,166 @@ class BaseConnect(threading.Thread):
         self.client.sock.setblocking(0)
         self.client.sock.setsockopt(
             socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+
+
+class ConnectWorker(threading.Thread):
+
+    """ Thread running on-connect handlers queued by :class:`ConnectPool`. """
+
+    def __init__(self, pool):
+        """
+        Class initializer.
+
+        :param ConnectPool pool: pool of this worker, whose ``work_queue``
+                                 holds :class:`BaseConnect` instances,
+                                 ``None`` signals thread exit.
+        """
+        self.log = logging.getLogger(__name__)
+        self.pool = pool
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+    def run(self):
+        """ Negotiate queued connections until ``None`` is received. """
+        while True:
+            connect = self.pool.work_queue.get()
+            if connect is None:
+                break
+            if connect.stopped:
+                # server shutdown before negotiation began.
+                connect.client.deactivate()
+                continue
+            st_time = time.time()
+            try:
+                connect.run()
+            except Exception as err:
+                # pylint: disable=W0703
+                #         Catching too general exception
+                self.log.exception(err)
+            finally:
+                self.pool.record(connect, st_time)
+
+
+class ConnectPool(object):
+
+    """
+    Bounded pool of :class:`ConnectWorker` threads.
+
+    On-connect handlers are queued by :meth:`submit`, and their
+    :meth:`BaseConnect.run` method called by the first available worker,
+    rather than each started as a new thread, so that the number of
+    negotiating threads remains bounded under load.  At most
+    ``max_queue`` connections may wait for a worker, further connections
+    should be refused while :meth:`full`.
+
+    The time each connection waited for a worker, and the duration of its
+    negotiation are measured, see :meth:`stats`.
+    """
+
+    def __init__(self, num_workers, max_queue=0):
+        """
+        Class initializer.
+
+        :param int num_workers: number of worker threads to start.
+        :param int max_queue: maximum number of connections waiting for a
+                              worker, unlimited when ``0``.
+        """
+        self.log = logging.getLogger(__name__)
+        self.work_queue = Queue.Queue(maxsize=max(0, max_queue))
+        self._lock = threading.Lock()
+        self.num_refused = 0
+        self.num_negotiated = 0
+        self.queue_wait = [0.0, 0.0]
+        self.negotiation = [0.0, 0.0]
+        self.workers = [ConnectWorker(self)
+                        for _ in range(max(1, num_workers))]
+        for worker in self.workers:
+            worker.start()
+        self.log.debug('started {0} negotiation workers, queue depth {1}'
+                       .format(len(self.workers), max_queue or 'unlimited'))
+
+    def full(self):
+        """ Whether no more connections may be queued. """
+        return self.work_queue.full()
+
+    def submit(self, connect):
+        """
+        Queue :class:`BaseConnect` ``connect`` for negotiation.
+
+        :rtype: bool
+        :returns: ``False`` if the queue is full and ``connect`` refused.
+        """
+        connect.queued_time = time.time()
+        try:
+            self.work_queue.put_nowait(connect)
+        except Queue.Full:
+            self.refused()
+            return False
+        return True
+
+    def refused(self):
+        """ Count a connection refused while :meth:`full`. """
+        with self._lock:
+            self.num_refused += 1
+
+    def record(self, connect, st_time):
+        """
+        Record queue wait and negotiation duration of ``connect``.
+
+        :param BaseConnect connect: negotiated connection.
+        :param float st_time: time the negotiation began.
+        """
+        now = time.time()
+        waited = st_time - connect.queued_time
+        duration = now - st_time
+        with self._lock:
+            self.num_negotiated += 1
+            for measure, value in ((self.queue_wait, waited),
+                                   (self.negotiation, duration)):
+                measure[0] += value
+                measure[1] = max(measure[1], value)
+        self.log.debug('{client.addrport}: negotiated in {0:0.3f}s, '
+                       'queued for {1:0.3f}s.'
+                       .format(duration, waited, client=connect.client))
+
+    def stats(self):
+        """
+        Return dictionary of negotiation metrics.
+
+        Keys ``num_negotiated``, ``num_refused``, ``num_queued``, and
+        ``queue_wait`` and ``negotiation``, each a tuple of the average
+        and maximum seconds.
+        """
+        with self._lock:
+            num = max(1, self.num_negotiated)
+            return dict(num_negotiated=self.num_negotiated,
+                        num_refused=self.num_refused,
+                        num_queued=self.work_queue.qsize(),
+                        queue_wait=(self.queue_wait[0] / num,
+                                    self.queue_wait[1]),
+                        negotiation=(self.negotiation[0] / num,
+                                     self.negotiation[1]))
+
+    def shutdown(self):
+        """ Signal all workers to exit once negotiations are complete. """
+        stats = self.stats()
+        self.log.info('{num_negotiated} connections negotiated, '
+                      '{num_refused} refused; queue wait avg {0:0.3f}s '
+                      'max {1:0.3f}s, negotiation avg {2:0.3f}s max '
+                      '{3:0.3f}s.'.format(*(stats['queue_wait'] +
+                                             stats['negotiation']),
+                                          **stats))
+        # connections still queued are not negotiated,
+        while True:
+            try:
+                connect = self.work_queue.get_nowait()
+            except Queue.Empty:
+                break
+            if connect is not None:
+                connect.client.deactivate()
+        for _ in self.workers:
+            try:
+                self.work_queue.put_nowait(None)
+            except Queue.Full:
+                # workers are daemon threads, exiting with the engine.
+                break
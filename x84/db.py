@@ -1,8 +1,12 @@
 """ Database request handler for x/84. """
 # std imports
 import multiprocessing
+import collections
 import threading
+import functools
 import logging
+import sqlite3
+import Queue
 import errno
 import os
 
@@ -12,9 +16,45 @@ import sqlitedict
 FILELOCK = multiprocessing.Lock()
 DATALOCK = {}
 
+#: singleton of :class:`DBWorkerPool`, created on first use by
+#: :func:`get_db_pool`.
+DBPOOL = None
 
-def get_database(filepath, table):
-    """ Return :class:`sqlitedict.SqliteDict` instance for given database. """
+#: default number of database worker threads, ``[system]`` option
+#: ``db_workers`` of the configuration file.
+DB_WORKERS = 4
+
+#: maximum number of database connections held open by each
+#: :class:`DBWorker`, the least recently used is closed when exceeded.
+DB_CONNECTIONS = 32
+
+#: put to the queue of results of each select awaiting a database
+#: connection whose thread has exited, see :func:`_watch_database`.
+DB_CLOSED = object()
+
+#: dictionary methods, and functions of :data:`DB_FUNCTIONS`, that modify
+#: the database.
+WRITE_METHODS = ('__setitem__', '__delitem__', 'setdefault', 'update',
+                 'pop', 'popitem', 'clear', 'fts_index', 'fts_remove')
+
+#: name of sqlite3 full-text search module, determined by
+#: :func:`get_fts_module`.
+FTS_MODULE = None
+
+#: set of ``(schema, table)`` written since last call of
+#: :func:`pop_db_writes`, so that the engine may invalidate session caches.
+DB_WRITES = set()
+DB_WRITES_LOCK = threading.Lock()
+
+
+def get_database(filepath, table, autocommit=True):
+    """
+    Return :class:`sqlitedict.SqliteDict` instance for given database.
+
+    When ``autocommit`` is False, changes are made within a transaction
+    that must be completed by :meth:`sqlitedict.SqliteDict.commit`, or
+    discarded by closing the database without commit.
+    """
     # pylint: disable=W0602
     #          Using global for 'FILELOCK' but no assignment is done
     global FILELOCK
@@ -26,10 +66,60 @@ def get_database(filepath, table):
 
         dictdb = sqlitedict.SqliteDict(filename=filepath,
                                        tablename=table,
-                                       autocommit=True)
+                                       autocommit=autocommit)
+    # results of a select are awaited only while its thread is alive.
+    dictdb.conn.pending_selects = set()
+    dictdb.conn.select = functools.partial(_select, dictdb.conn)
+    watcher = threading.Thread(target=_watch_database, args=(dictdb.conn,))
+    watcher.daemon = True
+    watcher.start()
     return dictdb
 
 
+def _watch_database(conn):
+    """
+    Wake all selects awaiting ``conn`` once its thread has exited.
+
+    The thread of a :class:`sqlitedict.SqliteMultithread` exits when any
+    statement raises an exception, such as ``database is locked``, and
+    never answers the selects queued on it.  The thread is joined, rather
+    than polled by the select: a wait with timeout sleeps in steps of a
+    millisecond or more on python 2, which would delay every select.
+
+    :param sqlitedict.SqliteMultithread conn: database connection thread.
+    """
+    conn.join()
+    for res in list(conn.pending_selects):
+        res.put(DB_CLOSED)
+
+
+def _select(conn, req, arg=None):
+    """
+    Yield rows of select ``req`` executed by ``conn``.
+
+    Replaces :meth:`sqlitedict.SqliteMultithread.select`, which waits
+    forever for rows when the thread of ``conn`` has exited by error.
+
+    :param sqlitedict.SqliteMultithread conn: database connection thread.
+    :raises sqlite3.OperationalError: thread of ``conn`` has exited.
+    """
+    res = Queue.Queue()
+    conn.pending_selects.add(res)
+    try:
+        conn.execute(req, arg, res)
+        # the thread may have exited before this select was added.
+        rec = DB_CLOSED if not conn.is_alive() else res.get()
+        while rec != '--no more--':
+            if rec is DB_CLOSED:
+                raise sqlite3.OperationalError(
+                    'database connection to {0} closed by error'
+                    .format(conn.filename))
+            yield rec
+            rec = res.get()
+    finally:
+        conn.pending_selects.discard(res)
+
+
 def check_db(filepath):
     """
     Verify permission access of given database file.
@@ -70,8 +160,13 @@ def get_db_func(dictdb, cmd):
     """
     Return callable function of method on ``dictdb``.
 
+    Functions of :data:`DB_FUNCTIONS` are also accepted, ``dictdb``
+    given as their first argument.
+
     :raises AssertionError: not a valid method or not callable.
     """
+    if cmd in DB_FUNCTIONS:
+        return functools.partial(DB_FUNCTIONS[cmd], dictdb)
     assert hasattr(dictdb, cmd), (
         "{cmd!r} not a valid method of {db_type!r}"
         .format(cmd=cmd, db_type=type(dictdb)))
@@ -82,6 +177,163 @@ def get_db_func(dictdb, cmd):
     return func
 
 
+def get_fts_module():
+    """ Return name of best available sqlite3 full-text search module. """
+    # pylint: disable=W0603
+    #         Using the global statement
+    global FTS_MODULE
+    if FTS_MODULE is None:
+        conn = sqlite3.connect(':memory:')
+        try:
+            conn.execute('CREATE VIRTUAL TABLE probe USING fts5(text)')
+            FTS_MODULE = 'fts5'
+        except sqlite3.OperationalError:
+            FTS_MODULE = 'fts4'
+        finally:
+            conn.close()
+    return FTS_MODULE
+
+
+def fts_table(dictdb):
+    """ Return name of full-text search table of ``dictdb``. """
+    return '{0}_fts'.format(dictdb.tablename)
+
+
+def fts_index(dictdb, docid, document):
+    """
+    Add or replace ``document`` in full-text search table of ``dictdb``.
+
+    The table is created on first use, its columns named by the keys of
+    ``document``, which must remain the same for all documents.
+
+    :param sqlitedict.SqliteDict dictdb: open database.
+    :param int docid: document id, returned by :func:`fts_search`.
+    :param dict document: text of each column, keyed by column name.
+    """
+    table, columns = fts_table(dictdb), sorted(document.keys())
+    tokenize = ', tokenize=unicode61' if get_fts_module() == 'fts4' else ''
+    dictdb.conn.execute('CREATE VIRTUAL TABLE IF NOT EXISTS {0} USING '
+                        '{1}({2}{3})'.format(table, get_fts_module(),
+                                             ', '.join(columns), tokenize))
+    dictdb.conn.execute('DELETE FROM {0} WHERE rowid = ?'.format(table),
+                        (docid,))
+    dictdb.conn.execute('INSERT INTO {0} (rowid, {1}) VALUES (?{2})'
+                        .format(table, ', '.join(columns),
+                                ', ?' * len(columns)),
+                        [docid] + [document[column] for column in columns])
+
+
+def fts_remove(dictdb, docid):
+    """ Remove document ``docid`` from full-text search table. """
+    table = fts_table(dictdb)
+    if dictdb.conn.select_one('SELECT name FROM sqlite_master WHERE name = ?',
+                              (table,)) is not None:
+        dictdb.conn.execute('DELETE FROM {0} WHERE rowid = ?'.format(table),
+                            (docid,))
+
+
+def fts_search(dictdb, query, offset=0, limit=20):
+    """
+    Return document ids matching all words of ``query``, best match first.
+
+    Each word of ``query`` is matched as a literal phrase, operators and
+    punctuation of the sqlite3 full-text query syntax are not interpreted.
+    Matches are ranked by relevance when the table uses the ``fts5``
+    module, otherwise (``fts4``) the most recently indexed are first.
+
+    :param sqlitedict.SqliteDict dictdb: open database.
+    :param unicode query: words to search for.
+    :param int offset: number of matches to skip, for pagination.
+    :param int limit: maximum number of matches returned.
+    :rtype: list
+    """
+    table = fts_table(dictdb)
+    words = [u'"{0}"'.format(word.replace(u'"', u'""'))
+             for word in query.split()]
+    row = dictdb.conn.select_one('SELECT sql FROM sqlite_master '
+                                 'WHERE name = ?', (table,))
+    if not words or row is None:
+        return []
+    order_by = 'rank' if 'fts5' in row[0].lower() else 'rowid DESC'
+    return [docid for (docid,) in dictdb.conn.select(
+        'SELECT rowid FROM {0} WHERE {0} MATCH ? ORDER BY {1} '
+        'LIMIT ? OFFSET ?'.format(table, order_by),
+        (u' '.join(words), int(limit), int(offset)))]
+
+
+#: database functions that are not methods of :class:`sqlitedict.SqliteDict`,
+#: see :func:`get_db_func`.
+DB_FUNCTIONS = {
+    'fts_index': fts_index,
+    'fts_remove': fts_remove,
+    'fts_search': fts_search,
+}
+
+
+def execute_batch(dictdb, operations):
+    """
+    Execute a sequence of dictionary methods as a single transaction.
+
+    ``dictdb`` must be opened using ``autocommit=False``.  When any method
+    raises an exception, the caller must close ``dictdb`` without commit,
+    so that all changes made by ``operations`` are rolled back.
+
+    :param sqlitedict.SqliteDict dictdb: database opened without autocommit.
+    :param list operations: sequence of ``(method, args)``, for example,
+                            ``[('get', ('key',)), ('__setitem__', ('key',
+                            'value'))]``.
+    :rtype: list
+    :returns: return values of each method, in order of ``operations``.
+    """
+    results = [get_db_func(dictdb, method)(*args)
+               for method, args in operations]
+    dictdb.commit()
+    sync_db(dictdb)
+    return results
+
+
+def sync_db(dictdb):
+    """
+    Wait for all statements queued on ``dictdb`` to complete.
+
+    Statements (and commit) are queued by sqlitedict for execution by a
+    thread of its own, without waiting for them to complete.  A select is
+    answered only after all prior statements are executed, so that their
+    changes are then visible to any other database connection.
+    """
+    dictdb.conn.select_one('SELECT 1')
+
+
+def is_db_write(cmd, args):
+    """ Whether database command ``cmd`` (or its batch) modifies data. """
+    if cmd == 'batch':
+        return any(method in WRITE_METHODS for method, _ in args[0])
+    return cmd in WRITE_METHODS
+
+
+def notify_db_write(schema, table):
+    """
+    Record that ``(schema, table)`` has been modified.
+
+    The main thread of the engine is woken, if blocking, to call
+    :func:`pop_db_writes` and broadcast an invalidation event to any
+    sessions caching this table, see :class:`x84.bbs.dbproxy.DBCache`.
+    """
+    with DB_WRITES_LOCK:
+        DB_WRITES.add((schema, table))
+    from x84 import reactor
+    if reactor.REACTOR is not None:
+        reactor.REACTOR.wakeup()
+
+
+def pop_db_writes():
+    """ Return and clear set of ``(schema, table)`` modified. """
+    with DB_WRITES_LOCK:
+        writes = set(DB_WRITES)
+        DB_WRITES.clear()
+    return writes
+
+
 def parse_dbevent(event):
     """
     Parse a database event into ``(iterable, schema)``.
@@ -111,7 +363,7 @@ def log_db_cmd(log, schema, cmd, args):
                                             args=s_args))
 
 
-class DBHandler(threading.Thread):
+class DBHandler(object):
 
     """
     This handler receives and handles a dictionary-based "database command".
@@ -121,6 +373,10 @@ class DBHandler(threading.Thread):
     is then dispatched by the engine.
 
     The return values are sent to the session queue with equal 'event' name.
+
+    Commands are queued by :meth:`start` for execution by a long-lived
+    worker of :class:`DBWorkerPool`, which keeps its database connections
+    open between commands.
     """
 
     def __init__(self, queue, event, data):
@@ -136,11 +392,17 @@ class DBHandler(threading.Thread):
                           the IPC Queue as a stream.
         :param tuple data: a dict method proxy command sequence in form of
                            ``(table, command, arguments)``.  For example,
-                           ``('unnamed', 'pop', 0).
+                           ``('unnamed', 'pop', 0).  When command is
+                           ``'batch'``, the only argument is a sequence of
+                           ``(command, arguments)`` executed as a single
+                           transaction by :func:`execute_batch`, returning
+                           a list of their results.
         """
         self.log = logging.getLogger(__name__)
         self.queue, self.event = queue, event
         self.table, self.cmd, self.args = data
+        self.batch = self.cmd == 'batch'
+        self.write = is_db_write(self.cmd, self.args)
 
         self.iterable, self.schema = parse_dbevent(event)
         self.filepath = get_db_filepath(self.schema)
@@ -149,19 +411,53 @@ class DBHandler(threading.Thread):
         self._tap_db = self.log.isEnabledFor(logging.DEBUG) and (
             get_ini('session', 'tab_db', getter='getboolean'))
 
-        threading.Thread.__init__(self)
+    def start(self):
+        """ Queue command for execution by database worker pool. """
+        get_db_pool().submit(self)
 
     def run(self):
-        """ Execute database command and return results to session queue. """
-        dictdb = get_database(self.filepath, self.table)
-        func = get_db_func(dictdb, self.cmd)
+        """ Execute database command using a new, temporary connection. """
+        dictdb = get_database(self.filepath, self.table,
+                              autocommit=not self.batch)
+        try:
+            self.execute(dictdb)
+        finally:
+            dictdb.close()
+
+    def execute(self, dictdb):
+        """
+        Execute database command and return results to session queue.
+
+        :param sqlitedict.SqliteDict dictdb: open database of ``table``,
+                                             without autocommit for a batch.
+        :rtype: bool
+        :returns: False when command failed by exception.  For a batch,
+                  ``dictdb`` must then be closed to roll back its changes.
+        """
         if self._tap_db:
             log_db_cmd(self.log, self.schema, self.cmd, self.args)
 
         try:
+            # batch of results, as a single transaction,
+            if self.batch:
+                results = execute_batch(dictdb, *self.args)
+                if self.write:
+                    notify_db_write(self.schema, self.table)
+                self.queue.send((self.event, results))
+                return True
+
+            func = get_db_func(dictdb, self.cmd)
+
             # single value result,
             if not self.iterable:
                 result = func(*self.args)
+                if self.write:
+                    # completed and recorded before replying, so that the
+                    # write is visible to any command issued after it, and
+                    # invalidation is broadcast before the session may act
+                    # on its write.
+                    sync_db(dictdb)
+                    notify_db_write(self.schema, self.table)
                 self.queue.send((self.event, result))
 
             # iterable value result,
@@ -182,8 +478,137 @@ class DBHandler(threading.Thread):
                     # our pipe/queue has been disconnected (the session
                     # has disconnected), heck this might be the cause of
                     # our first exception
-                    return
+                    return False
                 raise
+            return False
+        return True
+
 
+class DBWorker(threading.Thread):
+
+    """
+    Long-lived database worker thread of :class:`DBWorkerPool`.
+
+    Executes :class:`DBHandler` commands received from a shared queue,
+    keeping a database connection open for each ``(filepath, table)``
+    it has served, rather than opening and closing one per command, up
+    to :data:`DB_CONNECTIONS`.  Batch commands use a second connection,
+    without autocommit.
+    """
+
+    def __init__(self, work_queue):
+        """
+        Class initializer.
+
+        :param Queue.Queue work_queue: queue of :class:`DBHandler` instances,
+                                       ``None`` signals thread exit.
+        """
+        self.log = logging.getLogger(__name__)
+        self.work_queue = work_queue
+        self.databases = collections.OrderedDict()
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+    def get_database(self, filepath, table, autocommit=True):
+        """ Return open database for ``(filepath, table)``. """
+        key = (filepath, table, autocommit)
+        if key in self.databases and not self.databases[key].conn.is_alive():
+            # thread of connection exited by error of a prior command.
+            self.close_database(*key)
+        if key in self.databases:
+            # move to most recently used,
+            self.databases[key] = self.databases.pop(key)
+        else:
+            while len(self.databases) >= DB_CONNECTIONS:
+                self.close_database(*next(iter(self.databases)))
+            self.databases[key] = get_database(filepath, table, autocommit)
+        return self.databases[key]
+
+    def close_database(self, filepath, table, autocommit=True):
+        """ Close and forget database of ``(filepath, table)``. """
+        dictdb = self.databases.pop((filepath, table, autocommit), None)
+        if dictdb is not None:
+            try:
+                dictdb.close()
+            except Exception as err:
+                # pylint: disable=W0703
+                #         Catching too general exception
+                self.log.debug('close {0}/{1}: {2}'
+                               .format(filepath, table, err))
+
+    def close(self):
+        """ Close all databases held open by this worker. """
+        for filepath, table, autocommit in self.databases.keys():
+            self.close_database(filepath, table, autocommit)
+
+    def run(self):
+        """ Execute queued database commands until ``None`` is received. """
+        try:
+            while True:
+                handler = self.work_queue.get()
+                if handler is None:
+                    break
+                key = (handler.filepath, handler.table, not handler.batch)
+                try:
+                    if not handler.execute(self.get_database(*key)):
+                        # the connection may have been left in a bad state
+                        # by the failed command (or an uncommitted batch
+                        # must be rolled back), re-open on next use.
+                        self.close_database(*key)
+                except Exception as err:
+                    # pylint: disable=W0703
+                    #         Catching too general exception
+                    self.log.exception(err)
+                    self.close_database(*key)
         finally:
-            dictdb.close()
+            self.close()
+
+
+class DBWorkerPool(object):
+
+    """
+    Bounded pool of :class:`DBWorker` threads.
+
+    Database commands of all sessions are queued by :meth:`submit`,
+    and executed by the first available worker, so that the number of
+    threads and open database connections remain bounded under load.
+    """
+
+    def __init__(self, num_workers=DB_WORKERS):
+        """
+        Class initializer.
+
+        :param int num_workers: number of worker threads to start.
+        """
+        self.log = logging.getLogger(__name__)
+        self.work_queue = Queue.Queue()
+        self.workers = [DBWorker(self.work_queue)
+                        for _ in range(max(1, num_workers))]
+        for worker in self.workers:
+            worker.start()
+        self.log.debug('started {0} database workers'
+                       .format(len(self.workers)))
+
+    def submit(self, handler):
+        """ Queue :class:`DBHandler` ``handler`` for execution. """
+        self.work_queue.put(handler)
+
+    def shutdown(self, wait=True):
+        """ Signal all workers to close their databases and exit. """
+        for _ in self.workers:
+            self.work_queue.put(None)
+        if wait:
+            for worker in self.workers:
+                worker.join()
+
+
+def get_db_pool():
+    """ Return :class:`DBWorkerPool` of current process. """
+    # pylint: disable=W0603
+    #         Using the global statement
+    global DBPOOL
+    if DBPOOL is None:
+        from x84.bbs.ini import get_ini
+        num_workers = get_ini('system', 'db_workers', getter='getint')
+        DBPOOL = DBWorkerPool(num_workers=num_workers or DB_WORKERS)
+    return DBPOOL
@@ -215,6 +215,10 @@ def main(save_key=None, continue_draft=False):
     #         Too many statements
     session, term = getsession(), getterminal()
 
+    # this module is not executed again for each call of main(); forget
+    # the undo buffer of any previous document.
+    del UNDO[:]
+
     # set syncterm font, if any
     if term.kind.startswith('ansi'):
         echo(syncterm_setfont(syncterm_font))
@@ -556,6 +556,7 @@ def main():
     session, term = getsession(), getterminal()
     session.activity = u'Browsing files'
     db_desc = DBProxy(DIZ_DB)
+    browser.last_diz_len = 0
 
     # set syncterm font, if any
     if SYNCTERM_FONT and term.kind.startswith('ansi'):
@@ -234,6 +234,7 @@ def view_article(session, term, url, title):
         width -=1
     fetch_txt = 'fetching {0}'.format(url)
     echo(u''.join((moveto_lastline, term.center(fetch_txt[:term.width], width))))
+    session.flush()
 
     # perform get request,
     headers = {'User-Agent': USER_AGENT}
@@ -357,6 +358,7 @@ def view_article_summaries(session, term, rss_url, rss_title):
     # fetch rss feed articles
     echo(term.move(term.height // 2, 0))
     echo(term.center('Fetching {0} ...'.format(term.bold(rss_url))).rstrip())
+    session.flush()
     result = feedparser.parse(rss_url)
     if result.get('status') != 200:
         # display 404, 500, or whatever non-200 code returned.
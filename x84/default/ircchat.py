@@ -371,6 +371,7 @@ def establish_connection(term, session):
 
     client = IRCChat(term, session)
     irc_handle = session.user.handle.replace(' ', '_')
+    session.flush()
     try:
         # pylint: disable=W0142
         client.connect(SERVER, PORT, irc_handle, **kwargs)
@@ -582,6 +583,7 @@ def main():
             if not input_event(term, client, editor):
                 break
         elif event == 'irc-quit':
+            session.flush()
             time.sleep(0.5)
             break
     client.connection.disconnect()
@@ -46,7 +46,7 @@ def get_lastcallers(last):
                                location=location,
                                handle=handle.decode('utf8'))
                    for handle, (time_called, num_calls, location)
-                   in DBProxy('lastcalls').items()])[:last]
+                   in DBProxy('lastcalls', cached=True).items()])[:last]
 
 
 def main(last=10):
@@ -399,6 +399,12 @@ def main():
     global menutoggle
     global arttoggle
     global bgtoggle
+    global walltime
+
+    # this module is not executed again for each call of main(),
+    # reset display toggles as they are when the module is loaded.
+    menutoggle = arttoggle = bgtoggle = True
+    walltime = time.time() - 60
 
     text, width, height, dirty = u'', -1, -1, 2
     menu_items = get_menu_items(session)
@@ -20,6 +20,10 @@ from x84.bbs import (
     syncterm_setfont,
     ScrollingEditor,
     list_privmsgs,
+    list_msgs_since,
+    get_last_msg_idx,
+    ReadMsgs,
+    search_msgs,
     decode_pipe,
     getterminal,
     getsession,
@@ -30,7 +34,6 @@ from x84.bbs import (
     get_ini,
     get_msg,
     timeago,
-    DBProxy,
     gosub,
     echo,
     Msg,
@@ -99,6 +102,11 @@ subject_max_length = get_ini(
     section='msg', key='max_subject', getter='getint'
 ) or 40
 
+#: number of messages found by search read as a page
+search_limit = get_ini(
+    section='msgarea', key='search_limit', getter='getint'
+) or 100
+
 
 def get_menu(messages):
     """ Return list of menu items by given dict ``messages``. """
@@ -118,6 +126,7 @@ def get_menu(messages):
             MenuItem(u'v', u'private ({0})'.format(len(messages['private'])))
         )
     items.extend([
+        MenuItem(u's', u'search'),
         MenuItem(u'p', u'post public'),
         MenuItem(u'w', u'write private'),
         MenuItem(u'c', u'change area'),
@@ -129,16 +138,25 @@ def get_menu(messages):
 
 def do_mark_as_read(session, message_indicies):
     """ Mark all given messages read. """
-    session.user['readmsgs'] = (
-        session.user.get('readmsgs', set()) | set(message_indicies)
-    )
+    ReadMsgs(session.user.handle).update(message_indicies)
 
 
 def get_messages_by_subscription(session, subscription):
+    """
+    Return messages matching tag patterns of ``subscription``.
+
+    :rtype: tuple
+    :returns: ``(messages, messages_bytag, last_idx)``, where ``last_idx``
+              is given to :func:`update_messages_by_subscription` to find
+              messages saved since.
+    """
+    # recorded first, so that messages saved while listing all indices
+    # below are found by the next call to update_messages_by_subscription.
+    last_idx = get_last_msg_idx()
     all_tags = list_tags()
     messages = {'all': set(), 'new': set()}
     messages_bytag = {}
-    messages_read = session.user.get('readmsgs', set())
+    messages_read = ReadMsgs(session.user.handle)
 
     # this looks like perl code
     for tag_pattern in subscription:
@@ -147,8 +165,8 @@ def get_messages_by_subscription(session, subscription):
             msg_indicies = list_msgs(tags=(tag_match,))
             messages['all'].update(msg_indicies)
             messages_bytag[tag_pattern]['all'].update(msg_indicies)
-        messages_bytag[tag_pattern]['new'] = (
-            messages_bytag[tag_pattern]['all'] - messages_read)
+        messages_bytag[tag_pattern]['new'] = messages_read.unread(
+            messages_bytag[tag_pattern]['all'])
 
     # now occlude all private messages :)
     all_private = list_privmsgs(None)
@@ -159,9 +177,43 @@ def get_messages_by_subscription(session, subscription):
     messages['private'] = list_privmsgs(session.user.handle)
 
     # and calculate 'new' messages
-    messages['new'] = (messages['all'] | messages['private']) - messages_read
+    messages['new'] = messages_read.unread(
+        messages['all'] | messages['private'])
 
-    return messages, messages_bytag
+    return messages, messages_bytag, last_idx
+
+
+def update_messages_by_subscription(session, subscription, messages,
+                                    messages_bytag, last_idx):
+    """
+    Add messages saved after ``last_idx`` that match ``subscription``.
+
+    Only those messages saved since ``last_idx`` are retrieved, rather
+    than the indices of all messages of every subscribed tag.
+
+    :rtype: tuple
+    :returns: ``(last_idx, added)``, the new ``last_idx`` and set of
+              indices of unread messages added to ``messages['new']``.
+    """
+    last_idx, new_msgs = list_msgs_since(last_idx)
+    messages_read = ReadMsgs(session.user.handle)
+    added = set()
+    for msg in new_msgs:
+        private = 'public' not in msg.tags and msg.recipient is not None
+        if private and msg.recipient == session.user.handle:
+            messages['private'].add(msg.idx)
+            added.add(msg.idx)
+        for tag_pattern in subscription:
+            if fnmatch.filter(msg.tags, tag_pattern):
+                messages_bytag[tag_pattern]['all'].add(msg.idx)
+                if msg.idx not in messages_read:
+                    messages_bytag[tag_pattern]['new'].add(msg.idx)
+                if not private:
+                    messages['all'].add(msg.idx)
+                    added.add(msg.idx)
+    added = messages_read.unread(added)
+    messages['new'].update(added)
+    return last_idx, added
 
 
 def describe_message_area(term, subscription, messages_bytags, colors):
@@ -481,29 +533,7 @@ def can_delete(session):
 
 def delete_message(msg):
     """ Experimental message delete! """
-    # ! belongs as msg.delete() function !
-    msg.recipient = u''
-    msg.subject = u''
-    msg.body = u''
-    msg.children = set()
-    msg.parent = None
-    msg.tags = set()
-    msg.save()
-    with DBProxy('tags') as tag_db:
-        for key, values in tag_db.items()[:]:
-            if msg.idx in values:
-                newvalue = values - set([msg.idx])
-                if newvalue:
-                    tag_db[key] = newvalue
-                else:
-                    # no more messages by this tag, delete it
-                    del tag_db[key]
-    with DBProxy('privmsg') as priv_db:
-        for key, values in priv_db.items()[:]:
-            if msg.idx in values:
-                priv_db[key] = values - set([msg.idx])
-    with DBProxy('msgbase') as msg_db:
-        del msg_db['%d' % int(msg.idx)]
+    msg.delete()
 
 
 def do_reader_prompt(session, term, index, message_indices, colors):
@@ -641,6 +671,7 @@ def main(quick=False):
 
     yloc = top_margin = 0
     subscription = session.user.get('msg_subscription', [])
+    messages = None
     dirty = 2
 
     while True:
@@ -666,8 +697,9 @@ def main(quick=False):
                         subscription=subscription, colors=colors))
                 continue
 
-            messages, messages_bytags = get_messages_by_subscription(
-                session, subscription)
+            if messages is None:
+                messages, messages_bytags, last_idx = (
+                    get_messages_by_subscription(session, subscription))
 
             # When quick login ('y') selected in top.py, return immediately
             # when no new messages are matched any longer.
@@ -701,12 +733,13 @@ def main(quick=False):
         elif event == 'newmsg':
             # When a new message is sent, 'newmsg' event is broadcasted.
             session.flush_event('newmsg')
-            nxt_msgs, nxt_bytags = get_messages_by_subscription(
-                session, subscription)
-            if nxt_msgs['new'] - messages['new']:
+            if messages is None:
+                continue
+            last_idx, added = update_messages_by_subscription(
+                session, subscription, messages, messages_bytags, last_idx)
+            if added:
                 # beep and re-display when a new message has arrived.
                 echo(u'\b')
-                messages, messages_bytags = nxt_msgs, nxt_bytags
                 dirty = True
                 continue
 
@@ -734,10 +767,35 @@ def main(quick=False):
                     read_messages(session=session, term=term,
                                   message_indices=message_indices,
                                   colors=colors)
+                    # messages may have been marked read, re-tagged or
+                    # deleted while reading, retrieve them again.
+                    messages = None
+            elif inp.lower() == u's':
+                # search subject and body of public messages, reading
+                # matches a page at a time.
+                dirty = 2
+                query, offset = prompt_search(term=term, colors=colors), 0
+                while query is not None:
+                    message_indices, more = search_page(
+                        term=term, colors=colors, query=query, offset=offset)
+                    if not message_indices:
+                        break
+                    read_messages(session=session, term=term,
+                                  message_indices=message_indices,
+                                  colors=colors)
+                    messages = None
+                    offset = prompt_search_page(
+                        term=term, colors=colors, offset=offset,
+                        num_found=len(message_indices), more=more)
+                    if offset is None:
+                        break
             elif inp.lower() == u'm' and messages['new']:
                 # mark all messages as read
                 dirty = 1
-                do_mark_as_read(session, messages['new'])
+                marked, messages['new'] = messages['new'], set()
+                do_mark_as_read(session, marked)
+                for tag_pattern in subscription:
+                    messages_bytags[tag_pattern]['new'] -= marked
             elif inp.lower() in (u'p', u'w'):
                 # write new public/private message
                 dirty = 2
@@ -758,9 +816,13 @@ def main(quick=False):
                     continue
                 do_send_message(session=session, term=term,
                                 msg=msg, colors=colors)
+                last_idx, _ = update_messages_by_subscription(
+                    session, subscription, messages, messages_bytags,
+                    last_idx)
             elif inp.lower() == u'c':
                 # prompt for new tag subscription (at next loop)
                 subscription = []
+                messages = None
                 dirty = 1
             elif inp.lower() == u'?':
                 # help
@@ -861,6 +923,93 @@ def prompt_subject(term, msg, colors):
     return True
 
 
+def prompt_search(term, colors):
+    """
+    Prompt for words to search for in public messages.
+
+    :rtype: unicode
+    :returns: words to search for, or ``None`` when canceled.
+    """
+    xpos = max(0, (term.width // 2) - (80 // 2))
+    echo(term.move_x(xpos) + term.clear_eos)
+    echo(u'Enter words to search for.\r\n')
+    echo(term.move_x(xpos) + ':: ')
+    inp = LineEditor(subject_max_length,
+                     colors={'highlight': colors['backlight']}
+                     ).read()
+    if inp is None or not inp.strip():
+        return None
+    return inp.strip()
+
+
+def search_page(term, colors, query, offset=0):
+    """
+    Return page of public messages matching ``query``, from ``offset``.
+
+    At most ``search_limit`` messages are returned, best match first.
+
+    :rtype: tuple
+    :returns: ``(message_indices, more)``, where ``more`` is whether any
+              further messages match.
+    """
+    message_indices = search_msgs(query, offset=offset,
+                                  limit=search_limit + 1)
+    if not message_indices:
+        xpos = max(0, (term.width // 2) - (80 // 2))
+        echo(u''.join((u'\r\n', term.move_x(xpos),
+                       colors['highlight'](u'No messages found.'),
+                       term.clear_eol)))
+        term.inkey(1)
+    return message_indices[:search_limit], len(message_indices) > search_limit
+
+
+def prompt_search_page(term, colors, offset, num_found, more):
+    """
+    Prompt to read the next or previous page of messages found by search.
+
+    :param int offset: number of matches preceding the page read.
+    :param int num_found: number of matches of the page read.
+    :param bool more: whether any further messages match.
+    :rtype: int
+    :returns: offset of page to read, or ``None`` when done.
+    """
+    xpos = max(0, (term.width // 2) - (80 // 2))
+    opts = []
+    if offset:
+        opts += (('p', 'rev page'),)
+    if more:
+        opts += (('n', 'ext page'),)
+    if not opts:
+        return None
+    opts += (('q', 'uit'),)
+    echo(u'\r\n')
+    while True:
+        echo(term.move_x(xpos))
+        echo(u''.join((
+            u'matches ',
+            colors['highlight'](u'{0}-{1}'.format(offset + 1,
+                                                  offset + num_found)),
+            u' ',
+            u', '.join((
+                u''.join((colors['lowlight'](u'['),
+                          colors['highlight'](key),
+                          colors['lowlight'](u']'),
+                          value
+                          )) for key, value in opts)),
+            u': ',
+            term.clear_eol,
+        )))
+        inp = LineEditor(1, colors={'highlight': colors['backlight']}).read()
+        if inp is None or inp.lower() == u'q':
+            return None
+        elif inp.lower() == u'n' and more:
+            return offset + search_limit
+        elif inp.lower() == u'p' and offset:
+            return max(0, offset - search_limit)
+        # not a valid input option; try again
+        term.inkey(0.15)
+
+
 def prompt_body(term, msg, colors):
     """ Prompt for and set 'body' of message by executing 'editor' script. """
     with term.fullscreen():
@@ -360,7 +360,8 @@ def generate_recent_oneliners(term, n_liners, offset):
     now = time.time()
 
     # fetch all liners in database, sorted ascending by time
-    oneliners = sorted(DBProxy('oneliner').values(), key=keysort_by_datetime)
+    oneliners = sorted(DBProxy('oneliner', cached=True).values(),
+                       key=keysort_by_datetime)
 
     # decide the start/end by given offset, to allow paging, bounds check to
     # ensure that it does not scroll out of range
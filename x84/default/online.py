@@ -1,16 +1,16 @@
 """ Who's online script for x/84. """
 import time
 POLL_KEY = 0.25  # blocking ;; how often to poll keyboard
-POLL_INF = 2.00  # seconds elapsed until re-ask clients for more details
-POLL_AYT = 4.00  # seconds elapsed until global 'are you there?' is checked,
+POLL_WHO = 4.00  # seconds elapsed until idle times are refreshed,
 POLL_OUT = 0.50  # seconds elapsed before screen updates
 
 
-def request_info(sid):
-    """ Send info-req event to target session id ``sid``. """
+def request_who():
+    """ Return dictionary describing each session, keyed by session id. """
     from x84.bbs import getsession
     session = getsession()
-    session.send_event('route', (sid, 'info-req', session.sid,))
+    session.send_event('who', None)
+    return session.read_event('who')
 
 
 def banner():
@@ -196,28 +196,30 @@ def sendmsg(sessions):
 
 def main():
     """ Main procedure. """
-    # pylint: disable=R0912,R0914,R0915
-    #         Too many branches
-    #         Too many local variables
-    #         Too many statements
     from x84.bbs import getsession, getterminal, getch, echo
     session, term = getsession(), getterminal()
-    SELF_ID = session.sid
-    ayt_lastfresh = 0
 
-    def broadcast_ayt(last_update):
-        """ Globally boradcast 'are-you-there' request. """
-        if time.time() - last_update > POLL_AYT:
-            session.send_event('global', ('AYT', session.sid,))
-            last_update = time.time()
-        return last_update
+    # receive 'presence-delta' events as other sessions change, and ask
+    # for all sessions only to refresh their idle time.
+    session.send_event('who-subscribe', True)
+    try:
+        _main(session, term, getch, echo)
+    finally:
+        session.send_event('who-subscribe', False)
+        session.flush_event('presence-delta')
+
 
-    sessions = dict()
+def _main(session, term, getch, echo):
+    """ Display and refresh sessions online until user quits. """
+    # pylint: disable=R0912,R0915
+    #         Too many branches
+    #         Too many statements
+    sessions = request_who()
+    who_lastfresh = time.time()
     dirty = time.time()
     cur_row = 0
 
     while True:
-        ayt_lastfresh = broadcast_ayt(ayt_lastfresh)
         inp = getch(POLL_KEY)
         if session.poll_event('refresh') or (
                 inp in (u' ', term.KEY_REFRESH, unichr(12))):
@@ -243,51 +245,34 @@ def main():
                 disconnect(sessions)
                 dirty = time.time()
 
-        # add sessions that respond to AYT
-        data = session.poll_event('ACK')
-        if data is not None:
-            sid, handle = data
-            if sid in sessions:
-                sessions[sid]['handle'] = handle
-            else:
-                sessions[sid] = dict((
-                    ('handle', handle),
-                    ('lastfresh', time.time()),
-                    ('lastasked', time.time()),))
-                dirty = time.time()
-                echo(u'\a')
-
-        # update sessions that respond to info-req
-        data = session.poll_event('info-ack')
-        if data is not None:
+        # update sessions that have changed, connected, or disconnected
+        data = session.poll_event('presence-delta')
+        while data is not None:
             sid, attrs = data
-            if sessions.get(sid, dict()).get('activity') != attrs['activity']:
-                # and refresh screen if activity changes
+            if attrs is None:
+                if sid in sessions:
+                    sessions[sid]['delete'] = 1
+                    dirty = time.time()
+            elif sid not in sessions:
+                sessions[sid] = attrs
                 dirty = time.time()
-            sessions[sid] = attrs
-            sessions[sid]['lastfresh'] = time.time()
+                echo(u'\a')
+            else:
+                if any(sessions[sid].get(key) != value
+                       for key, value in attrs.items()):
+                    # and refresh screen if activity changes
+                    dirty = time.time()
+                sessions[sid].update(attrs)
+            data = session.poll_event('presence-delta')
+
+        # refresh idle time of all sessions
+        if time.time() - who_lastfresh > POLL_WHO:
+            for sid, attrs in request_who().items():
+                sessions.setdefault(sid, attrs).update(attrs)
+            who_lastfresh = time.time()
 
         # update our own session
-        sessions[SELF_ID] = session.to_dict()
-        sessions[SELF_ID]['lastfresh'] = time.time()
-
-        # request that all sessions update if more stale than POLL_INF,
-        # or is missing session info (only AYT replied so far!),
-        # or has been displayed as 'Disconnected' (marked for deletion)
-        for sid, attrs in sessions.items():
-            if sid == SELF_ID:
-                continue
-            if attrs.get('idle', -1) == -1 or (
-                    time.time() - attrs.get('lastfresh', 0) > POLL_INF
-                    and time.time() - attrs.get('lastasked', 0) > POLL_INF):
-                request_info(sid)
-                attrs['lastasked'] = time.time()
-
-        # prune users who haven't responded to AYT
-        for sid, attrs in sessions.items():
-            if time.time() - attrs['lastfresh'] > (POLL_AYT * 2):
-                sessions[sid]['delete'] = 1
-                dirty = time.time()
+        sessions[session.sid] = session.to_dict()
 
         if dirty is not None and time.time() - dirty > POLL_OUT:
             session.activity = u"Who's Online"
@@ -30,6 +30,7 @@ def main(host, port=None, encoding='cp437'):
     if not session.user.get('expert', False):
         getch(3)
     echo(u'\r\nTrying %s:%s... ' % (host, port,))
+    session.flush()
     # pylint: disable=W0703
     #         Catching too general exception Exception
     try:
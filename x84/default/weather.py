@@ -55,12 +55,13 @@ def speed_conv(val, centigrade):
 
 
 def disp_msg(msg):
-    """ Display unicode string ``msg`` in yellow. """
-    from x84.bbs import getterminal, echo
+    """ Display unicode string ``msg`` in yellow, before a request. """
+    from x84.bbs import getterminal, getsession, echo
     term = getterminal()
     msg = term.bold_yellow(msg)
     dotdot = term.yellow_reverse_bold(u'...')
     echo(u'\r\n\r\n{msg} {dotdot}'.format(msg=msg, dotdot=dotdot))
+    getsession().flush()
 
 
 def disp_notfound():
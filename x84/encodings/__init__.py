@@ -1,6 +1,7 @@
 from __future__ import absolute_import
 
 import codecs
+import encodings
 import logging
 import re
 
@@ -55,6 +56,11 @@ def search_function(encoding):
 codecs.register(search_function)
 
 
+# The cp437 codec of the standard library is of the same mapping as our own,
+# but encodes by dictionary rather than the much faster table, prefer ours.
+encodings._cache['cp437'] = __import__(
+    'x84.encodings.cp437', fromlist=['*'], level=0).getregentry()
+
 # Now to initialize all locally available codecs:
 for encoding in ('amiga', 'atarist', 'cp437_art', 'cp437'):
     ''.decode(encoding)
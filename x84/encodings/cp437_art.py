@@ -13,7 +13,7 @@ import codecs
 class Codec(codecs.Codec):
 
     def encode(self, char, errors='strict'):
-        return codecs.charmap_encode(char, errors, ENCODING_MAP)
+        return charmap_encode(char, errors)
 
     def decode(self, char, errors='strict'):
         return codecs.charmap_decode(char, errors, DECODING_TABLE)
@@ -22,7 +22,7 @@ class Codec(codecs.Codec):
 class IncrementalEncoder(codecs.IncrementalEncoder):
 
     def encode(self, char, final=False):
-        return codecs.charmap_encode(char, self.errors, ENCODING_MAP)[0]
+        return charmap_encode(char, self.errors)[0]
 
 
 class IncrementalDecoder(codecs.IncrementalDecoder):
@@ -31,6 +31,21 @@ class IncrementalDecoder(codecs.IncrementalDecoder):
         return codecs.charmap_decode(char, self.errors, DECODING_TABLE)[0]
 
 
+def charmap_encode(char, errors):
+    """
+    Encode ``char`` as by ``codecs.charmap_encode`` with ``ENCODING_MAP``.
+
+    ENCODING_MAP maps both control characters and their glyphs to the
+    same bytes, which a table of ``codecs.charmap_build`` cannot, and so
+    text is first encoded by ENCODING_TABLE of only one character for each
+    byte, and by the slower ENCODING_MAP only when that fails.
+    """
+    try:
+        return codecs.charmap_encode(char, 'strict', ENCODING_TABLE)
+    except UnicodeEncodeError:
+        return codecs.charmap_encode(char, errors, ENCODING_MAP)
+
+
 class StreamWriter(Codec, codecs.StreamWriter):
     pass
 
@@ -772,3 +787,13 @@ ENCODING_MAP = {
     0x2666: 0x0004,  # BLACK DIAMOND SUIT
     0x266c: 0x000e,  # BEAMED SIXTEENTH NOTES
 }
+
+# Encoding table, of one character for each byte of ENCODING_MAP, the
+# glyph of DECODING_TABLE where it is also mapped; bytes of no character
+# are u'\ufffe', undefined.
+ENCODING_TABLE = [u'\ufffe'] * 256
+for _ucs, _byte in sorted(ENCODING_MAP.items()):
+    if u'\ufffe' == ENCODING_TABLE[_byte] or (
+            unichr(_ucs) == DECODING_TABLE[_byte]):
+        ENCODING_TABLE[_byte] = unichr(_ucs)
+ENCODING_TABLE = codecs.charmap_build(u''.join(ENCODING_TABLE))
@@ -22,7 +22,6 @@ __license__ = 'ISC'
 
 # std
 import logging
-import select
 import socket
 import time
 import sys
@@ -30,9 +29,19 @@ import sys
 # local
 __import__('encodings')  # provides alternate encodings
 from x84 import cmdline
-from x84.db import DBHandler
-from x84.terminal import get_terminals, kill_session, find_tty
+from x84.db import DBHandler, pop_db_writes
+from x84.terminal import (
+    get_terminals,
+    kill_session,
+    find_tty_by_sid,
+    find_tty_by_fd,
+    publish_presence,
+    fill_session_pool,
+    drain_session_pool,
+    NODES,
+)
 from x84.fail2ban import get_fail2ban_function
+from x84.reactor import get_reactor
 
 
 def main():
@@ -60,6 +69,10 @@ def main():
         warnings.warn('This python is built without wide unicode support. '
                       'some internationalized languages will not be possible.')
 
+    # upgrade message base of a previous version, if any.
+    from x84.bbs.msgbase import migrate_msgbase
+    migrate_msgbase()
+
     # retrieve list of managed servers
     servers = get_servers(CFG)
 
@@ -82,7 +95,10 @@ def main():
         _loop(servers)
     except KeyboardInterrupt:
         # exit on ^C, killing any client sessions.
+        drain_session_pool()
         for server in servers:
+            if server.connect_pool is not None:
+                server.connect_pool.shutdown()
             for thread in server.threads[:]:
                 if not thread.stopped:
                     thread.stopped = True
@@ -144,6 +160,10 @@ def accept(log, server, check_ban):
     dictionary server.clients, and spawning an unmanaged thread
     using connect_factory, with optional keyword arguments
     server.connect_factory_kwargs.
+
+    When the server has a connect_pool, the connect_factory instance is
+    queued for negotiation by it instead, and connections are refused
+    with a busy banner while its queue is full.
     """
     if None in (server.client_factory, server.connect_factory):
         raise NotImplementedError(
@@ -163,11 +183,7 @@ def accept(log, server, check_ban):
 
         # busy signal
         if server.client_count() > server.MAX_CONNECTIONS:
-            try:
-                sock.shutdown(socket.SHUT_RDWR)
-            except socket.error:
-                pass
-            sock.close()
+            refuse(sock, server.BUSY_BANNER)
             log.error('{addr}: refused, maximum connections reached.'
                       .format(addr=address_pair[0]))
             return
@@ -175,11 +191,15 @@ def accept(log, server, check_ban):
         # connecting IP is banned
         if check_ban(address_pair[0]) is False:
             log.debug('{addr}: refused, banned.'.format(addr=address_pair[0]))
-            try:
-                sock.shutdown(socket.SHUT_RDWR)
-            except socket.error:
-                pass
-            sock.close()
+            refuse(sock)
+            return
+
+        # all negotiation threads are busy, and too many are waiting.
+        if server.connect_pool is not None and server.connect_pool.full():
+            server.connect_pool.refused()
+            refuse(sock, server.BUSY_BANNER)
+            log.warn('{addr}: refused, negotiation queue is full.'
+                     .format(addr=address_pair[0]))
             return
 
         # instantiate a client of this type
@@ -189,25 +209,35 @@ def accept(log, server, check_ban):
         # spawn on-connect negotiation thread.  When successful,
         # a new sub-process is spawned and registered as a session tty.
         server.clients[client.sock.fileno()] = client
+        get_reactor().register(client.poll_fileno())
         thread = server.connect_factory(client, **connect_factory_kwargs)
         log.info('{client.kind} connection from {client.addrport} '
                  '(*{thread.name}).'.format(client=client, thread=thread))
         server.threads.append(thread)
-        thread.start()
+        if server.connect_pool is None:
+            thread.start()
+        elif not server.connect_pool.submit(thread):
+            thread.stopped = True
+            client.deactivate()
 
     except socket.error as err:
         log.error('accept error {0}:{1}'.format(*err))
 
 
-def get_session_output_fds(servers):
-    """ Return file descriptors of all ``tty.master_read`` pipes. """
-    session_fds = []
-    for server in servers:
-        for client in server.clients.values():
-            tty = find_tty(client)
-            if tty is not None:
-                session_fds.append(tty.master_read.fileno())
-    return session_fds
+def refuse(sock, banner=None):
+    """
+    Close accepted socket ``sock``, first writing ``banner``, if any.
+
+    The banner is written only if it may be sent without blocking.
+    """
+    try:
+        if banner:
+            sock.setblocking(0)
+            sock.send(banner)
+        sock.shutdown(socket.SHUT_RDWR)
+    except socket.error:
+        pass
+    sock.close()
 
 
 def client_recv(servers, ready_fds, log):
@@ -282,18 +312,17 @@ def handle_lock(locks, tty, event, data, tap_events, log):
         if event in locks:
             # check if lock held by an active session,
             holder = locks[event][1]
-            for _sid, _ in get_terminals():
-                if _sid == holder and _sid != tty.sid:
-                    # acquire the lock from a now-deceased session.
-                    log.debug('[{tty.sid}] {event} not acquired, '
-                              'held by active session: {holder}'
-                              .format(tty=tty, event=event, holder=holder))
-                    break
-                elif _sid == holder and _sid == tty.sid:
-                    # acquire the lock from ourselves!  We'll allow it
-                    # (this is termed, "re-entrant locking").
-                    log.debug('{tty.sid}] {event} is re-acquired!'
-                              .format(tty=tty, event=event))
+            if holder != tty.sid and find_tty_by_sid(holder) is not None:
+                # lock is held by another, active session.
+                log.debug('[{tty.sid}] {event} not acquired, '
+                          'held by active session: {holder}'
+                          .format(tty=tty, event=event, holder=holder))
+            elif holder == tty.sid:
+                # acquire the lock from ourselves!  We'll allow it
+                # (this is termed, "re-entrant locking").
+                log.debug('[{tty.sid}] {event} is re-acquired!'
+                          .format(tty=tty, event=event))
+                del locks[event]
             else:
                 # lock is held by a now-defunct session, re-acquired.
                 log.debug('[{tty.sid}] {event} re-acquiring stale lock, '
@@ -354,8 +383,12 @@ def session_recv(locks, terminals, log, tap_events):
     """
     Receive data waiting for terminal sessions.
 
-    All data received from subprocess is handled here.
+    All data received from subprocess is handled here.  Only those
+    ``terminals`` given, usually those whose ``master_read`` pipe was
+    found ready, are received from; events addressed to other sessions
+    are delivered by session-id lookup, without scanning all terminals.
     """
+    from x84.bbs.ipc import unpack_records
     for sid, tty in terminals:
         while tty.master_read.poll():
             try:
@@ -374,11 +407,12 @@ def session_recv(locks, terminals, log, tap_events):
                 kill_session(tty.client, 'client exit')
                 break
 
-            # 'logger' event, prefix log message with handle and IP address
+            # 'logger' event, prefix log messages with handle and IP address
             elif event == 'logger':
-                data.msg = ('{data.handle}[{tty.sid}] {data.msg}'
-                            .format(data=data, tty=tty))
-                log.handle(data)
+                for record in unpack_records(data):
+                    record.msg = ('{record.handle}[{tty.sid}] {record.msg}'
+                                  .format(record=record, tty=tty))
+                    log.handle(record)
 
             # 'output' event, buffer for tcp socket
             elif event == 'output':
@@ -386,28 +420,26 @@ def session_recv(locks, terminals, log, tap_events):
 
             # 'remote-disconnect' event, hunt and destroy
             elif event == 'remote-disconnect':
-                for _sid, _tty in terminals:
-                    # data[0] is 'send-to' address.
-                    if data[0] == _sid:
-                        kill_session(
-                            tty.client, 'remote-disconnect by {0}'.format(sid))
-                        break
+                # data is the session-id of the target session.
+                _tty = find_tty_by_sid(data)
+                if _tty is not None:
+                    kill_session(
+                        _tty.client, 'remote-disconnect by {0}'.format(sid))
 
             # 'route': message passing directly from one session to another
             elif event == 'route':
                 if tap_events:
                     log.debug('route {0!r}'.format(data))
                 tgt_sid, send_event, send_val = data[0], data[1], data[2:]
-                for _sid, _tty in terminals:
-                    if tgt_sid == _sid:
-                        _tty.master_write.send((send_event, send_val))
-                        break
+                _tty = find_tty_by_sid(tgt_sid)
+                if _tty is not None:
+                    _tty.master_write.send((send_event, send_val))
 
             # 'global': message broadcasting to all sessions
             elif event == 'global':
                 if tap_events:
                     log.debug('broadcast: {data!r}'.format(data=data))
-                for _sid, _tty in terminals:
+                for _sid, _tty in get_terminals():
                     if sid != _sid:
                         _tty.master_write.send((event, data,))
 
@@ -418,6 +450,13 @@ def session_recv(locks, terminals, log, tap_events):
                               .format(tty=tty, data=data))
                 tty.timeout = data
 
+            # 'cache-subscribe': invalidate cached results of database table
+            elif event == 'cache-subscribe':
+                if tap_events:
+                    log.debug('[{tty.sid}] cache-subscribe {data!r}'
+                              .format(tty=tty, data=data))
+                tty.cache_subscriptions.add(tuple(data))
+
             # 'db*': access DBProxy API for shared sqlitedict
             elif event.startswith('db'):
                 DBHandler(tty.master_write, event, data).start()
@@ -426,25 +465,74 @@ def session_recv(locks, terminals, log, tap_events):
             elif event.startswith('lock'):
                 handle_lock(locks, tty, event, data, tap_events, log)
 
+            # 'presence': session attributes changed, notify subscribers
+            elif event == 'presence':
+                tty.presence.update(data)
+                publish_presence(sid, data)
+
+            # 'who': reply with presence of all sessions
+            elif event == 'who':
+                tty.master_write.send((event, dict(
+                    (_sid, _tty.get_presence())
+                    for _sid, _tty in get_terminals())))
+
+            # 'who-subscribe': (un)subscribe to 'presence-delta' events
+            elif event == 'who-subscribe':
+                if tap_events:
+                    log.debug('[{tty.sid}] who-subscribe {data}'
+                              .format(tty=tty, data=data))
+                tty.presence_subscriber = bool(data)
+
+            # 'node': grant lowest free node number, held until unregistered
+            elif event == 'node':
+                if tty.node is None:
+                    tty.node = NODES.acquire()
+                    if tap_events:
+                        log.debug('[{tty.sid}] granted node {tty.node}'
+                                  .format(tty=tty))
+                tty.master_write.send((event, tty.node))
+
             else:
                 log.error('[{tty.sid}] unhandled event, data: '
                           '({event}, {data})'
                           .format(tty=tty, event=event, data=data))
 
 
+def session_invalidate(terminals, log):
+    """
+    Send ``cache-invalidate`` events for database tables modified.
+
+    Sessions caching a table with :class:`x84.bbs.dbproxy.DBProxy`
+    discard their cached results when it is modified by any other session.
+    """
+    for key in pop_db_writes():
+        for _, tty in terminals:
+            if key in tty.cache_subscriptions:
+                try:
+                    tty.master_write.send(('cache-invalidate', key))
+                except IOError as err:
+                    # if the ipc closes while we send, warn and continue
+                    log.warn(err)
+
+
 def _loop(servers):
     """ Main event loop. Never returns. """
     # pylint: disable=R0912,R0914,R0915
     #         Too many local variables (24/15)
     from x84.bbs.ini import CFG
+    from x84.bbs import get_ini
 
+    # WIN32 has no session_fds (multiprocess queues are not polled using
+    # select), so sessions are always polled for data at every loop, and
+    # the loop must wake at least every SELECT_POLL to do so.
     SELECT_POLL = 0.02  # polling time is 20ms
 
-    # WIN32 has no session_fds (multiprocess queues are not polled using
-    # select), use a persistently empty set; for WIN32, sessions are always
-    # polled for data at every loop.
+    # Otherwise, the loop blocks until a file descriptor is ready, but must
+    # still wake periodically to kick off idle users and reap on-connect
+    # threads, and more often while any client's send buffer is backlogged.
+    IDLE_POLL = 1.00
+
     WIN32 = sys.platform.lower().startswith('win32')
-    session_fds = set()
 
     log = logging.getLogger('x84.engine')
 
@@ -455,7 +543,20 @@ def _loop(servers):
     check_ban = get_fail2ban_function()
     locks = dict()
 
+    # file descriptors of listening sockets are registered only once,
+    # clients are registered by accept() and register_tty(), and removed
+    # by kill_session() and unregister_tty().
+    reactor = get_reactor()
+    for server in servers:
+        reactor.register(server.server_socket.fileno())
+    timeout = SELECT_POLL if WIN32 else IDLE_POLL
+    session_pool_size = get_ini('system', 'session_pool_size',
+                                getter='getint')
+
     while True:
+        # replace pre-forked session processes taken by connecting clients.
+        fill_session_pool(session_pool_size)
+
         # shutdown, close & delete inactive clients,
         for server in servers:
             # bbs sessions that are no longer active on the socket
@@ -470,27 +571,7 @@ def _loop(servers):
                            if _thread.stopped][:]:
                 server.threads.remove(thread)
 
-        check_r = list()
-        for server in servers:
-            check_r.append(server.server_socket.fileno())
-            check_r.extend(server.client_fds())
-        if not WIN32:
-            # WIN32's IPC is not done using sockets, so it
-            # is not possible to use select.select() on them
-            session_fds = get_session_output_fds(servers)
-            check_r.extend(session_fds)
-
-        # We'd like to use timeout 'None', but the registration of
-        # a new client in terminal.start_process surprises us with new
-        # file descriptors for the session i/o.  Unless we loop for
-        # additional `session_fds', a connecting client would block.
-        try:
-            ready_r, _, _ = select.select(check_r, [], [], SELECT_POLL)
-        except select.error as err:
-            # more than likely EBADF (9, 'Bad file descriptor'), it would seem
-            # the socket we've just decided to poll has just gone bad.
-            log.debug('continue after select.error: {0}'.format(err))
-            continue
+        ready_r = reactor.poll(timeout)
 
         for fd in ready_r:
             # see if any new tcp connections were made
@@ -502,10 +583,19 @@ def _loop(servers):
         client_recv(servers, ready_r, log)
         terms = get_terminals()
 
+        # invalidate session caches of database tables modified, before
+        # receiving any event that could be caused by such modification.
+        session_invalidate(terms, log)
+
         # receive new data from session terminals
-        if WIN32 or set(session_fds) & set(ready_r):
+        ready_terms = terms
+        if not WIN32:
+            ready_terms = [(tty.sid, tty) for tty in map(find_tty_by_fd,
+                                                         ready_r)
+                           if tty is not None]
+        if ready_terms:
             try:
-                session_recv(locks, terms, log, tap_events)
+                session_recv(locks, ready_terms, log, tap_events)
             except IOError as err:
                 # if the ipc closes while we poll, warn and continue
                 log.warn(err)
@@ -516,6 +606,12 @@ def _loop(servers):
         # send session data, poll for user-timeout and disconnect them
         session_send(terms)
 
+        # when any data could not be sent (the client is slow to receive),
+        # wake again shortly to retry, otherwise block until ready.
+        timeout = IDLE_POLL
+        if WIN32 or any(tty.client.send_ready() for _, tty in terms):
+            timeout = SELECT_POLL
+
 
 if __name__ == '__main__':
     exit(main())
@@ -0,0 +1,190 @@
+""" Persistent file descriptor readiness registry for the x/84 engine. """
+# std imports
+import threading
+import logging
+import select
+import errno
+import sys
+import os
+
+#: singleton of :class:`Reactor`, created on first use by :func:`get_reactor`.
+REACTOR = None
+
+#: whether this platform polls multiprocessing pipes (WIN32 does not).
+WIN32 = sys.platform.lower().startswith('win32')
+
+
+class Reactor(object):
+
+    """
+    Registry of file descriptors watched for readability by the engine.
+
+    File descriptors are registered once, as they are created (such as
+    by :func:`x84.engine.accept` and :func:`x84.terminal.register_tty`),
+    and removed as they are closed, rather than rebuilding a list of all
+    descriptors for each pass of the main loop.
+
+    The best available interface is used: ``epoll``, then ``poll``, and
+    finally ``select`` when neither is available.  Registration from
+    another thread (such as an on-connect negotiation thread) calls
+    :meth:`wakeup` so that a blocking :meth:`poll` of the main thread
+    returns early and discovers the new descriptor.
+    """
+
+    def __init__(self):
+        """ Class initializer. """
+        self.log = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._fds = set()
+        if hasattr(select, 'epoll'):
+            self.kind = 'epoll'
+            self._poller = select.epoll()
+        elif hasattr(select, 'poll'):
+            self.kind = 'poll'
+            self._poller = select.poll()
+        else:
+            self.kind = 'select'
+            self._poller = None
+
+        # self-pipe, written by wakeup() to interrupt a blocking poll().
+        self._wake_r, self._wake_w = None, None
+        if not WIN32:
+            import fcntl
+            self._wake_r, self._wake_w = os.pipe()
+            for fd in (self._wake_r, self._wake_w):
+                flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+                fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+            self._register(self._wake_r)
+        self.log.debug('reactor using {0}'.format(self.kind))
+
+    def _register(self, fd):
+        """ Register ``fd`` with underlying poller object. """
+        if self.kind == 'epoll':
+            try:
+                self._poller.register(fd, select.EPOLLIN)
+            except IOError as err:
+                if err.errno != errno.EEXIST:
+                    raise
+                # a closed descriptor is silently removed by epoll; when the
+                # same number is re-used, the registration is still valid.
+                self._poller.modify(fd, select.EPOLLIN)
+        elif self.kind == 'poll':
+            self._poller.register(fd, select.POLLIN | select.POLLPRI)
+
+    def _unregister(self, fd):
+        """ Unregister ``fd`` from underlying poller object. """
+        if self.kind == 'epoll':
+            try:
+                self._poller.unregister(fd)
+            except (IOError, ValueError):
+                # already closed, and so already removed by the kernel.
+                pass
+        elif self.kind == 'poll':
+            try:
+                self._poller.unregister(fd)
+            except KeyError:
+                pass
+
+    def register(self, fd):
+        """ Begin polling file descriptor ``fd`` for readability. """
+        if fd is None:
+            return
+        with self._lock:
+            self._fds.add(fd)
+            self._register(fd)
+        self.wakeup()
+
+    def unregister(self, fd):
+        """ Cease polling file descriptor ``fd``. """
+        if fd is None:
+            return
+        with self._lock:
+            self._fds.discard(fd)
+            self._unregister(fd)
+
+    def wakeup(self):
+        """ Interrupt a :meth:`poll` currently blocking in the main thread. """
+        if self._wake_w is None:
+            return
+        if isinstance(threading.current_thread(), threading._MainThread):
+            # the main thread cannot be blocking on poll if it is here.
+            return
+        try:
+            os.write(self._wake_w, b'\x00')
+        except OSError as err:
+            if err.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+
+    def _drain(self):
+        """ Discard bytes written to the wakeup pipe by :meth:`wakeup`. """
+        try:
+            os.read(self._wake_r, 4096)
+        except OSError as err:
+            if err.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+
+    def _prune(self):
+        """ Remove any file descriptors that have become invalid. """
+        with self._lock:
+            for fd in list(self._fds):
+                try:
+                    os.fstat(fd)
+                except OSError:
+                    self.log.debug('pruned bad fd {0}'.format(fd))
+                    self._fds.discard(fd)
+                    self._unregister(fd)
+
+    def poll(self, timeout=None):
+        """
+        Block until any registered file descriptor is ready for reading.
+
+        :param float timeout: maximum time to block, or ``None`` to block
+                              until a file descriptor is ready.
+        :rtype: list
+        :returns: list of file descriptors ready for reading; the list is
+                  empty on timeout or :meth:`wakeup`.
+        """
+        try:
+            if self.kind == 'epoll':
+                events = self._poller.poll(-1 if timeout is None else timeout)
+            elif self.kind == 'poll':
+                events = self._poller.poll(
+                    None if timeout is None else int(timeout * 1000))
+            else:
+                with self._lock:
+                    check_r = list(self._fds)
+                if self._wake_r is not None:
+                    check_r.append(self._wake_r)
+                ready_r, _, _ = select.select(check_r, [], [], timeout)
+                events = [(fd, None) for fd in ready_r]
+        except (IOError, select.error) as err:
+            if err.args[0] == errno.EINTR:
+                return []
+            if err.args[0] != errno.EBADF:
+                raise
+            # more than likely EBADF (9, 'Bad file descriptor'), it would
+            # seem a descriptor we've been asked to poll has just gone bad.
+            self.log.debug('pruning after poll error: {0}'.format(err))
+            self._prune()
+            return []
+
+        ready_fds = []
+        for fd, mask in events:
+            if fd == self._wake_r:
+                self._drain()
+            elif self.kind == 'poll' and mask & select.POLLNVAL:
+                # poll(2) reports a closed descriptor, rather than failing.
+                self.unregister(fd)
+            else:
+                ready_fds.append(fd)
+        return ready_fds
+
+
+def get_reactor():
+    """ Return :class:`Reactor` instance of current process. """
+    # pylint: disable=W0603
+    #         Using the global statement
+    global REACTOR
+    if REACTOR is None:
+        REACTOR = Reactor()
+    return REACTOR
@@ -20,7 +20,7 @@ from x84.bbs.userbase import (
     check_anonymous_user
 )
 from x84.bbs.exception import Disconnected
-from x84.client import BaseClient, BaseConnect
+from x84.client import BaseClient, BaseConnect, BufferQueue
 from x84.server import BaseServer
 from x84.terminal import spawn_client_session
 
@@ -35,7 +35,7 @@ class RLoginClient(BaseClient):
         super(RLoginClient, self).__init__(sock, address_pair, on_naws)
 
         # Urgent send buffer (MSG_OOB)
-        self.usend_buffer = array.array('c')
+        self.usend_buffer = BufferQueue()
 
     def recv_ready(self):
         """ Whether data is awaiting on the telnet socket. """
@@ -49,8 +49,7 @@ class RLoginClient(BaseClient):
         :raises Disconnected: client has disconnected (cannot write to socket).
         """
         if len(self.usend_buffer) > 0:
-            ready_bytes = bytes(''.join(self.usend_buffer))
-            self.usend_buffer = array.array('c')
+            ready_bytes = self.usend_buffer.view()
 
             def _send_urgent(send_bytes):
                 """ Sent urgent (out of band) TCP packet. """
@@ -64,9 +63,7 @@ class RLoginClient(BaseClient):
                         return 0
                     raise Disconnected('send: {0}'.format(err))
 
-            sent = _send_urgent(ready_bytes)
-            if sent < len(ready_bytes):
-                self.usend_buffer.fromstring(ready_bytes[sent:])
+            self.usend_buffer.consume(_send_urgent(ready_bytes))
 
         else:
             super(RLoginClient, self).send()
@@ -314,6 +311,9 @@ class RLoginServer(BaseServer):
         self.log.info('rlogin listening on {self.addr}:{self.port}/tcp'
                       .format(self=self))
 
+        # negotiate in a bounded number of re-used threads, when enabled.
+        self.start_connect_pool(config, 'rlogin')
+
     def client_fds(self):
         """ Return list of rlogin client file descriptors. """
         fds = [client.fileno() for client in self.clients.values()]
@@ -11,6 +11,9 @@ class BaseServer(object):
     #: Number of clients that can wait to be accepted
     LISTEN_BACKLOG = 5
 
+    #: Written to connections refused when busy, before closing.
+    BUSY_BANNER = '\r\nServer busy, try again later.\r\n'
+
     #: Dictionary of environment variables received by negotiation
     env = {}
 
@@ -29,6 +32,33 @@ class BaseServer(object):
     #: List of on-connect negotiating threads.
     threads = []
 
+    #: When not ``None``, a :class:`x84.client.ConnectPool` whose threads
+    #: run the connect factory, instead of starting it as a new thread.
+    connect_pool = None
+
+    def start_connect_pool(self, config, section):
+        """
+        Start :attr:`connect_pool` by configuration of ``section``.
+
+        Options ``negotiation_threads``, the number of threads, and
+        ``negotiation_queue``, the number of connections that may wait for
+        a thread.  No pool is started when ``negotiation_threads`` is
+        ``0``, each connection is negotiated in a new thread.
+        """
+        from x84.client import ConnectPool
+
+        def _getint(key):
+            """ Return integer of ``section`` option, or ``0``. """
+            if config.has_option(section, key):
+                return config.getint(section, key)
+            return 0
+
+        num_threads = _getint('negotiation_threads')
+        if num_threads > 0:
+            self.connect_pool = ConnectPool(
+                num_workers=num_threads,
+                max_queue=_getint('negotiation_queue'))
+
     @classmethod
     def client_factory_kwargs(cls, instance):
         """
@@ -82,5 +112,6 @@ class BaseServer(object):
 
         # given a list of ready_fds pairs, we return only clients with
         # matching file descriptors.
+        ready_fds = set(ready_fds)
         return [client for client in self.clients.values()
                 if client.fileno() in ready_fds]
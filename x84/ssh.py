@@ -6,7 +6,6 @@ from __future__ import absolute_import
 import threading
 import logging
 import socket
-import array
 import errno
 import time
 import os
@@ -35,6 +34,10 @@ class SshClient(BaseClient):
 
     """A remote Ssh Client, instantiated from SshServer. """
 
+    #: maximum bytes offered to the ssh channel by each send, about the
+    #: size of one packet.
+    SEND_MAXLEN = 32768
+
     def __init__(self, sock, address_pair, on_naws=None):
         super(SshClient, self).__init__(sock, address_pair, on_naws)
 
@@ -89,6 +92,21 @@ class SshClient(BaseClient):
             return self.active
         return self.transport.is_active()
 
+    def poll_fileno(self):
+        """
+        File descriptor of ssh channel polled by the engine.
+
+        The tcp socket is read by paramiko's transport thread, the engine
+        instead polls the channel's pipe, which becomes readable as data is
+        buffered for :meth:`socket_recv`.  SFTP sessions are never polled.
+        """
+        if self.channel is None or self.kind == 'sftp':
+            return None
+        try:
+            return self.channel.fileno()
+        except (EOFError, socket.error):
+            return None
+
     def send_ready(self):
         """ Whether any data is buffered for delivery. """
         if self.channel is None:
@@ -124,17 +142,27 @@ class SshClient(BaseClient):
             self.log.warn('send() called on empty buffer')
             return 0
 
-        ready_bytes = bytes(''.join(self.send_buffer))
-        self.send_buffer = array.array('c')
-
-        sent = self._send(ready_bytes)
-        if sent < len(ready_bytes):
-            # re-buffer data that could not be pushed to socket;
-            self.send_buffer.fromstring(ready_bytes[sent:])
+        # send until the channel accepts no more, bytes that could not be
+        # pushed to the channel remain buffered.
+        sent = 0
+        while self.send_ready():
+            ready_bytes = self.send_buffer.view()[:self.SEND_MAXLEN].tobytes()
+            num_sent = self._send(ready_bytes)
+            self.send_buffer.consume(num_sent)
+            sent += num_sent
+            if num_sent < len(ready_bytes):
+                break
         return sent
 
     def recv_ready(self):
-        """ Whether data is awaiting on the ssh channel.  """
+        """
+        Whether data is awaiting on the ssh channel.
+
+        Also True once the channel has received EOF or is closed: its pipe,
+        :meth:`poll_fileno`, then remains readable, and :meth:`socket_recv`
+        raises :class:`Disconnected`, rather than the engine polling it
+        forever.
+        """
         if self.channel is None or self.kind == 'sftp':
             # very strange for SFTP, all i/o is handled by paramiko's event
             # loop and the various callback handlers of x84/sftp.py.  We always
@@ -142,7 +170,8 @@ class SshClient(BaseClient):
             # into matrix_sftp, which is raw protocol bytes that we should not
             # concern ourselves with.
             return False
-        return self.channel.recv_ready()
+        return (self.channel.recv_ready() or self.channel.eof_received
+                or self.channel.closed)
 
     def socket_recv(self):
         """
@@ -186,7 +215,7 @@ class ConnectSsh(BaseConnect):
         Class constructor.
 
         :param ssh.SshClient client: an SshClient instance.
-        :param paramiko.RSAKey server_host_key: an RSAKey instance.
+        :param paramiko.PKey server_host_key: host key, such as RSAKey.
         """
         self.server_host_key = server_host_key
         self.on_naws = on_naws
@@ -195,8 +224,9 @@ class ConnectSsh(BaseConnect):
     def run(self):
         """ Accept new Ssh connect in thread. """
         try:
+            # moduli for group-exchange key negotiation are shared by all
+            # transports, loaded once by SshServer.
             self.client.transport = paramiko.Transport(self.client.sock)
-            self.client.transport.load_server_moduli()
             self.client.transport.add_server_key(self.server_host_key)
             ssh_session = SshSessionServer(client=self.client)
             from x84.bbs import get_ini
@@ -436,6 +466,12 @@ class SshServer(BaseServer):
     # Dictionary of active clients, (file descriptor, SshClient,)
     clients = {}
 
+    #: paramiko key class name of each ``[ssh]`` option ``HostKeyType``.
+    #: ECDSA keys are much faster to sign with than RSA keys, which is
+    #: done for every handshake.
+    HOST_KEY_TYPES = {'rsa': 'RSAKey',
+                      'ecdsa': 'ECDSAKey'}
+
     def __init__(self, config):
         """ Class initializer. """
         self.log = logging.getLogger(__name__)
@@ -443,18 +479,33 @@ class SshServer(BaseServer):
         self.address = config.get('ssh', 'addr')
         self.port = config.getint('ssh', 'port')
 
+        keytype = 'rsa'
+        if self.config.has_option('ssh', 'HostKeyType'):
+            keytype = config.get('ssh', 'HostKeyType').strip().lower()
+        if keytype not in self.HOST_KEY_TYPES:
+            self.log.error('Unknown HostKeyType {0!r}, expected one of {1}'
+                           .format(keytype,
+                                   ', '.join(sorted(self.HOST_KEY_TYPES))))
+            exit(1)
+
         if self.config.has_option('ssh', 'HostKey'):
             filename = config.get('ssh', 'HostKey')
         else:
             filename = os.path.join(
                 os.path.expanduser((config.get('system', 'datapath'))),
-                'ssh_host_rsa_key')
+                'ssh_host_{0}_key'.format(keytype))
 
         if not os.path.exists(filename):
-            self.host_key = self.generate_host_key(filename)
+            self.host_key = self.generate_host_key(filename, keytype)
         else:
-            self.host_key = paramiko.RSAKey(filename=filename)
-            self.log.debug('Loaded host key {0}'.format(filename))
+            self.host_key = self.get_key_class(keytype)(filename=filename)
+            self.log.debug('Loaded {0} host key {1}'
+                           .format(keytype, filename))
+
+        # parse moduli for group-exchange key negotiation only once,
+        # they are shared by all transports.
+        if paramiko.Transport.load_server_moduli():
+            self.log.debug('Loaded moduli for group-exchange key exchange')
 
         # bind
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -470,23 +521,50 @@ class SshServer(BaseServer):
         self.log.info('ssh listening on {self.address}:{self.port}/tcp'
                       .format(self=self))
 
-    def generate_host_key(self, filename):
-        """ Generate server host key to local filepath ``filename``. """
-        from paramiko import RSAKey
+        # negotiate in a bounded number of re-used threads, when enabled.
+        self.start_connect_pool(config, 'ssh')
+
+    def get_key_class(self, keytype):
+        """
+        Return paramiko key class of host key type ``keytype``.
+
+        :param str keytype: one of :attr:`HOST_KEY_TYPES`.
+        """
+        key_class = getattr(paramiko, self.HOST_KEY_TYPES[keytype], None)
+        if key_class is None:
+            self.log.error('HostKeyType {0} requires a later version of '
+                           'paramiko, {1} is installed.'
+                           .format(keytype, paramiko.__version__))
+            exit(1)
+        return key_class
+
+    def generate_host_key(self, filename, keytype='rsa'):
+        """
+        Generate server host key to local filepath ``filename``.
 
-        bits = 4096
-        if self.config.has_option('ssh', 'HostKeyBits'):
-            bits = self.config.getint('ssh', 'HostKeyBits')
+        :param str filename: filepath of private key, the public key is
+                             saved to the same filepath, ending ``.pub``.
+        :param str keytype: one of :attr:`HOST_KEY_TYPES`.
+        """
+        key_class = self.get_key_class(keytype)
 
         # generate private key and save,
-        self.log.info('Generating {bits}-bit RSA public/private keypair.'
-                      .format(bits=bits))
-        priv_key = RSAKey.generate(bits=bits)
+        if keytype == 'rsa':
+            bits = 2048
+            if self.config.has_option('ssh', 'HostKeyBits'):
+                bits = self.config.getint('ssh', 'HostKeyBits')
+            self.log.info('Generating {bits}-bit RSA public/private keypair.'
+                          .format(bits=bits))
+            priv_key = key_class.generate(bits=bits)
+        else:
+            self.log.info('Generating {0} public/private keypair.'
+                          .format(keytype.upper()))
+            priv_key = key_class.generate()
         priv_key.write_private_key_file(filename, password=None)
         self.log.debug('{filename} saved.'.format(filename=filename))
 
         # save public key,
-        pub = RSAKey(filename=filename, password=None)
+        pub = key_class(filename=filename, password=None)
         with open('{0}.pub'.format(filename,), 'w') as fp:
             fp.write("{0} {1}".format(pub.get_name(), pub.get_base64()))
         self.log.debug('{filename}.pub saved.'.format(filename=filename))
@@ -501,7 +579,15 @@ class SshServer(BaseServer):
         """
         Return a list of clients with data ready to be receive.
 
-        The ``ready_fds`` parameter is ignored by the SSH Server.
+        :param list ready_fds: file descriptors already known to be ready,
+            matched against :meth:`SshClient.poll_fileno`, the pipe of
+            each ssh channel, so that only ready channels are serviced.
         """
+        if ready_fds is None:
+            # given no file descriptors, we must iterate them all by hand.
+            return [client for client in self.clients.values()
+                    if client.recv_ready()]
+
+        ready_fds = set(ready_fds)
         return [client for client in self.clients.values()
-                if client.recv_ready()]
+                if client.poll_fileno() in ready_fds and client.recv_ready()]
@@ -20,6 +20,7 @@ Changes from miniboa:
 - environment variable support
 - GA and SGA
 - utf-8 safe
+- MCCP2 (compression of output)
 """
 # ------------------------------------------------------------------------------
 #   miniboa/async.py
@@ -40,12 +41,14 @@ Changes from miniboa:
 from __future__ import absolute_import
 
 # std
+import threading
 import socket
 import array
 import time
 import logging
 import select
 import errno
+import zlib
 from telnetlib import LINEMODE, NAWS, NEW_ENVIRON, ENCRYPT, AUTHENTICATION
 from telnetlib import BINARY, SGA, ECHO, STATUS, TTYPE, TSPEED, LFLOW
 from telnetlib import XDISPLOC, IAC, DONT, DO, WONT, WILL, SE, NOP, DM, BRK
@@ -59,6 +62,7 @@ from .server import BaseServer
 
 IS = chr(0)  # Sub-process negotiation IS command
 SEND = chr(1)  # Sub-process negotiation SEND command
+COMPRESS2 = chr(86)  # MUD Client Compression Protocol, version 2 (MCCP2)
 UNSUPPORTED_WILL = (LINEMODE, LFLOW, TSPEED, ENCRYPT, AUTHENTICATION)
 
 #---[ Telnet Notes ]-----------------------------------------------------------
@@ -176,10 +180,18 @@ class TelnetClient(BaseClient):
     #: large value for NEW_ENVIRON.
     SB_MAXLEN = 65534
 
-    def __init__(self, sock, address_pair, on_naws=None):
+    def __init__(self, sock, address_pair, on_naws=None, compression=None):
         super(TelnetClient, self).__init__(sock, address_pair, on_naws)
         self.telnet_sb_buffer = array.array('c')
 
+        # MCCP2 output compression: dictionary of zlib parameters ``level``,
+        # ``memlevel`` and ``wbits``, or None when not offered to the DE.
+        self.compression = compression
+        self.compressor = None
+        self.compress_pending = False
+        self.bytes_compressed = 0
+        self.bytes_compressed_sent = 0
+
         # State variables for interpreting incoming telnet commands
         self.telnet_got_iac = False
         self.telnet_got_cmd = None
@@ -189,6 +201,15 @@ class TelnetClient(BaseClient):
         self.ENV_REQUESTED = False
         self.ENV_REPLIED = False
 
+        # set by the parser when an option is answered or sub-negotiated,
+        # waking ConnectTelnet, which waits for all replies.
+        self.negotiation_event = threading.Event()
+
+    def deactivate(self):
+        """ Flag client for disconnection, waking any negotiation. """
+        super(TelnetClient, self).deactivate()
+        self.negotiation_event.set()
+
     def request_will_sga(self):
         """
         Request DE to Suppress Go-Ahead.  See RFC 858.
@@ -224,6 +245,14 @@ class TelnetClient(BaseClient):
         self._iac_do(SGA)
         self._note_reply_pending(SGA, True)
 
+    def request_will_compress2(self):
+        """
+        Request to compress output by MCCP2.  See ...
+        http://tintin.sourceforge.net/mccp/
+        """
+        self._iac_will(COMPRESS2)
+        self._note_reply_pending(COMPRESS2, True)
+
     def request_do_naws(self):
         """
         Request to Negotiate About Window Size.  See RFC 1073.
@@ -299,10 +328,104 @@ class TelnetClient(BaseClient):
 
         # Test for telnet commands, non-telnet bytes
         # are pushed to self.recv_buffer (side-effect),
-        for byte in data:
-            self._iac_sniffer(byte)
+        self._iac_scan(data)
         return recv
 
+    def _iac_scan(self, data):
+        """
+        Watches incoming bytestring ``data`` for Telnet IAC sequences.
+
+        Equivalent to calling :meth:`_iac_sniffer` for each byte, but runs
+        of bytes between IAC sequences, whether plain data or the contents
+        of a sub-negotiation, are found by ``str.find`` and buffered all
+        at once.  Only the bytes of IAC sequences are passed to
+        :meth:`_iac_sniffer`.
+        """
+        pos, end = 0, len(data)
+        while pos < end:
+            if self.telnet_got_iac is False:
+                nxt = data.find(IAC, pos)
+                if nxt == -1:
+                    nxt = end
+                if nxt != pos:
+                    if self.telnet_got_sb is True:
+                        self.telnet_sb_buffer.fromstring(data[pos:nxt])
+                        # Sanity check on length
+                        if len(self.telnet_sb_buffer) >= self.SB_MAXLEN:
+                            raise Disconnected('sub-negotiation buffer '
+                                               'filled')
+                    else:
+                        # A run of normal NVT characters
+                        self.recv_buffer.fromstring(data[pos:nxt])
+                    pos = nxt
+                    continue
+            self._iac_sniffer(data[pos])
+            pos += 1
+
+    def send_str(self, bstr):
+        """ Buffer bytestring for client, compressed when MCCP2 is active. """
+        if self.compressor is not None and bstr:
+            self.bytes_compressed += len(bstr)
+            bstr = self.compressor.compress(bstr)
+            self.bytes_compressed_sent += len(bstr)
+            self.compress_pending = True
+        self.send_buffer.fromstring(bstr)
+
+    def send(self):
+        """
+        Send any data buffered and return number of bytes send.
+
+        When MCCP2 is active, output compressed since the last call is first
+        flushed from the compressor, so that the DE may display it in full.
+
+        :raises Disconnected: client has disconnected (cannot write to socket).
+        """
+        if self.compress_pending:
+            flushed = self.compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.bytes_compressed_sent += len(flushed)
+            self.send_buffer.fromstring(flushed)
+            self.compress_pending = False
+        return super(TelnetClient, self).send()
+
+    def send_ready(self):
+        """ Whether any data is buffered for delivery. """
+        return (self.compress_pending or
+                super(TelnetClient, self).send_ready())
+
+    def shutdown(self):
+        """
+        Shutdown and close socket.
+
+        Called by event loop after client is marked by :meth:`deactivate`.
+        """
+        if self.bytes_compressed:
+            self.log.debug('{self.addrport}: MCCP2 compressed {0} bytes to '
+                           '{1} bytes.'.format(self.bytes_compressed,
+                                               self.bytes_compressed_sent,
+                                               self=self))
+        super(TelnetClient, self).shutdown()
+
+    def _start_compress2(self):
+        """
+        Begin MCCP2 compression of all output that follows.
+
+        The sub-negotiation sent is the final uncompressed output.
+        """
+        self.log.debug('send IAC SB COMPRESS2 IAC SE')
+        self.send_str(bytes(''.join((IAC, SB, COMPRESS2, IAC, SE))))
+        self.compressor = zlib.compressobj(self.compression['level'],
+                                           zlib.DEFLATED,
+                                           self.compression['wbits'],
+                                           self.compression['memlevel'])
+
+    def _end_compress2(self):
+        """ End MCCP2 compression, output that follows is uncompressed. """
+        compressor, self.compressor = self.compressor, None
+        self.compress_pending = False
+        finished = compressor.flush(zlib.Z_FINISH)
+        self.bytes_compressed_sent += len(finished)
+        self.send_str(finished)
+
     def send_unicode(self, ucs, encoding='utf8'):
         """ Buffer unicode string, encoded for client as 'encoding'. """
         # Must be escaped 255 (IAC + IAC) to avoid IAC interpretation.
@@ -366,6 +489,7 @@ class TelnetClient(BaseClient):
             # Stop capturing a sub-negotiation string
             self.telnet_got_sb = False
             self._sb_decoder()
+            self.negotiation_event.set()
         elif cmd == IAC:
             # IAC, IAC is used for a literal \xff character.
             self._recv_byte(IAC)
@@ -375,7 +499,7 @@ class TelnetClient(BaseClient):
                           .format(self=self))
         elif cmd == AO:
             flushed = len(self.recv_buffer)
-            self.recv_buffer = array.array('c')
+            self.recv_buffer.clear()
             self.log.debug('Abort Output (AO); %s bytes discarded.', flushed)
         elif cmd == AYT:
             self.send_str(bytes('\b'))
@@ -419,6 +543,7 @@ class TelnetClient(BaseClient):
                            .format(self=self, opt=name_option(option)))
         self.telnet_got_iac = False
         self.telnet_got_cmd = None
+        self.negotiation_event.set()
 
     def _handle_do(self, option):
         """
@@ -466,6 +591,11 @@ class TelnetClient(BaseClient):
                 self._note_local_option(option, True)
                 self._iac_will(STATUS)
                 self._send_status()
+        elif option == COMPRESS2 and self.compression is not None:
+            # DE agrees to receive compressed output,
+            if self.check_local_option(option) is not True:
+                self._note_local_option(option, True)
+                self._start_compress2()
         else:
             if self.check_local_option(option) is UNKNOWN:
                 self._note_local_option(option, False)
@@ -521,6 +651,12 @@ class TelnetClient(BaseClient):
             # client demands no linemode.
             if self.check_remote_option(LINEMODE) is not False:
                 self._note_remote_option(LINEMODE, False)
+        elif option == COMPRESS2:
+            # DE refuses, or demands we cease, compressed output.
+            if self.check_local_option(COMPRESS2) is not False:
+                self._note_local_option(COMPRESS2, False)
+                if self.compressor is not None:
+                    self._end_compress2()
         else:
             self.log.debug('{self.addrport}: unhandled dont: {opt}.'
                            .format(self=self, opt=name_option(option)))
@@ -831,17 +967,81 @@ class TelnetClient(BaseClient):
         self.send_str(bytes(''.join((IAC, WONT, option))))
 
 
+class LatencyHistogram(object):
+
+    """
+    Histograms of negotiation latency, by name of telnet option.
+
+    Each connecting client adds one sample of each option, the time
+    elapsed until it was answered or refused, or ``None`` when it was not
+    answered in time.
+    """
+
+    #: upper bounds, in seconds, of each histogram bucket.
+    BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, float('inf'))
+
+    def __init__(self):
+        """ Class initializer. """
+        self._lock = threading.Lock()
+        self.counts = {}
+        self.num_samples = 0
+
+    def add(self, latency):
+        """
+        Add samples of a client.
+
+        :param dict latency: seconds elapsed, or ``None`` if unanswered,
+                             keyed by name of option.
+        :rtype: int
+        :returns: number of clients sampled.
+        """
+        with self._lock:
+            self.num_samples += 1
+            for name, seconds in latency.items():
+                counts = self.counts.setdefault(
+                    name, [0] * (len(self.BUCKETS) + 1))
+                if seconds is None:
+                    # final bucket counts options not answered.
+                    counts[-1] += 1
+                    continue
+                for idx, bound in enumerate(self.BUCKETS):
+                    if seconds <= bound:
+                        counts[idx] += 1
+                        break
+            return self.num_samples
+
+    def format(self):
+        """ Return histograms as lines of text, one for each option. """
+        with self._lock:
+            labels = ['<={0}s'.format(bound) for bound in self.BUCKETS[:-1]]
+            labels += ['>{0}s'.format(self.BUCKETS[-2]), 'none']
+            return ['{0}: {1}'.format(name, ', '.join(
+                '{0} {1}'.format(label, count)
+                for label, count in zip(labels, counts) if count))
+                for name, counts in sorted(self.counts.items())]
+
+
 class ConnectTelnet(BaseConnect):
 
     """
     Accept new Telnet Connection and negotiate options.
+
+    Negotiation is driven by replies of the client: each time the telnet
+    parser of the engine receives an option reply or sub-negotiation, the
+    state of each requested option is re-evaluated, and a session is
+    spawned as soon as all are answered or refused.  The time limits only
+    apply to clients that do not answer.
     """
     #: maximum time elapsed allowed to begin on-connect negotiation
     TIME_NEGOTIATE = 2.50
     #: wait upto 3500ms for all stages of negotiation to complete
     TIME_WAIT_STAGE = 3.50
-    #: polling duration during negotiation
-    TIME_POLL = 0.10
+
+    #: negotiation latency of all clients, see :class:`LatencyHistogram`.
+    histogram = LatencyHistogram()
+
+    #: log :attr:`histogram` each time this many clients have negotiated.
+    HISTOGRAM_INTERVAL = 100
 
     def banner(self):
         """
@@ -866,6 +1066,9 @@ class ConnectTelnet(BaseConnect):
         self.client.request_do_ttype()
         self.client.request_do_naws()
         self.client.request_do_env()
+        # and compression of output, when enabled.
+        if self.client.compression is not None:
+            self.client.request_will_compress2()
         self.client.send()  # push
 
     def run(self):
@@ -879,28 +1082,12 @@ class ConnectTelnet(BaseConnect):
 
             self.banner()
 
-            # wait at least {TIME_NEGOTIATE} for the client to speak.
-            # If it doesn't, we try only TTYPE.
-            # If it fails to report that, we forget the rest.
             self.log.debug('{client.addrport}: pausing for negotiation'
                            .format(client=self.client))
-            st_time = time.time()
-            while ((0 == self.client.bytes_received
-                    or mrk_bytes == self.client.bytes_received)
-                   and time.time() - st_time < self.TIME_NEGOTIATE):
-                if not self.client.is_active():
-                    return
-                if self.client.send_ready():
-                    self.client.send()
-                time.sleep(self.TIME_POLL)
-
-            if self._check_ttype(start_time=st_time):
-                # if client is able to negotiate terminal type,
-                # try NAWS or ENV negotiation.
-                if self.client.is_active():
-                    self._check_env(start_time=st_time)
-                if self.client.is_active():
-                    self._check_naws(start_time=st_time)
+            latency = self._negotiate(time.time(), mrk_bytes)
+            if not self.client.is_active():
+                return
+            self._record(latency)
 
             self.set_encoding()
 
@@ -941,79 +1128,92 @@ class ConnectTelnet(BaseConnect):
         if (local(BINARY) and remote(BINARY) and not term.startswith('ansi')):
             self.client.env['encoding'] = 'utf8'
 
-    def _timeleft(self, st_time):
-        """
-        Returns True when difference of current time and st_time is below
-        TIME_WAIT_STAGE.
-        """
-        return bool(time.time() - st_time < self.TIME_WAIT_STAGE)
-
-    def _check_env(self, start_time):
-        """
-        Check for NEW_ENVIRON negotiation.
-        """
-        def detected():
-            return (self.client.check_remote_option(NEW_ENVIRON) is not UNKNOWN
-                    or self.client.ENV_REPLIED)
-
-        while not detected() and self._timeleft(start_time):
-            if not self.client.is_active():
-                return
+    def _stages(self):
+        """
+        Return dictionary of callables, keyed by name of requested option.
+
+        Each returns True once that option is answered or refused.  BINARY
+        is awaited in both directions, as it determines the encoding.
+        """
+        client = self.client
+        local = client.check_local_option
+        remote = client.check_remote_option
+        return {
+            'TTYPE': lambda: (
+                client.env['TERM'] != client.TTYPE_UNDETECTED
+                or remote(TTYPE) is False),
+            'NAWS': lambda: (
+                (client.env.get('LINES', None) is not None
+                 and client.env.get('COLUMNS', None) is not None)
+                or remote(NAWS) is False),
+            'NEW_ENVIRON': lambda: (
+                client.ENV_REPLIED or remote(NEW_ENVIRON) is False),
+            'BINARY': lambda: UNKNOWN not in (local(BINARY), remote(BINARY)),
+        }
+
+    def _negotiate(self, st_time, mrk_bytes):
+        """
+        Wait for the client to answer or refuse all requested options.
+
+        The client is given ``TIME_NEGOTIATE`` to begin, and
+        ``TIME_WAIT_STAGE`` to answer, both since ``st_time``.  Replies of
+        the parser in response are sent as they are queued.
+
+        :rtype: dict
+        :returns: seconds elapsed until each option was answered or
+                  refused, or ``None`` for options not answered in time.
+        """
+        event = self.client.negotiation_event
+        pending = self._stages()
+        latency = dict.fromkeys(pending)
+        while pending and self.client.is_active():
+            # clear before testing, so that replies received while testing
+            # are not missed by wait().
+            event.clear()
+            for name, answered in pending.items():
+                if answered():
+                    latency[name] = time.time() - st_time
+                    del pending[name]
             if self.client.send_ready():
                 self.client.send()
-            time.sleep(self.TIME_POLL)
-
-        if detected():
-            self.log.debug('{client.addrport}: ENV={client.env!r}.'
-                           .format(client=self.client))
-        else:
-            self.log.debug('{client.addrport}: request-do-new_environ failed.'
-                           .format(client=self.client))
-
-    def _check_naws(self, start_time):
-        """
-        Check for NAWS negotiation.
-        """
-        def detected():
-            return (self.client.env.get('LINES', None) is not None
-                    and self.client.env.get('COLUMNS', None) is not None)
-
-        while not detected() and self._timeleft(start_time):
-            if not self.client.is_active():
-                return
-            if self.client.send_ready():
-                self.client.send()
-            time.sleep(self.TIME_POLL)
-
-        if detected():
-            self.log.debug('{client.addrport}: COLUMNS={client.env[COLUMNS]}, '
-                           'LINES={client.env[LINES]}.'
-                           .format(client=self.client))
-        else:
-            self.log.debug('{client.addrport}: request-do-naws failed.'
-                           .format(client=self.client))
-
-    def _check_ttype(self, start_time):
-        """
-        Check for TTYPE negotiation.
-        """
-        def detected():
-            return self.client.env['TERM'] != self.client.TTYPE_UNDETECTED
-
-        while not detected() and self._timeleft(start_time):
-            if not self.client.is_active():
-                return False
-            if self.client.send_ready():
-                self.client.send()
-            time.sleep(self.TIME_POLL)
-
-        if detected():
-            self.log.debug('{client.addrport}: TERM={client.env[TERM]}.'
-                           .format(client=self.client))
-            return True
-        self.log.debug('{client.addrport}: request-terminal-type failed.'
-                       .format(client=self.client))
-        return False
+            if not pending:
+                break
+            elapsed = time.time() - st_time
+            if self.client.bytes_received == mrk_bytes:
+                # wait at least {TIME_NEGOTIATE} for the client to speak.
+                remaining = self.TIME_NEGOTIATE - elapsed
+            else:
+                remaining = self.TIME_WAIT_STAGE - elapsed
+            if remaining <= 0:
+                break
+            event.wait(remaining)
+        return latency
+
+    def _record(self, latency):
+        """ Log and add negotiation ``latency`` to :attr:`histogram`. """
+        for name, seconds in sorted(latency.items()):
+            if seconds is None:
+                self.log.debug('{client.addrport}: request-do-{0} failed.'
+                               .format(name.lower(), client=self.client))
+        self.log.debug('{client.addrport}: TERM={client.env[TERM]}, '
+                       'COLUMNS={0}, LINES={1}, ENV={client.env!r}.'
+                       .format(self.client.env.get('COLUMNS', None),
+                               self.client.env.get('LINES', None),
+                               client=self.client))
+        answered = [seconds for seconds in latency.values()
+                    if seconds is not None]
+        latency['total'] = (max(answered) if len(answered) == len(latency)
+                            else None)
+        self.log.debug('{client.addrport}: negotiated {0}.'.format(
+            ', '.join('{0} in {1:0.3f}s'.format(name, seconds)
+                      if seconds is not None else '{0} unanswered'
+                      .format(name) for name, seconds
+                      in sorted(latency.items())), client=self.client))
+        num_samples = self.histogram.add(latency)
+        if num_samples % self.HISTOGRAM_INTERVAL == 0:
+            self.log.info('telnet negotiation latency of {0} clients:\n{1}'
+                          .format(num_samples,
+                                  '\n'.join(self.histogram.format())))
 
 
 class TelnetServer(BaseServer):
@@ -1024,7 +1224,7 @@ class TelnetServer(BaseServer):
 
     client_factory = TelnetClient
     connect_factory = ConnectTelnet
-    client_factory_kwargs = dict(on_naws=on_naws)
+    client_factory_kwargs = dict(on_naws=on_naws, compression=None)
 
     # Dictionary of active clients, (file descriptor, TelnetClient,)
     clients = {}
@@ -1035,12 +1235,40 @@ class TelnetServer(BaseServer):
 
         :param ConfigParser.ConfigParser config: configuration section
                                          ``[telnet]``, with options ``'addr'``,
-                                         ``'port'``
+                                         ``'port'``, and MCCP2 options
+                                         ``'compression'``,
+                                         ``'compression_level'``,
+                                         ``'compression_memlevel'``,
+                                         ``'compression_wbits'``, and
+                                         ``'negotiation_threads'`` and
+                                         ``'negotiation_queue'`` of
+                                         :meth:`start_connect_pool`.
+
+        The zlib compressor of each client using MCCP2 allocates about
+        ``(1 << (wbits + 2)) + (1 << (memlevel + 9))`` bytes, 256KiB by
+        default; a lower ``memlevel`` or ``wbits`` use less memory at the
+        cost of compression ratio, and a lower ``level`` less CPU.
         """
         self.log = logging.getLogger(__name__)
         self.address = config.get('telnet', 'addr')
         self.port = config.getint('telnet', 'port')
 
+        def _getint(key, default):
+            """ Return integer of ``[telnet]`` option, or ``default``. """
+            if config.has_option('telnet', key):
+                return config.getint('telnet', key)
+            return default
+
+        compression = None
+        if (config.has_option('telnet', 'compression') and
+                config.getboolean('telnet', 'compression')):
+            compression = dict(
+                level=_getint('compression_level', zlib.Z_DEFAULT_COMPRESSION),
+                memlevel=_getint('compression_memlevel', 8),
+                wbits=_getint('compression_wbits', zlib.MAX_WBITS))
+        self.client_factory_kwargs = dict(on_naws=on_naws,
+                                          compression=compression)
+
         # bind
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.setsockopt(
@@ -1054,3 +1282,6 @@ class TelnetServer(BaseServer):
             exit(1)
         self.log.info('telnet listening on {self.address}:{self.port}/tcp'
                       .format(self=self))
+
+        # negotiate in a bounded number of re-used threads, when enabled.
+        self.start_connect_pool(config, 'telnet')
@@ -1,12 +1,64 @@
 """ Terminal handler for x/84 """
 import contextlib
+import threading
 import logging
 import codecs
+import heapq
 import sys
 from blessed import Terminal as BlessedTerminal
 
+#: registered terminals, keyed by session-id.
 TERMINALS = dict()
 
+#: registered terminals, keyed by client instance.
+TERMINALS_BY_CLIENT = dict()
+
+#: registered terminals, keyed by file descriptor of ``master_read`` pipe.
+TERMINALS_BY_FD = dict()
+
+#: pre-forked session processes awaiting a client, as tuples of
+#: ``(process, master_pipes)``, see :func:`fill_session_pool`.
+SESSION_POOL = list()
+
+#: lock for :data:`SESSION_POOL`, which is taken from by negotiation threads.
+SESSION_POOL_LOCK = threading.Lock()
+
+#: library modules imported by a pre-forked session process, see
+#: :func:`preload_modules`.
+PRELOAD_MODULES = ('x84.bbs', 'x84.bbs.session', 'x84.bbs.ipc',
+                   'sqlitedict', 'dateutil.tz')
+
+
+class NodeAllocator(object):
+
+    """
+    Allocator of node numbers for sessions.
+
+    The lowest node number not held by any session is granted, those
+    released are kept in a min-heap, so that both are done without
+    scanning the numbers held.
+    """
+
+    def __init__(self):
+        """ Class initializer. """
+        self._released = []
+        self._highest = 0
+
+    def acquire(self):
+        """ Return lowest free node number. """
+        if self._released:
+            return heapq.heappop(self._released)
+        self._highest += 1
+        return self._highest
+
+    def release(self, node):
+        """ Release node number ``node``, to be granted again. """
+        heapq.heappush(self._released, node)
+
+
+#: node numbers of sessions, granted by the engine on ``node`` event.
+NODES = NodeAllocator()
+
 
 class Terminal(BlessedTerminal):
 
@@ -148,7 +200,7 @@ def determine_encoding(env):
     return env.get('encoding', fallback_encoding)
 
 
-def init_term(writer, env):
+def init_term(writer, env, terminal=None):
     """
     Determine the final TERM and encoding and return a Terminal.
 
@@ -157,15 +209,28 @@ def init_term(writer, env):
     terminal-type is of 'ansi' or 'ansi-bbs', then the cp437 encoding
     is assumed; otherwise 'utf8'.
 
-    A blessed-abstracted curses terminal is returned.
+    A blessed-abstracted curses terminal is returned.  When ``terminal``
+    is given, one already initialized for the same TERM by
+    :func:`warm_process`, it is resized and returned instead.
     """
     from x84.bbs.ipc import IPCStream
     from x84.bbs import get_ini
     log = logging.getLogger(__name__)
     env['TERM'] = translate_ttype(env.get('TERM', 'unknown'))
     env['encoding'] = determine_encoding(env)
+    if terminal is not None and terminal.kind == env['TERM']:
+        terminal._rows = int(env.get('LINES', '24'))
+        terminal._columns = int(env.get('COLUMNS', '80'))
+        log.info("terminal type is {0!r}".format(terminal.kind))
+        return terminal
+    stream = IPCStream(
+        writer=writer,
+        max_size=get_ini('session', 'output_buffer_size',
+                         getter='getint') or 8192,
+        max_delay=get_ini('session', 'output_buffer_delay',
+                          getter='getfloat') or 0.05)
     term = Terminal(kind=env['TERM'],
-                    stream=IPCStream(writer=writer),
+                    stream=stream,
                     rows=int(env.get('LINES', '24')),
                     columns=int(env.get('COLUMNS', '80')))
 
@@ -176,7 +241,7 @@ def init_term(writer, env):
         log.debug('terminal-type {0} failed, using {1} instead.'
                   .format(env['TERM'], termcap_unknown))
         term = Terminal(kind=termcap_unknown,
-                        stream=IPCStream(writer=writer),
+                        stream=stream,
                         rows=int(env.get('LINES', '24')),
                         columns=int(env.get('COLUMNS', '80')))
 
@@ -199,7 +264,8 @@ class TerminalProcess(object):
 
     An instance of this class is stored using :func:`register_tty`
     and removed by :func:`unregister_tty`, and discovered using
-    :func:`get_terminals`.
+    :func:`get_terminals`, :func:`find_tty`, :func:`find_tty_by_sid`,
+    or :func:`find_tty_by_fd`.
     """
 
     def __init__(self, client, sid, master_pipes):
@@ -210,6 +276,40 @@ class TerminalProcess(object):
         (self.master_write, self.master_read) = master_pipes
         self.timeout = get_ini('system', 'timeout') or 0
 
+        #: file descriptor of ``master_read``, retained after it is closed.
+        self.master_fd = self.master_read.fileno()
+
+        #: database ``(schema, table)`` cached by the session, which
+        #: receives a ``cache-invalidate`` event when they are modified.
+        self.cache_subscriptions = set()
+
+        #: node number granted by :data:`NODES`, released by
+        #: :func:`unregister_tty`.
+        self.node = None
+
+        #: attributes of the session, such as ``handle`` and ``activity``,
+        #: as last sent by its ``presence`` events.
+        self.presence = dict()
+
+        #: whether the session receives ``presence-delta`` events.
+        self.presence_subscriber = False
+
+    def get_presence(self):
+        """
+        Return dictionary describing this session, as by ``who`` event.
+
+        The attributes last sent by the session are updated by those known
+        to the engine: ``sid``, ``node``, ``connect_time``,
+        ``last_input_time`` and ``idle``.
+        """
+        presence = dict(self.presence)
+        presence.update(sid=self.sid,
+                        node=self.node,
+                        connect_time=self.client.connect_time,
+                        last_input_time=self.client.last_input_time,
+                        idle=self.client.idle())
+        return presence
+
 
 def flush_queue(queue):
     """
@@ -218,25 +318,41 @@ def flush_queue(queue):
     Seeks any remaining events in queue, used before closing
     to prevent zombie processes with IPC waiting to be picked up.
     """
+    from x84.bbs.ipc import unpack_records
     log = logging.getLogger(__name__)
     try:
         while queue.poll():
             event, data = queue.recv()
             if event == 'logger':
-                log.handle(data)
+                for record in unpack_records(data):
+                    log.handle(record)
     except (EOFError, IOError) as err:
         log.debug(err)
 
 
 def register_tty(tty):
     """ Register a :class:`TerminalProcess` instance. """
+    from x84.reactor import get_reactor, WIN32
     log = logging.getLogger(__name__)
     log.debug('[{tty.sid}] registered tty'.format(tty=tty))
     TERMINALS[tty.sid] = tty
+    TERMINALS_BY_CLIENT[tty.client] = tty
+    TERMINALS_BY_FD[tty.master_fd] = tty
+
+    # begin polling for session output and client input in x84.engine.
+    # WIN32's IPC is not done using sockets, so it is not possible to
+    # poll the session pipes, they are instead polled at every loop.
+    reactor = get_reactor()
+    if not WIN32:
+        reactor.register(tty.master_read.fileno())
+    reactor.register(tty.client.poll_fileno())
 
 
 def unregister_tty(tty):
     """ Unregister a :class:`TerminalProcess` instance. """
+    from x84.reactor import get_reactor, WIN32
+    if not WIN32:
+        get_reactor().unregister(tty.master_fd)
     try:
         flush_queue(tty.master_read)
         tty.master_read.close()
@@ -247,7 +363,29 @@ def unregister_tty(tty):
     if tty.client.active:
         # signal tcp socket to close
         tty.client.deactivate()
-    del TERMINALS[tty.sid]
+    TERMINALS.pop(tty.sid, None)
+    TERMINALS_BY_CLIENT.pop(tty.client, None)
+    TERMINALS_BY_FD.pop(tty.master_fd, None)
+    if tty.node is not None:
+        NODES.release(tty.node)
+        tty.node = None
+    publish_presence(tty.sid, None)
+
+
+def publish_presence(sid, attrs):
+    """
+    Send ``presence-delta`` event to sessions subscribed by ``who-subscribe``.
+
+    :param str sid: session-id of session whose presence changed.
+    :param dict attrs: attributes changed, or ``None`` when the session
+                       has disconnected.
+    """
+    for tty in TERMINALS.values():
+        if tty.presence_subscriber and tty.sid != sid:
+            try:
+                tty.master_write.send(('presence-delta', (sid, attrs)))
+            except (EOFError, IOError):
+                pass
 
 
 def get_terminals():
@@ -257,15 +395,27 @@ def get_terminals():
 
 def find_tty(client):
     """ Given a client, return a matching tty, or None if not registered. """
-    try:
-        return next(tty for _, tty in get_terminals() if client == tty.client)
-    except StopIteration:
-        pass
+    return TERMINALS_BY_CLIENT.get(client)
+
+
+def find_tty_by_sid(sid):
+    """ Given a session-id, return a matching tty, or None. """
+    return TERMINALS.get(sid)
+
+
+def find_tty_by_fd(fd):
+    """ Given a ``master_read`` file descriptor, return a matching tty. """
+    return TERMINALS_BY_FD.get(fd)
 
 
 def kill_session(client, reason='killed'):
     """ Given a client, shutdown its socket and signal subprocess exit. """
     from x84.bbs.exception import Disconnected
+    from x84.reactor import get_reactor
+
+    # cease polling before the socket is closed, so that its file
+    # descriptor number may be safely re-used by a new connection.
+    get_reactor().unregister(client.poll_fileno())
     client.shutdown()
 
     log = logging.getLogger(__name__)
@@ -281,7 +431,7 @@ def kill_session(client, reason='killed'):
 
 
 def start_process(sid, env, CFG, child_pipes, kind, addrport,
-                  matrix_args=None, matrix_kwargs=None):
+                  matrix_args=None, matrix_kwargs=None, terminal=None):
     """
     A ``multiprocessing.Process`` target.
 
@@ -297,6 +447,7 @@ def start_process(sid, env, CFG, child_pipes, kind, addrport,
                               script.
     :param dict matrix_kwargs: optional keyward arguments to pass to matrix
                                script.
+    :param Terminal terminal: terminal initialized by :func:`warm_process`.
     """
     # pylint: disable=R0913,R0914
     #         Too many arguments (8/5)
@@ -314,12 +465,12 @@ def start_process(sid, env, CFG, child_pipes, kind, addrport,
 
     # remove any existing log handlers in child process and replace
     # with a new root log handler that sends to x84.bbs.engine over IPC.
-    make_root_logger(writer)
+    log_handler = make_root_logger(writer)
 
     # instantiate and create a new terminal instance given the value
     # of env[TERM], negotiated by protocol. May modify the value of
     # env[TERM] by function translate_ttype
-    terminal = init_term(writer=writer, env=env)
+    terminal = init_term(writer=writer, env=env, terminal=terminal)
 
     try:
         # instantiate and run session
@@ -335,8 +486,9 @@ def start_process(sid, env, CFG, child_pipes, kind, addrport,
         }
         Session(**kwargs).run()
     finally:
-        # signal exit to engine
+        # signal exit to engine, after any buffered log records
         try:
+            log_handler.flush()
             writer.send(('exit', None))
         except IOError as err:
             # ignore [Errno 232] The pipe is being closed,
@@ -345,34 +497,182 @@ def start_process(sid, env, CFG, child_pipes, kind, addrport,
                 raise
 
 
+def preload_modules():
+    """
+    Import library modules of :data:`PRELOAD_MODULES`.
+
+    Called by a pre-forked session process, so that they are already
+    loaded when a client connects.  An ImportError is ignored here; it is
+    raised again, and logged, by the session.
+    """
+    for module_name in PRELOAD_MODULES:
+        try:
+            __import__(module_name)
+        except ImportError:
+            pass
+
+
+def preload_scripts():
+    """
+    Import matrix scripts into :data:`x84.bbs.session.SCRIPT_CACHE`.
+
+    Called by a pre-forked session process, so that its session does not
+    import them again (see :meth:`x84.bbs.session.Session._load_script`).
+    A script that fails to import is not cached; it is imported again by
+    the session, which then raises and logs the error.
+    """
+    from x84.bbs.session import SCRIPT_CACHE, load_script
+    from x84.bbs import get_ini
+    script_path = get_ini('system', 'scriptpath')
+    script_names = set(filter(None, [
+        get_ini('matrix', option) for option in (
+            'script', 'script_telnet', 'script_ssh', 'script_sftp')]))
+    if script_path not in sys.path:
+        # as by Session.script_module, for imports relative to scripts.
+        sys.path.insert(0, script_path)
+    for script_name in sorted(script_names):
+        try:
+            load_script(script_name, [script_path], SCRIPT_CACHE)
+        # pylint: disable=W0703
+        #         Catching too general exception
+        except Exception:
+            pass
+
+
+def pool_term_kind():
+    """ Return TERM of pre-forked session processes, or ``None``. """
+    from x84.bbs import get_ini
+    kind = get_ini('system', 'session_pool_term')
+    return translate_ttype(kind) if kind else None
+
+
+def warm_process(CFG, child_pipes, master_pipes):
+    """
+    A ``multiprocessing.Process`` target for a pre-forked session.
+
+    Modules and matrix scripts are imported by :func:`preload_modules`
+    and :func:`preload_scripts`, and a terminal of ``[system]`` option
+    ``session_pool_term`` is initialized, then the arguments of
+    :func:`start_process` are awaited by event ``start`` on the session
+    pipe, sent by :func:`spawn_client_session` once a client connects
+    with the same TERM.
+
+    :param ConfigParser.ConfigParser CFG: bbs configuration
+    :param tuple child_pipes: tuple of ``(writer, reader)`` for engine IPC.
+    :param tuple master_pipes: tuple of ``(writer, reader)`` of the engine,
+                               closed by this process, so that it receives
+                               EOF should the engine exit.
+    """
+    import x84.bbs.ini
+    x84.bbs.ini.CFG = CFG
+    for pipe in master_pipes:
+        pipe.close()
+    preload_modules()
+    preload_scripts()
+
+    (writer, reader) = child_pipes
+    terminal, kind = None, pool_term_kind()
+    if kind is not None:
+        terminal = init_term(writer=writer, env={'TERM': kind})
+    try:
+        event, kwargs = reader.recv()
+    except (EOFError, IOError, KeyboardInterrupt):
+        # engine shutdown before any client connected.
+        return
+    if event == 'start':
+        start_process(CFG=CFG, child_pipes=child_pipes, terminal=terminal,
+                      **kwargs)
+
+
+def fill_session_pool(pool_size):
+    """
+    Pre-fork session processes, up to ``pool_size``.
+
+    Called by the main event loop of x84.engine with ``[system]`` option
+    ``session_pool_size``, processes that have exited are first removed
+    from the pool.  Processes are daemonic, terminated should the engine
+    exit.
+    """
+    from multiprocessing import Process, Pipe
+    import x84.bbs.ini
+
+    if not pool_size:
+        return
+    with SESSION_POOL_LOCK:
+        SESSION_POOL[:] = [(process, master_pipes)
+                           for process, master_pipes in SESSION_POOL
+                           if process.is_alive()]
+        while len(SESSION_POOL) < pool_size:
+            child_read, master_write = Pipe(duplex=False)
+            master_read, child_write = Pipe(duplex=False)
+            process = Process(target=warm_process, kwargs={
+                'CFG': x84.bbs.ini.CFG,
+                'child_pipes': (child_write, child_read),
+                'master_pipes': (master_write, master_read),
+            })
+            process.daemon = True
+            process.start()
+            SESSION_POOL.append((process, (master_write, master_read)))
+
+
+def drain_session_pool():
+    """ Terminate all pre-forked session processes. """
+    with SESSION_POOL_LOCK:
+        for process, _ in SESSION_POOL:
+            process.terminate()
+        del SESSION_POOL[:]
+
+
 def spawn_client_session(client, matrix_kwargs=None):
     """ Spawn sub-process for connecting client.
 
-    Optional
+    A pre-forked process of :data:`SESSION_POOL` is used when available
+    and the client's TERM is that of the pool, otherwise a new sub-process
+    is started.
     """
     from multiprocessing import Process, Pipe
     import x84.bbs.ini
 
-    child_read, master_write = Pipe(duplex=False)
-    master_read, child_write = Pipe(duplex=False)
     session_id = '{client.kind}-{client.addrport}'.format(client=client)
-
-    # start sub-process, which will initialize the terminal and
-    # begins the 'session' for the connecting client.
-    Process(target=start_process, kwargs={
+    kwargs = {
         'sid': session_id,
         'env': client.env,
-        'CFG': x84.bbs.ini.CFG,
-        'child_pipes': (child_write, child_read),
         'kind': client.kind,
         'addrport': client.addrport,
         'matrix_kwargs': matrix_kwargs,
-    }).start()
+    }
+
+    master_pipes = None
+    pooled = bool(SESSION_POOL) and pool_term_kind() == translate_ttype(
+        client.env.get('TERM', 'unknown'))
+    while pooled and master_pipes is None:
+        with SESSION_POOL_LOCK:
+            if not SESSION_POOL:
+                break
+            process, master_pipes = SESSION_POOL.pop(0)
+        try:
+            # begin the 'session' of an already initialized sub-process.
+            master_pipes[0].send(('start', kwargs))
+        except (EOFError, IOError):
+            # pre-forked process has exited, try another.
+            process.terminate()
+            master_pipes = None
+
+    if master_pipes is None:
+        child_read, master_write = Pipe(duplex=False)
+        master_read, child_write = Pipe(duplex=False)
+        master_pipes = (master_write, master_read)
+
+        # start sub-process, which will initialize the terminal and
+        # begins the 'session' for the connecting client.
+        Process(target=start_process, kwargs=dict(
+            kwargs, CFG=x84.bbs.ini.CFG,
+            child_pipes=(child_write, child_read))).start()
 
     # and register its tty and master-side pipes for polling by x84.engine
     register_tty(TerminalProcess(client=client,
                                  sid=session_id,
-                                 master_pipes=(master_write, master_read)))
+                                 master_pipes=master_pipes))
 
 
 def on_naws(client):
@@ -384,10 +684,9 @@ def on_naws(client):
 
     This is ultimately handled by :meth:`x84.bbs.session.Session.buffer_event`.
     """
-    for _, tty in get_terminals():
-        if client == tty.client:
-            columns = int(client.env['COLUMNS'])
-            rows = int(client.env['LINES'])
-            tty.master_write.send(('refresh', ('resize', (columns, rows),)))
-            break
+    tty = find_tty(client)
+    if tty is not None:
+        columns = int(client.env['COLUMNS'])
+        rows = int(client.env['LINES'])
+        tty.master_write.send(('refresh', ('resize', (columns, rows),)))
     return True
@@ -170,7 +170,6 @@ def serve_messages_for(board_id, request_data, db_source):
     from x84.bbs.msgbase import to_utctime
     log = logging.getLogger(__name__)
     # log.error(msg)
-    db_tags = DBProxy(msgbase.TAGDB, use_session=False)
     db_messages = DBProxy(msgbase.MSGDB, use_session=False)
 
     def message_owned_by(msg_id, board_id):
@@ -184,7 +183,7 @@ def serve_messages_for(board_id, request_data, db_source):
 
         If ``idx`` is None, all messages are returned.
         """
-        for msg_id in db_tags.get(request_data['network'], []):
+        for msg_id in msgbase.list_msgs(tags=(request_data['network'],)):
             if idx is None:
                 yield db_messages[idx]
             elif (int(msg_id) > int(idx) and